@@ -1,4 +1,3 @@
-import requests
 from bs4 import BeautifulSoup
 import base64
 from itertools import product
@@ -6,6 +5,82 @@ import threading
 import time
 import os
 import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import upstream
+from caches import LRUTTLCache
+
+def _trashPattern():
+  """Regex matching every base64 trash combination, folded into a prefix tree"""
+  trashList = ["@","#","!","^","$"]
+  tree = {}
+  for i in range(2,4):
+    for chars in product(trashList, repeat=i):
+      node = tree
+      for ch in base64.b64encode(''.join(chars).encode("utf-8")).decode("utf-8"):
+        node = node.setdefault(ch, {})
+
+  def build(node):
+    branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items())]
+    if len(branches) <= 1:
+      return ''.join(branches)
+    return "(?:" + "|".join(branches) + ")"
+
+  return re.compile(build(tree))
+
+# Built once at import, clearTrash runs on every play request
+TRASH_PATTERN = _trashPattern()
+
+# quick_content.php enrichment of listings: bounded concurrency, results kept per rezka item id
+QUICK_CONTENT_WORKERS = 8
+quick_content_cache = LRUTTLCache(maxsize=4096, ttl=6 * 3600)
+_quick_content_pool = ThreadPoolExecutor(max_workers=QUICK_CONTENT_WORKERS, thread_name_prefix="rezka-quick")
+
+# Login cookies shared by every instance: rezka_cookies is read, or the login
+# posted, once per process. A failed login is retried after LOGIN_RETRY seconds.
+LOGIN_RETRY = 60
+_cookies = None
+_login_retry_at = 0.0
+_login_lock = threading.Lock()
+
+def login(baseurl, headers, email, password):
+  """Shared rezka cookie jar, {} while logged out"""
+  global _cookies, _login_retry_at
+  if _cookies is None and time.monotonic() >= _login_retry_at:
+    with _login_lock:
+      if _cookies is None and time.monotonic() >= _login_retry_at:
+        if os.path.exists("rezka_cookies"):
+          with open("rezka_cookies", "r") as fl:
+            _cookies = json.load(fl)
+        else:
+          _cookies = _login(baseurl, headers, email, password)
+          if _cookies is None:
+            _login_retry_at = time.monotonic() + LOGIN_RETRY
+  return _cookies if _cookies is not None else {}
+
+def _login(baseurl, headers, email, password):
+  data = {
+    'login_name': email,
+    'login_password': password,
+    'login_not_save': '0',
+  }
+  try:
+    auth_req = upstream.post(f"https://{baseurl}/ajax/login/", data=data, headers=headers)
+    success = auth_req.json()["success"] == True
+  except (upstream.RequestException, ValueError, KeyError) as e:
+    print(f"rezka login failed: {e}")
+    return None
+  if not success:
+    print(auth_req.text)
+    return None
+  cookies = dict(auth_req.cookies)
+  cookies.pop("PHPSESSID", None)
+  cookies.update({"hdmbbs": "1"})
+  print(cookies)
+  with open("rezka_cookies", "w") as fl:
+    fl.write(json.dumps(cookies, indent=4))
+  return cookies
 
 class HdRezkaStreamSubtitles():
   def __init__(self, data, codes):
@@ -77,27 +152,10 @@ class HdRezkaApi():
     self.seriesInfo = None
    
   def authorize(self, email, password):
-    data = {
-      'login_name': email,
-      'login_password': password,
-      'login_not_save': '0',
-    }
-    if os.path.exists("rezka_cookies"):
-      self.COOKIES = json.load(open("rezka_cookies", "r"))
-      return
-    auth_req = requests.post(f"https://{self.baseurl}/ajax/login/", data=data, headers=self.HEADERS)
-    if auth_req.json()["success"] == True:
-      self.COOKIES = auth_req.cookies.get_dict()
-      del self.COOKIES["PHPSESSID"]
-      print(self.COOKIES)
-      self.COOKIES.update({"hdmbbs": "1"})
-      with open("rezka_cookies", "w") as fl:
-        fl.write(json.dumps(self.COOKIES, indent=4))
-    else:
-      print(auth_req.text)
+    self.COOKIES = login(self.baseurl, self.HEADERS, email, password)
 
   def getPage(self):
-    return requests.get(self.url, headers=self.HEADERS, cookies=self.COOKIES, timeout=10000)
+    return upstream.get(self.url, headers=self.HEADERS, cookies=self.COOKIES, timeout=10000)
 
   def getSoup(self):
     return BeautifulSoup(self.page.content, 'html.parser')
@@ -117,22 +175,7 @@ class HdRezkaApi():
 
   @staticmethod
   def clearTrash(data):
-    trashList = ["@","#","!","^","$"]
-    trashCodesSet = []
-    for i in range(2,4):
-      startchar = ''
-      for chars in product(trashList, repeat=i):
-        data_bytes = startchar.join(chars).encode("utf-8")
-        trashcombo = base64.b64encode(data_bytes)
-        trashCodesSet.append(trashcombo)
-
-    arr = data.replace("#h", "").split("//_//")
-    trashString = ''.join(arr)
-
-    for i in trashCodesSet:
-      temp = i.decode("utf-8")
-      trashString = trashString.replace(temp, '')
-
+    trashString = TRASH_PATTERN.sub('', data.replace("#h", "").replace("//_//", ""))
     finalString = base64.b64decode(trashString+"==")
     return finalString.decode("latin-1")
 
@@ -208,7 +251,7 @@ class HdRezkaApi():
         "translator_id": self.translators[i],
         "action": "get_episodes"
       }
-      r = requests.post("https://" + self.baseurl + "/ajax/get_cdn_series/", data=js, cookies=self.COOKIES, headers=self.HEADERS, timeout=100)
+      r = upstream.post("https://" + self.baseurl + "/ajax/get_cdn_series/", data=js, cookies=self.COOKIES, headers=self.HEADERS, timeout=100)
       response = r.json()
       if response['success']:
         seasons, episodes = self.getEpisodes(response['seasons'], response['episodes'])
@@ -223,7 +266,7 @@ class HdRezkaApi():
 
   def getStream(self, season=None, episode=None, translation=None, index=0):
     def makeRequest(data):
-      r = requests.post("https://" + self.baseurl + "/ajax/get_cdn_series/", data=data, cookies=self.COOKIES, headers=self.HEADERS)
+      r = upstream.post("https://" + self.baseurl + "/ajax/get_cdn_series/", data=data, cookies=self.COOKIES, headers=self.HEADERS)
       r = r.json()
       if r['success']:
         arr = self.clearTrash(r['url']).split(",")
@@ -376,98 +419,67 @@ class HdRezkaSearch():
     self.query = query
     self.HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/81.0.4044.138 Safari/537.36'}
     self.COOKIES = {}
-    self.authorize(email, password)
     self.baseurl = "rezka.si"
+    self.authorize(email, password)
 
   def authorize(self, email, password):
-    data = {
-      'login_name': email,
-      'login_password': password,
-      'login_not_save': '0',
-    }
-    if os.path.exists("rezka_cookies"):
-      self.COOKIES = json.load(open("rezka_cookies", "r"))
-      return
-    auth_req = requests.post(f"https://{self.baseurl}ajax/login/", data=data, headers=self.HEADERS)
-    if auth_req.json()["success"] == True:
-      self.COOKIES = auth_req.cookies.get_dict()
-      del self.COOKIES["PHPSESSID"]
-      self.COOKIES.update({"hdmbbs": "1"})
-      print(self.COOKIES)
-      with open("rezka_cookies", "w") as fl:
-        fl.write(json.dumps(self.COOKIES, indent=4))
+    self.COOKIES = login(self.baseurl, self.HEADERS, email, password)
+
+  def get_quick_content(self, id_movie):
+    """quick_content.php details of an item, memoized per rezka id"""
+    return quick_content_cache.get_or_create(id_movie, lambda: self._fetch_quick_content(id_movie))
+
+  def _fetch_quick_content(self, id_movie):
+    quick_content = upstream.post(f'https://{self.baseurl}/engine/ajax/quick_content.php', data={'id': id_movie, 'is_touch': '1'}, headers=self.HEADERS, cookies=self.COOKIES, timeout=100)
+    quick_content_bs = BeautifulSoup(quick_content.text, 'lxml')
+    description = quick_content_bs.find_all("div", attrs={"class": "b-content__bubble_text"})[0].text.replace("\n","").strip()
+    censor = quick_content_bs.find_all("div", attrs={"class": "b-content__bubble_text"})[1].find("b")
+    censor = censor.text if censor else "N/A"
+    genres = ", ".join([genre.text for genre in quick_content_bs.find_all("div", attrs={'class': "b-content__bubble_text"})[-1].find_all("a")])
+    #artists = ", ".join([genre.text for genre in quick_content_bs.find_all("div", attrs={'class': "b-content__bubble_str"})[-1].find_all("span", attrs={"itemprop": "name"})[:3]]) + "..."
+    bubbles = quick_content_bs.find_all("div", attrs={'class': "b-content__bubble_str"})
+    if not bubbles:  # Check if the list is empty
+        artists = "n/a"
     else:
-      print(auth_req.text)
-
-  def full_search(self):
-    response = requests.get(f'https://{self.baseurl}/search/', params={'do': 'search', 'subaction': 'search', 'q': self.query}, headers=self.HEADERS, cookies=self.COOKIES, timeout=100)
+        artists = ", ".join([genre.text for genre in bubbles[-1].find_all("span", attrs={"itemprop": "name"})[:3]]) + "..."
+    imdb = quick_content_bs.find('span', attrs={'class': 'imdb'})
+    kp = quick_content_bs.find('span', attrs={'class': 'kp'})
+    ratings = f"{imdb if imdb else 'IMDb: N/A'} {kp if kp else 'Кинопоиск: N/A'}"
+    return {"description": description, "censor": censor, "genres": genres, "artists": artists, "ratings": ratings}
+
+  def parse_items(self, response):
+    """Items of a listing page, enriched with quick_content.php concurrently"""
     parsed_html = BeautifulSoup(response.text, 'lxml')
-    results = []
-    for link in parsed_html.find_all('div', attrs={"class": "b-content__inline_item"}):
+    links = parsed_html.find_all('div', attrs={"class": "b-content__inline_item"})
+    urls = []
+    for link in links:
         url = link.find("div").find("a")["href"]
         if url.startswith("/"):
           url = f"https://{self.baseurl}" + url
-        id_movie = url.split("-")[0].split("/")[-1]
-        print(id_movie)
-        quick_content = requests.post(f'https://{self.baseurl}/engine/ajax/quick_content.php', data={'id': id_movie, 'is_touch': '1'}, headers=self.HEADERS, cookies=self.COOKIES, timeout=100)
-        quick_content_bs = BeautifulSoup(quick_content.text, 'lxml')
-        description = quick_content_bs.find_all("div", attrs={"class": "b-content__bubble_text"})[0].text.replace("\n","").strip()
-        censor = quick_content_bs.find_all("div", attrs={"class": "b-content__bubble_text"})[1].find("b")
-        censor = censor.text if censor else "N/A"
-        genres = ", ".join([genre.text for genre in quick_content_bs.find_all("div", attrs={'class': "b-content__bubble_text"})[-1].find_all("a")])
-        #artists = ", ".join([genre.text for genre in quick_content_bs.find_all("div", attrs={'class': "b-content__bubble_str"})[-1].find_all("span", attrs={"itemprop": "name"})[:3]]) + "..."
-        bubbles = quick_content_bs.find_all("div", attrs={'class': "b-content__bubble_str"})
-        if not bubbles:  # Check if the list is empty
-            artists = "n/a"
-        else:
-            artists = ", ".join([genre.text for genre in bubbles[-1].find_all("span", attrs={"itemprop": "name"})[:3]]) + "..."
-        imdb = quick_content_bs.find('span', attrs={'class': 'imdb'})
-        kp = quick_content_bs.find('span', attrs={'class': 'kp'})
-        ratings = f"{imdb if imdb else 'IMDb: N/A'} {kp if kp else 'Кинопоиск: N/A'}"
+        urls.append(url)
+    ids = [url.split("-")[0].split("/")[-1] for url in urls]
+    details = _quick_content_pool.map(self.get_quick_content, ids)
+
+    results = []
+    for link, url, id_movie, info in zip(links, urls, ids, details):
         poster = link.find("div").find("a").find("img")["src"]
         title = link.find_all("div", attrs={"class": "b-content__inline_item-link"})[-1].find("a").text
         other_info = link.find_all("div", attrs={"class": "b-content__inline_item-link"})[-1].find("div").text
         year = other_info.split(",")[0]
         country = other_info.split(",")[1]
         item_type = link.find("div").find("a").find("span")["class"][-1]
-        results.append({"id": id_movie, "title": title, "description": description, 
-            "censor": censor, "genres": genres, "artists": artists, "ratings": ratings, "year": year, "country": country, "poster": poster, "url": url, "item_type": item_type})
+        results.append({"id": id_movie, "title": title, "description": info["description"], 
+            "censor": info["censor"], "genres": info["genres"], "artists": info["artists"], "ratings": info["ratings"], "year": year, "country": country, "poster": poster, "url": url, "item_type": item_type})
+    return results
+
+  def full_search(self):
+    response = upstream.get(f'https://{self.baseurl}/search/', params={'do': 'search', 'subaction': 'search', 'q': self.query}, headers=self.HEADERS, cookies=self.COOKIES, timeout=100)
+    results = self.parse_items(response)
     print(results)
     return results
 
   def get_recommendations(self, type, page):
-    response = requests.get(f'https://{self.baseurl}/{type}/page/{page}/', headers=self.HEADERS, cookies=self.COOKIES, timeout=100)
-    print(response.text)
-    parsed_html = BeautifulSoup(response.text, 'lxml')
-    results = []
-    for link in parsed_html.find_all('div', attrs={"class": "b-content__inline_item"}):
-        url = link.find("div").find("a")["href"]
-        if url.startswith("/"):
-          url = f"https://{self.baseurl}" + url
-        id_movie = url.split("-")[0].split("/")[-1]
-        print(id_movie)
-        quick_content = requests.post(f'https://{self.baseurl}/engine/ajax/quick_content.php', data={'id': id_movie, 'is_touch': '1'}, headers=self.HEADERS, cookies=self.COOKIES, timeout=100)
-        quick_content_bs = BeautifulSoup(quick_content.text, 'lxml')
-        description = quick_content_bs.find_all("div", attrs={"class": "b-content__bubble_text"})[0].text.replace("\n","").strip()
-        censor = quick_content_bs.find_all("div", attrs={"class": "b-content__bubble_text"})[1].find("b")
-        censor = censor.text if censor else "N/A"
-        genres = ", ".join([genre.text for genre in quick_content_bs.find_all("div", attrs={'class': "b-content__bubble_text"})[-1].find_all("a")])
-        #artists = ", ".join([genre.text for genre in quick_content_bs.find_all("div", attrs={'class': "b-content__bubble_str"})[-1].find_all("span", attrs={"itemprop": "name"})[:3]]) + "..."
-        bubbles = quick_content_bs.find_all("div", attrs={'class': "b-content__bubble_str"})
-        if not bubbles:  # Check if the list is empty
-            artists = "n/a"
-        else:
-            artists = ", ".join([genre.text for genre in bubbles[-1].find_all("span", attrs={"itemprop": "name"})[:3]]) + "..."
-        imdb = quick_content_bs.find('span', attrs={'class': 'imdb'})
-        kp = quick_content_bs.find('span', attrs={'class': 'kp'})
-        ratings = f"{imdb if imdb else 'IMDb: N/A'} {kp if kp else 'Кинопоиск: N/A'}"
-        poster = link.find("div").find("a").find("img")["src"]
-        title = link.find_all("div", attrs={"class": "b-content__inline_item-link"})[-1].find("a").text
-        other_info = link.find_all("div", attrs={"class": "b-content__inline_item-link"})[-1].find("div").text
-        year = other_info.split(",")[0]
-        country = other_info.split(",")[1]
-        item_type = link.find("div").find("a").find("span")["class"][-1]
-        results.append({"id": id_movie, "title": title, "description": description, 
-            "censor": censor, "genres": genres, "artists": artists, "ratings": ratings, "year": year, "country": country, "poster": poster, "url": url, "item_type": item_type})
+    response = upstream.get(f'https://{self.baseurl}/{type}/page/{page}/', headers=self.HEADERS, cookies=self.COOKIES, timeout=100)
+    results = self.parse_items(response)
     return results
     
@@ -1,11 +1,138 @@
-import requests
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import upstream
 
 try:
     import config
 except ImportError:
     print("config.py not found! Exiting...")
     exit()
-from videobalancers import HdRezkaApi
+from films import FilmStore
+from provider_index import ProviderIndex
+from search_cache import KeywordSearchCache
+from videobalancers import FilmachRutube, HdRezkaApi, RutrackerApi
+
+# kp_id -> provider URL, persisted across restarts
+provider_index = ProviderIndex(
+    getattr(config, "PROVIDER_INDEX_PATH", "provider_index.db"),
+    getattr(config, "PROVIDER_INDEX_TTLS", None)
+)
+
+# Kinopoisk keyword searches, shared across restarts to spare the API quota
+kp_search_cache = KeywordSearchCache(
+    getattr(config, "KP_SEARCH_CACHE_PATH", "kp_search.db"),
+    ttl=getattr(config, "KP_SEARCH_CACHE_TTL", 24 * 3600),
+    negative_ttl=getattr(config, "KP_SEARCH_NEGATIVE_TTL", 3600)
+)
+
+
+def fetch_film(kp_id):
+    """Film details from Kinopoisk in the shape of a search result, None when the API refused."""
+    headers = {"X-API-KEY": config.KINOPOISK_API_KEY}
+    response = upstream.get(f"https://kinopoiskapiunofficial.tech/api/v2.2/films/{kp_id}", headers=headers)
+    if response.status_code != 200:
+        return None
+    film = response.json()
+    return {
+        "filmId": film["kinopoiskId"],
+        "nameRu": film.get("nameRu"),
+        "nameEn": film.get("nameEn") or film.get("nameOriginal"),
+        "year": str(film["year"]) if film.get("year") else "",
+        "description": film.get("description") or film.get("shortDescription"),
+        "countries": film.get("countries", []),
+        "genres": film.get("genres", []),
+        "rating": str(film["ratingKinopoisk"]) if film.get("ratingKinopoisk") else "null",
+        "posterUrl": film.get("posterUrl"),
+        "posterUrlPreview": film.get("posterUrlPreview"),
+    }
+
+
+def film_titles(film):
+    """("Title Year", "Название Year") of a film, either name standing in for a missing one."""
+    title = film['nameEn'] + " " + film['year'] if film.get("nameEn") else film.get('nameRu', '')
+    title_rus = film['nameRu'] + " " + film['year'] if film.get('nameRu') else film.get('nameEn', '')
+    return title, title_rus
+
+
+# Film metadata by kp_id, filled from every search and fetched for ids none listed
+film_store = FilmStore(
+    getattr(config, "KP_FILMS_PATH", "kp_films.db"),
+    fetch=fetch_film,
+    maxsize=getattr(config, "KP_FILMS_MAX_SIZE", 4096)
+)
+
+# Provider probes run concurrently; the menu waits PROVIDER_DEADLINE seconds
+# at most, and only PROVIDER_GRACE more once some provider has the title.
+# Every provider has its own workers, so a hanging one can't starve the others.
+PROBE_WORKERS = {"hdRezka": 4, "rutracker": 2, "filmach": 2}
+PROBE_WORKERS.update(getattr(config, "PROVIDER_PROBE_WORKERS", {}))
+PROVIDER_DEADLINE = getattr(config, "PROVIDER_DEADLINE", 3)
+PROVIDER_GRACE = getattr(config, "PROVIDER_GRACE", 0.5)
+PROBE_TIMEOUTS = {"hdRezka": 15, "rutracker": 20, "filmach": 15}
+PROBE_TIMEOUTS.update(getattr(config, "PROVIDER_PROBE_TIMEOUTS", {}))
+# Connect and read timeouts of rutracker requests, (connect, read) seconds
+RUTRACKER_TIMEOUT = getattr(config, "RUTRACKER_TIMEOUT", (5, 15))
+_probe_pools = {
+    provider: ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"probe-{provider}")
+    for provider, workers in PROBE_WORKERS.items()
+}
+_probes = {}  # (kp_id, provider) -> (future, started_at)
+_probes_lock = threading.Lock()
+_probe_stats = {}
+
+
+def _record_probe(provider, elapsed, found=False, error=False, timeout=False):
+    with _probes_lock:
+        stats = _probe_stats.setdefault(provider, {
+            "probes": 0, "found": 0, "errors": 0, "timeouts": 0, "total_time": 0.0, "last_time": 0.0})
+        if timeout:
+            stats["timeouts"] += 1
+            return
+        stats["probes"] += 1
+        stats["total_time"] += elapsed
+        stats["last_time"] = elapsed
+        if found:
+            stats["found"] += 1
+        if error:
+            stats["errors"] += 1
+
+
+def probe_stats():
+    """Per-provider probe counters and latency."""
+    with _probes_lock:
+        stats = {provider: dict(values) for provider, values in _probe_stats.items()}
+        stats["in_flight"] = len(_probes)
+    for values in stats.values():
+        if isinstance(values, dict):
+            values["avg_time"] = values["total_time"] / values["probes"] if values["probes"] else 0.0
+    return stats
+
+
+def rutracker_client():
+    """Logged-in rutracker client, through RUTRACKER_PROXY when configured.
+
+    Requests time out after RUTRACKER_TIMEOUT, and a login needing a captcha
+    fails instead of waiting for one on the server's stdin.
+    """
+    if config.RUTRACKER_PROXY:
+        return RutrackerApi.Rutracker(config.RUTRACKER_USERNAME, config.RUTRACKER_PASSWORD, "https://rutracker.org/", proxies={'http': config.RUTRACKER_PROXY, 'https': config.RUTRACKER_PROXY}, timeout=RUTRACKER_TIMEOUT, interactive=False)
+    return RutrackerApi.Rutracker(config.RUTRACKER_USERNAME, config.RUTRACKER_PASSWORD, "https://rutracker.org/", timeout=RUTRACKER_TIMEOUT, interactive=False)
+
+
+def rutracker_query(title):
+    """Rutracker search line for a "Title Year" string, matching any year suffix."""
+    return title.replace(")", "").replace("(", "")[:-1] + "*"
+
+
+def filmach_query(title):
+    return title.replace(")", "").replace("(", "")
+
+
+def is_film_category(category):
+    return any(keyword in category.lower() for keyword in ["кино", "фильм", "сериал"])
+
 
 class VideoBalancersApi():
     def __init__(self, kp_id=None):
@@ -13,28 +140,143 @@ class VideoBalancersApi():
         if kp_id:
             self.url = None
 
-    def search(self, query) -> list:
+    def search(self, query) -> dict:
+        result = kp_search_cache.search(query, self.search_kinopoisk)
+        film_store.add_many(result.get("films", []))
+        return result
+
+    def search_kinopoisk(self, query):
+        """Uncached keyword search, None when the API refused it."""
         data = {"keyword": query}
         headers = {"X-API-KEY": config.KINOPOISK_API_KEY}
-        response = requests.get(
+        response = upstream.get(
             f"https://kinopoiskapiunofficial.tech/api/v2.1/films/search-by-keyword", params=data, headers=headers)
-        return response.json() if response.status_code == 200 else []
-
-    def get_providers(self, search_data):
-        result = []
+        return response.json() if response.status_code == 200 else None
 
+    def find_rezka_url(self, search_data):
+        """Search HdRezka for the title, None when it isn't there."""
+        if not search_data.get("query"):
+            # Unknown title: inconclusive, nothing is cached for the kp_id
+            raise LookupError(f"No title to search HdRezka for {search_data['kp_id']}")
         rezka = HdRezkaApi.HdRezkaApi("", search_data, config.REZKA_EMAIL, config.REZKA_PASSWORD)
         if rezka.found_item:
             print("Found hdrezka")
-            self.url = rezka.url
-            result.append("hdRezka")
+            return rezka.url
+        if rezka.lookup_failed:
+            raise LookupError(f"HdRezka lookup for {search_data['kp_id']} failed")
+        return None
+
+    def get_rezka_url(self, search_data):
+        """HdRezka URL for the title from the provider index, searching on a miss."""
+        try:
+            return provider_index.resolve(
+                search_data["kp_id"], "hdRezka", lambda: self.find_rezka_url(search_data))
+        except LookupError as e:
+            print(e)
+            return None
+
+    def find_rutracker(self, search_data):
+        """Rutracker search line that finds the title, None when nothing matches."""
+        if not search_data.get("query"):
+            # Unknown title: inconclusive, nothing is cached for the kp_id
+            raise LookupError(f"No title to search rutracker for {search_data['kp_id']}")
+        query = rutracker_query(search_data["query"])
+        items = rutracker_client().search(query)
+        return query if any(is_film_category(item[0]) for item in items) else None
+
+    def find_filmach(self, search_data):
+        """First filmach video for the title, None when there is none."""
+        title = search_data.get("query_rus") or search_data.get("query")
+        if not title:
+            raise LookupError(f"No title to search filmach for {search_data['kp_id']}")
+        items = FilmachRutube.FilmachRutube(timeout=PROBE_TIMEOUTS["filmach"]).search(filmach_query(title))
+        return items[0]["video_url"] if items else None
+
+    def enabled_providers(self):
+        providers = {"hdRezka": self.find_rezka_url}
         if config.RUTRACKER_USERNAME and config.RUTRACKER_PASSWORD:
-            result.append("rutracker")
+            providers["rutracker"] = self.find_rutracker
         if config.ENABLE_RUTUBE:
-            result.append("filmach")
-        return result
+            providers["filmach"] = self.find_filmach
+        return providers
+
+    def _run_probe(self, provider, finder, search_data):
+        started = time.monotonic()
+        try:
+            url = provider_index.resolve(
+                search_data["kp_id"], provider, lambda: finder(search_data))
+        except Exception as e:
+            # Inconclusive, nothing was stored and the next menu probes again
+            print(f"Probing {provider} for {search_data['kp_id']} failed: {e}")
+            _record_probe(provider, time.monotonic() - started, error=True)
+            return None
+        _record_probe(provider, time.monotonic() - started, found=bool(url))
+        return url
+
+    def probe(self, provider, finder, search_data):
+        """(future of the provider's URL for the title, stale), joining a probe already running.
+
+        `stale` is set when the running probe is past its own timeout: menus
+        list the provider as still being checked without waiting for it, and
+        no second probe piles up behind a hanging one.
+        """
+        key = (str(search_data["kp_id"]), provider)
+        with _probes_lock:
+            running = _probes.get(key)
+            if running is not None:
+                future, started_at = running
+                if time.monotonic() - started_at <= PROBE_TIMEOUTS.get(provider, PROVIDER_DEADLINE):
+                    return future, False
+                stale = True
+            else:
+                stale = False
+                future = _probe_pools[provider].submit(self._run_probe, provider, finder, search_data)
+                _probes[key] = (future, time.monotonic())
+        if stale:
+            _record_probe(provider, 0, timeout=True)
+            return future, True
+        future.add_done_callback(lambda f: self._probe_done(key, f))
+        return future, False
+
+    @staticmethod
+    def _probe_done(key, future):
+        with _probes_lock:
+            if key in _probes and _probes[key][0] is future:
+                del _probes[key]
+
+    def get_providers(self, search_data):
+        """Probe every enabled provider at once.
+
+        Returns (providers having the title, providers still being checked);
+        the ones still checking show up on a later call once their probe ends.
+        """
+        probes = {
+            provider: self.probe(provider, finder, search_data)
+            for provider, finder in self.enabled_providers().items()
+        }
+        futures = {provider: future for provider, (future, _) in probes.items()}
+        pending = {future for future, stale in probes.values() if not stale}
+        deadline = time.monotonic() + PROVIDER_DEADLINE
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            if any(future.result() for future in done):
+                deadline = min(deadline, time.monotonic() + PROVIDER_GRACE)
+
+        found, checking = [], []
+        for provider, future in futures.items():
+            if not future.done():
+                checking.append(provider)
+            elif future.result():
+                found.append(provider)
+        if "hdRezka" in found:
+            self.url = futures["hdRezka"].result()
+        return found, checking
 
     def get_provider(self, name, search_data=None):
-        if search_data:
-            return HdRezkaApi.HdRezkaApi('', search_data, config.REZKA_EMAIL, config.REZKA_PASSWORD)
+        if search_data and name == "hdRezka":
+            self.url = self.get_rezka_url(search_data)
+            return self
         return None
@@ -0,0 +1,51 @@
+"""clearTrash: original replace loop vs the precomputed regex.
+
+Run from the repository root: python -m benchmarks.bench_clear_trash
+"""
+import base64
+import json
+import timeit
+from itertools import product
+from pathlib import Path
+
+from videobalancers.HdRezkaApi import HdRezkaApi
+
+FIXTURES = Path(__file__).parent.parent / "tests" / "fixtures" / "rezka_stream_urls.json"
+
+
+def clear_trash_replace_loop(data):
+    """clearTrash as it was before the pattern was precomputed."""
+    trashList = ["@", "#", "!", "^", "$"]
+    trashCodesSet = []
+    for i in range(2, 4):
+        startchar = ""
+        for chars in product(trashList, repeat=i):
+            data_bytes = startchar.join(chars).encode("utf-8")
+            trashcombo = base64.b64encode(data_bytes)
+            trashCodesSet.append(trashcombo)
+
+    arr = data.replace("#h", "").split("//_//")
+    trashString = "".join(arr)
+
+    for i in trashCodesSet:
+        temp = i.decode("utf-8")
+        trashString = trashString.replace(temp, "")
+
+    finalString = base64.b64decode(trashString + "==")
+    return finalString.decode("latin-1")
+
+
+def main(number=2000):
+    with open(FIXTURES, encoding="utf-8") as f:
+        cases = json.load(f)
+    for case in cases:
+        payload = case["payload"]
+        assert clear_trash_replace_loop(payload) == HdRezkaApi.clearTrash(payload) == case["decoded"]
+        before = timeit.timeit(lambda: clear_trash_replace_loop(payload), number=number) / number
+        after = timeit.timeit(lambda: HdRezkaApi.clearTrash(payload), number=number) / number
+        print(f"{case['name']:<24} {len(payload):>5} chars  "
+              f"before {before * 1e6:8.1f} us  after {after * 1e6:8.1f} us  x{before / after:.1f}")
+
+
+if __name__ == "__main__":
+    main()
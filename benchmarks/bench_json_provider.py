@@ -0,0 +1,52 @@
+"""JSON responses: Flask's default provider vs fastjson.FastJSONProvider.
+
+Run from the repository root: python -m benchmarks.bench_json_provider
+"""
+import json
+import timeit
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+import fastjson
+from utils import load_json
+
+
+def search_page(channels):
+    """A search result page as the routes build it."""
+    page = load_json("templates/search_result_page.json")
+    page["channels"] = [{
+        "title": f"Фильм {i} (2024)",
+        "logo_30x30": "http://127.0.0.1:5001/res/film.png",
+        "description": f'<img style="float: left; padding-right: 15px" src="https://st.kp.yandex.net/{i}.jpg">'
+                       "2024<br>Россия<br>Жанры: драма, комедия<br>Оценка Кинопоиск: 7.1<br>"
+                       "Описание фильма в две фразы. Вторая фраза описания",
+        "playlist_url": f"http://127.0.0.1:5001/process_item?id={1000 + i}",
+        "menu": [{"title": "В избранное",
+                  "playlist_url": f"http://127.0.0.1:5001/add_to_fav?url=http://127.0.0.1:5001/process_item?id={1000 + i}"}],
+    } for i in range(channels)]
+    return page
+
+
+def main(number=200):
+    app = Flask(__name__)
+    before = DefaultJSONProvider(app)
+    after = fastjson.FastJSONProvider(app)
+    print(f"orjson: {'yes' if fastjson.orjson is not None else 'no (stdlib fallback)'}")
+    with app.app_context():
+        for channels in (20, 50, 500):
+            page = search_page(channels)
+            cached = dict(page, channels=fastjson.fragment(page["channels"]))
+            assert json.loads(before.response(page).get_data()) == page
+            assert json.loads(after.response(page).get_data()) == page
+            assert json.loads(after.response(cached).get_data()) == page
+            results = [
+                timeit.timeit(lambda: provider.response(obj), number=number) / number
+                for provider, obj in ((before, page), (after, page), (after, cached))
+            ]
+            print(f"{channels:>4} channels  default {results[0] * 1e6:8.1f} us  "
+                  f"fastjson {results[1] * 1e6:8.1f} us  cached fragment {results[2] * 1e6:8.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Title page parsing: html.parser BeautifulSoup extraction vs HdRezkaTitlePage.
+
+Run from the repository root: python -m benchmarks.bench_title_page
+
+The fixtures only hold the nodes the parser reads, while a live title page is
+a few hundred KB (related titles, comments, scripts), so each fixture is also
+measured padded with `FILLER` up to roughly that size. Memory is the
+tracemalloc peak while parsing and what stays allocated afterwards: before,
+HdRezkaApi kept the whole soup on the instance; now it keeps the page object.
+"""
+import gc
+import timeit
+import tracemalloc
+
+from bs4 import BeautifulSoup
+
+from videobalancers.HdRezkaApi import HdRezkaTitlePage
+from tests.test_rezka_title_page import FIXTURES, PAGES, soup_fields
+
+FILLER = (
+    '<div class="b-content__inline_item" data-id="{i}" data-url="https://rezka.ag/films/drama/{i}-title.html">'
+    '<div class="b-content__inline_item-cover"><a href="https://rezka.ag/films/drama/{i}-title.html">'
+    '<img src="https://static.rezka.ag/i/{i}.jpg" height="250" width="166" alt="Title {i}" />'
+    '<span class="cat films"><i class="entity">Фильм</i></span></a></div>'
+    '<div class="b-content__inline_item-link"><a href="https://rezka.ag/films/drama/{i}-title.html">Title {i}</a>'
+    '<div>2019, США, Драма</div></div></div>\n'
+    '<li class="comments-tree-item" data-id="{i}"><div class="b-comment"><span class="name">user{i}</span>'
+    '<div class="text"><div id="comment-id-{i}">Комментарий к фильму номер {i}, '
+    'достаточно длинный, чтобы походить на настоящий.</div></div></div></li>\n'
+)
+PAGE_SIZE = 300_000
+
+
+def padded(content):
+    """The fixture grown to about PAGE_SIZE bytes of unrelated markup."""
+    filler = []
+    size = len(content)
+    i = 0
+    while size < PAGE_SIZE:
+        block = FILLER.format(i=i).encode("utf-8")
+        filler.append(block)
+        size += len(block)
+        i += 1
+    return content.replace(b"</body>", b"".join(filler) + b"</body>")
+
+
+def soup_page(content):
+    """The html.parser tree an HdRezkaApi instance used to build and keep."""
+    return BeautifulSoup(content, "html.parser")
+
+
+def memory(parse, content):
+    """(peak, retained) bytes allocated while parsing and while holding the result."""
+    gc.collect()
+    tracemalloc.start()
+    result = parse(content)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return peak, retained
+
+
+def main(number=20):
+    for name in PAGES:
+        fixture = (FIXTURES / name).read_bytes()
+        for label, content in (("", fixture), ("padded", padded(fixture))):
+            expected = soup_fields(content)
+            page = HdRezkaTitlePage(content)
+            assert (page.id, page.name, page.type, page.favs, page.translators) == (
+                expected["id"], expected["name"], expected["type"], expected["favs"], expected["translators"])
+
+            before = timeit.timeit(lambda: soup_fields(content), number=number) / number
+            after = timeit.timeit(lambda: HdRezkaTitlePage(content), number=number) / number
+            before_peak, before_kept = memory(soup_page, content)
+            after_peak, after_kept = memory(HdRezkaTitlePage, content)
+            print(f"{name:<24} {label:<6} {len(content) // 1024:>4} KB  "
+                  f"before {before * 1e3:7.2f} ms  after {after * 1e3:7.2f} ms  x{before / after:.1f}  "
+                  f"peak {before_peak // 1024:>6} KB -> {after_peak // 1024:>5} KB  "
+                  f"kept {before_kept // 1024:>6} KB -> {after_kept // 1024:>5} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+import json
+import os
+import threading
+import time
+
+try:
+    import config
+except ImportError:
+    print("config.py not found! Exiting...")
+    exit()
+from HdRezkaApi import HdRezkaSearch
+from caches import LRUTTLCache
+from locks import FileLock
+
+# rezka category path -> title shown on the box
+CATALOG_TYPES = {
+    "films": "Фильмы",
+    "series": "Сериалы",
+    "cartoons": "Мультфильмы",
+}
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def rezka_client():
+    """Authorized rezka client shared by every listing fetch."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HdRezkaSearch(None, config.REZKA_EMAIL, config.REZKA_PASSWORD)
+        return _client
+
+
+def fetch_page(type, page):
+    """Scrape one listing page of a rezka category."""
+    global _client
+    client = rezka_client()
+    try:
+        return client.get_recommendations(type, page)
+    except Exception:
+        # Log in again on the next fetch, the session may be what failed
+        with _client_lock:
+            if _client is client:
+                _client = None
+        raise
+
+
+class CatalogCache:
+    """Rezka listing pages kept in memory and on disk.
+
+    Cached pages are served immediately; pages older than `max_age` are
+    refreshed in the background (stale-while-revalidate). `start` runs a
+    scheduler keeping the first `warm_pages` pages of every category warm;
+    only those are written to disk, other browsed pages are kept in a
+    bounded in-memory LRU of `browse_cache_size` pages.
+
+    Worker processes share the file: only one of them runs the scheduler,
+    the others pick up its pages when the file changes.
+    """
+
+    def __init__(self, fetch=fetch_page, path="catalog_cache.json", max_age=600,
+                 warm_pages=1, browse_cache_size=64):
+        self.fetch = fetch
+        self.path = path
+        self.max_age = max_age
+        self._warm = self._warm_keys(warm_pages, CATALOG_TYPES)
+        self._pages = {}  # warm "type/page" -> {"fetched_at": ..., "items": [...]}
+        self._browsed = LRUTTLCache(maxsize=browse_cache_size, ttl=0)
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._refreshing = set()
+        self._stop = threading.Event()
+        self._thread = None
+        self._scheduler_lock = FileLock(f"{path}.lock")
+        self._loaded_mtime = None
+        self._load()
+
+    @staticmethod
+    def _warm_keys(pages, types):
+        return {f"{type}/{page}" for type in types for page in range(1, pages + 1)}
+
+    def _load(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return
+        if mtime == self._loaded_mtime:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                pages = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error loading catalog cache: {e}")
+            return
+        pages = {key: entry for key, entry in pages.items() if key in self._warm}
+        with self._lock:
+            pages.update({
+                key: entry for key, entry in self._pages.items()
+                if key not in pages or pages[key]["fetched_at"] < entry["fetched_at"]
+            })
+            self._pages = pages
+            self._loaded_mtime = mtime
+
+    def _save(self):
+        # Serialized with other saves only; readers and stores of other
+        # pages don't wait for the file to be written
+        with self._save_lock:
+            with self._lock:
+                pages = dict(self._pages)
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(pages, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+            self._loaded_mtime = os.stat(self.path).st_mtime_ns
+
+    def _entry(self, key):
+        if key in self._warm:
+            return self._pages.get(key)
+        return self._browsed.get(key)
+
+    def _store(self, key, items):
+        entry = {"fetched_at": time.time(), "items": items}
+        if key not in self._warm:
+            self._browsed.set(key, entry)
+            return
+        with self._lock:
+            self._pages[key] = entry
+        self._save()
+
+    def get(self, type, page=1):
+        key = f"{type}/{page}"
+        # Pages refreshed by another worker
+        self._load()
+        entry = self._entry(key)
+        if entry is None:
+            items = self.fetch(type, page)
+            self._store(key, items)
+            return items
+        if time.time() - entry["fetched_at"] > self.max_age:
+            self.refresh(type, page)
+        return entry["items"]
+
+    def refresh(self, type, page=1, wait=False):
+        key = f"{type}/{page}"
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def run():
+            try:
+                self._store(key, self.fetch(type, page))
+            except Exception as e:
+                print(f"Refreshing catalog {key} failed: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        if wait:
+            run()
+        else:
+            threading.Thread(target=run, daemon=True).start()
+
+    def start(self, interval=300, pages=1, types=CATALOG_TYPES):
+        """Refresh the first `pages` pages of every category every `interval` seconds."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._warm = self._warm_keys(pages, types)
+        if not self._scheduler_lock.acquire(blocking=False):
+            print("Catalog refresh runs in another worker")
+            return
+
+        def loop():
+            while not self._stop.is_set():
+                for type in types:
+                    for page in range(1, pages + 1):
+                        if self._stop.is_set():
+                            return
+                        self.refresh(type, page, wait=True)
+                self._stop.wait(interval)
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=loop, daemon=True, name="catalog-refresh")
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._scheduler_lock.release()
@@ -0,0 +1,66 @@
+import json
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class Fragment:
+    """Pre-serialized JSON value, used when orjson can't embed raw fragments."""
+
+    __slots__ = ("data",)
+
+    def __init__(self, data):
+        self.data = data
+
+
+def fragment(data):
+    """Serialize `data` once so cached responses can embed it as is.
+
+    With orjson >= 3.9 the bytes are spliced into the output verbatim,
+    otherwise the value is kept and encoded again with the page.
+    """
+    if orjson is not None and hasattr(orjson, "Fragment"):
+        return orjson.Fragment(orjson.dumps(data))
+    return Fragment(data)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider using orjson when installed, the stdlib otherwise.
+
+    Keys keep their insertion order (templates define the field order),
+    non-ASCII text is written as UTF-8 instead of \\u escapes.
+    """
+
+    sort_keys = False
+    ensure_ascii = False
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, Fragment):
+            return o.data
+        return DefaultJSONProvider.default(o)
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS).decode()
+        kwargs.setdefault("default", self.default)
+        kwargs.setdefault("ensure_ascii", self.ensure_ascii)
+        kwargs.setdefault("sort_keys", self.sort_keys)
+        return json.dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        if orjson is not None:
+            body = orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS)
+        else:
+            body = json.dumps(obj, default=self.default, ensure_ascii=False, separators=(",", ":"))
+        return self._app.response_class(body, mimetype=self.mimetype)
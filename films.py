@@ -0,0 +1,119 @@
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from caches import LRUTTLCache
+from singleflight import SingleFlight
+
+FETCH_WORKERS = 4
+
+
+class FilmStore:
+    """Kinopoisk film metadata by filmId, in memory and in SQLite.
+
+    Filled from every search response; ids no search has listed (bookmarks,
+    ids after a restart on an empty store) are fetched with `fetch(film_id)`
+    on first use, several at once through `get_many`.
+    """
+
+    def __init__(self, path="kp_films.db", fetch=None, maxsize=4096):
+        self.fetch = fetch
+        self._memory = LRUTTLCache(maxsize=maxsize, ttl=0)
+        self._lock = threading.Lock()
+        self._flights = SingleFlight()
+        self._pool = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="kp-films")
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS films ("
+            " film_id TEXT PRIMARY KEY,"
+            " data TEXT NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._db.commit()
+        self.fetches = 0
+        self.fetch_errors = 0
+
+    def add_many(self, films):
+        """Store search results (dicts with a "filmId")."""
+        changed = []
+        for film in films:
+            film_id = str(film["filmId"])
+            if self._memory.get(film_id) != film:
+                self._memory.set(film_id, film)
+                changed.append((film_id, json.dumps(film, ensure_ascii=False), time.time()))
+        if changed:
+            with self._lock:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO films (film_id, data, updated_at) VALUES (?, ?, ?)", changed)
+                self._db.commit()
+
+    def _stored(self, film_id):
+        film = self._memory.get(film_id)
+        if film is None:
+            with self._lock:
+                row = self._db.execute("SELECT data FROM films WHERE film_id = ?", (film_id,)).fetchone()
+            if row:
+                film = json.loads(row[0])
+                self._memory.set(film_id, film)
+        return film
+
+    def _fetch(self, film_id):
+        self.fetches += 1
+        try:
+            film = self.fetch(film_id)
+        except Exception as e:
+            print(f"Fetching Kinopoisk film {film_id} failed: {e}")
+            film = None
+        if film is None:
+            self.fetch_errors += 1
+            return None
+        self.add_many([film])
+        return film
+
+    def get(self, film_id):
+        """Film metadata, fetched when it isn't stored yet; None if that failed."""
+        film_id = str(film_id)
+        film = self._stored(film_id)
+        if film is None and self.fetch:
+            film = self._flights.do(film_id, self._fetch, film_id)
+        return film
+
+    def get_many(self, film_ids):
+        """{film_id: metadata} for the ids that could be resolved, missing ones fetched concurrently.
+
+        Waits on the fetch pool, so it must not run inside it.
+        """
+        films = {}
+        missing = []
+        for film_id in map(str, film_ids):
+            film = self._stored(film_id)
+            if film is None:
+                missing.append(film_id)
+            else:
+                films[film_id] = film
+        if missing and self.fetch:
+            for film_id, film in zip(missing, self._pool.map(self.get, missing)):
+                if film:
+                    films[film_id] = film
+        return films
+
+    def prefetch(self, film_ids):
+        """Resolve ids in the background so later lookups are local; futures of the fetches."""
+        return [
+            self._pool.submit(self.get, film_id)
+            for film_id in dict.fromkeys(map(str, film_ids))
+            if self._stored(film_id) is None
+        ]
+
+    def stats(self):
+        stats = self._memory.stats()
+        stats["fetches"] = self.fetches
+        stats["fetch_errors"] = self.fetch_errors
+        return stats
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,28 @@
+# Production server: gunicorn -c gunicorn.conf.py
+try:
+    import config
+except ImportError:
+    print("config.py not found! Exiting...")
+    exit()
+
+wsgi_app = "server:app"
+bind = getattr(config, "WSGI_BIND", "0.0.0.0:5001")
+workers = getattr(config, "WSGI_WORKERS", 1)
+# Handlers mostly wait on upstream sites, so each worker serves several requests at once
+worker_class = "gthread"
+threads = getattr(config, "WSGI_THREADS", 8)
+# Streams are proxied through the worker, don't kill long responses
+timeout = 0
+# Every worker imports the app itself: its thread pools, SQLite connections
+# and event loop must not be inherited through fork
+preload_app = False
+
+
+def post_worker_init(worker):
+    import server
+    server.initialize_app()
+
+
+def worker_exit(arbiter, worker):
+    import server
+    server.shutdown_app()
@@ -0,0 +1,46 @@
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows: single process only, locking is a no-op
+    fcntl = None
+
+
+class FileLock:
+    """Advisory lock on `path` shared by the server's worker processes.
+
+    Usable as a context manager (blocking) or through `acquire(blocking=False)`
+    to elect one worker for a job.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+
+    def acquire(self, blocking=True):
+        if fcntl is None:
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        flags = fcntl.LOCK_EX
+        if not blocking:
+            flags |= fcntl.LOCK_NB
+        try:
+            fcntl.flock(fd, flags)
+        except OSError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
@@ -0,0 +1,244 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+try:
+    from inotify_simple import INotify, flags
+except ImportError:  # optional: periodic rescans only
+    INotify = None
+
+from locks import FileLock
+
+VIDEO_EXTENSIONS = {'.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv', '.webm', '.m4v', '.m3u8'}
+# Quiet period after a filesystem event before rescanning
+EVENT_DEBOUNCE = 2
+
+
+def _list_dir(path):
+    """(subdirectory names, video file names) of one directory."""
+    subdirs, files = [], []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.name)
+                elif Path(entry.name).suffix.lower() in VIDEO_EXTENSIONS and entry.is_file():
+                    files.append(entry.name)
+            except OSError:
+                continue
+    return subdirs, files
+
+
+class MediaIndex:
+    """Video files under `dirs`, indexed in the background and kept in SQLite.
+
+    A rescan only lists directories whose mtime changed since the last one,
+    unchanged ones are taken from the index. Rescans run every
+    `rescan_interval` seconds, and right after filesystem events when
+    inotify_simple is installed (network mounts may not report events, so
+    the periodic rescan stays on).
+
+    Worker processes share the database: only one of them scans, the others
+    reload the listing when the database changes.
+    """
+
+    def __init__(self, dirs, path="media_index.db", rescan_interval=600):
+        self.roots = list(dirs)
+        self.rescan_interval = rescan_interval
+        self.scanning = False
+        self.scans = 0
+        self.last_scan_time = 0.0
+        self._dirs = {}  # dir path -> (root, mtime_ns, subdirs, files)
+        self._videos = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._inotify = None
+        self._watched = set()
+        self._scanner_lock = FileLock(f"{path}.lock")
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS dirs ("
+            " path TEXT PRIMARY KEY,"
+            " root TEXT NOT NULL,"
+            " mtime INTEGER NOT NULL,"
+            " subdirs TEXT NOT NULL,"
+            " files TEXT NOT NULL)"
+        )
+        # Directories no longer configured
+        self._db.execute(
+            f"DELETE FROM dirs WHERE root NOT IN ({','.join('?' * len(self.roots))})", self.roots)
+        self._db.commit()
+        self._data_version = None
+        self._reload()
+
+    def _reload(self):
+        """Pick up the index written by the scanning worker."""
+        with self._lock:
+            version = self._db.execute("PRAGMA data_version").fetchone()[0]
+            if version == self._data_version:
+                return
+            rows = self._db.execute("SELECT path, root, mtime, subdirs, files FROM dirs").fetchall()
+            self._data_version = version
+        dirs = {
+            path: (root, mtime, json.loads(subdirs), json.loads(files))
+            for path, root, mtime, subdirs, files in rows
+        }
+        self._set_dirs(dirs)
+
+    def _set_dirs(self, dirs):
+        videos = []
+        for path, (root, _, _, files) in dirs.items():
+            for file in files:
+                full_path = os.path.join(path, file)
+                videos.append({
+                    'title': file,
+                    'path': full_path,
+                    'relative_path': os.path.relpath(full_path, root),
+                    'directory': root
+                })
+        videos.sort(key=lambda video: (video['relative_path'].casefold(), video['directory']))
+        self._dirs = dirs
+        self._videos = videos
+
+    def scan(self):
+        """Incremental rescan of every root; returns the number of directories listed."""
+        old = self._dirs
+        dirs = {}
+        listed = 0
+        for root in self.roots:
+            stack = [root]
+            while stack:
+                path = stack.pop()
+                try:
+                    mtime = os.stat(path).st_mtime_ns
+                    known = old.get(path)
+                    if known and known[0] == root and known[1] == mtime:
+                        subdirs, files = known[2], known[3]
+                    else:
+                        subdirs, files = _list_dir(path)
+                        listed += 1
+                except OSError:
+                    continue
+                dirs[path] = (root, mtime, subdirs, files)
+                stack.extend(os.path.join(path, subdir) for subdir in subdirs)
+
+        changed = [
+            (path, root, mtime, json.dumps(subdirs, ensure_ascii=False), json.dumps(files, ensure_ascii=False))
+            for path, (root, mtime, subdirs, files) in dirs.items()
+            if old.get(path) != (root, mtime, subdirs, files)
+        ]
+        removed = [(path,) for path in old if path not in dirs]
+        with self._lock:
+            if changed or removed:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO dirs (path, root, mtime, subdirs, files) VALUES (?, ?, ?, ?, ?)", changed)
+                self._db.executemany("DELETE FROM dirs WHERE path = ?", removed)
+                self._db.commit()
+                self._set_dirs(dirs)
+        self._watch(dirs)
+        return listed
+
+    def _watch(self, dirs):
+        if self._inotify is None:
+            return
+        mask = flags.CREATE | flags.DELETE | flags.MOVED_FROM | flags.MOVED_TO | flags.ONLYDIR
+        for path in dirs:
+            if path in self._watched:
+                continue
+            try:
+                self._inotify.add_watch(path, mask)
+            except OSError as e:
+                # Usually fs.inotify.max_user_watches; rescans still cover the rest
+                print(f"Watching {path} failed: {e}")
+                return
+            self._watched.add(path)
+
+    def _watch_loop(self):
+        while not self._stop.is_set():
+            try:
+                if not self._inotify.read(timeout=1000):
+                    continue
+                # Let copies and moves settle, then rescan once
+                while self._inotify.read(timeout=EVENT_DEBOUNCE * 1000):
+                    pass
+            except (OSError, ValueError):  # closed by stop()
+                return
+            # Deleted directories lose their watches, re-added if they come back
+            self._watched.clear()
+            self._wake.set()
+
+    def start(self):
+        """Scan in the background now and on changes; a no-op in all workers but one."""
+        if self._thread and self._thread.is_alive():
+            return
+        if not self._scanner_lock.acquire(blocking=False):
+            print("Local video indexing runs in another worker")
+            return
+        if INotify is not None:
+            try:
+                self._inotify = INotify()
+                threading.Thread(target=self._watch_loop, daemon=True, name="media-watch").start()
+            except OSError as e:
+                print(f"inotify unavailable, rescanning every {self.rescan_interval}s: {e}")
+
+        def loop():
+            while not self._stop.is_set():
+                self.scanning = True
+                started = time.monotonic()
+                try:
+                    listed = self.scan()
+                    self.scans += 1
+                    self.last_scan_time = time.monotonic() - started
+                    if listed:
+                        print(f"Local video index: {len(self._videos)} files, {listed} directories listed "
+                              f"in {self.last_scan_time:.1f}s")
+                except Exception as e:
+                    print(f"Local video scan failed: {e}")
+                finally:
+                    self.scanning = False
+                self._wake.wait(self.rescan_interval)
+                self._wake.clear()
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=loop, daemon=True, name="media-index")
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+        self._scanner_lock.release()
+
+    def videos(self):
+        """All indexed videos, sorted by path."""
+        if self._thread is None:
+            self._reload()
+        return self._videos
+
+    def page(self, page=1, per_page=100):
+        """(videos on `page`, total count)."""
+        videos = self.videos()
+        start = (page - 1) * per_page
+        return videos[start:start + per_page], len(videos)
+
+    def stats(self):
+        return {
+            "videos": len(self._videos),
+            "directories": len(self._dirs),
+            "scanning": self.scanning,
+            "scans": self.scans,
+            "last_scan_time": self.last_scan_time,
+            "inotify": self._inotify is not None,
+        }
+
+    def close(self):
+        self.stop()
+        with self._lock:
+            self._db.close()
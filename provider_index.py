@@ -0,0 +1,104 @@
+import sqlite3
+import threading
+import time
+
+# Seconds an entry stays fresh: (found, not found) per provider
+DEFAULT_TTLS = {
+    "hdRezka": (7 * 24 * 3600, 24 * 3600),
+}
+FALLBACK_TTL = (24 * 3600, 6 * 3600)
+
+
+class ProviderIndex:
+    """Persistent kp_id -> provider URL index.
+
+    Entries live in SQLite so they survive restarts and are mirrored in a dict,
+    so lookups never touch the disk. Negative entries (url is None) record
+    that a provider doesn't have the title.
+    """
+
+    def __init__(self, path="provider_index.db", ttls=None):
+        self.path = path
+        self.ttls = dict(DEFAULT_TTLS)
+        self.ttls.update(ttls or {})
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS providers ("
+            " kp_id TEXT NOT NULL,"
+            " provider TEXT NOT NULL,"
+            " url TEXT,"
+            " checked_at REAL NOT NULL,"
+            " PRIMARY KEY (kp_id, provider))"
+        )
+        self._db.commit()
+        self._entries = {
+            (kp_id, provider): (url, checked_at)
+            for kp_id, provider, url, checked_at in self._db.execute(
+                "SELECT kp_id, provider, url, checked_at FROM providers"
+            )
+        }
+
+    def get(self, kp_id, provider):
+        """Return (url, fresh) or None when the pair was never resolved."""
+        entry = self._entries.get((str(kp_id), provider))
+        if entry is None:
+            return None
+        url, checked_at = entry
+        found_ttl, missing_ttl = self.ttls.get(provider, FALLBACK_TTL)
+        ttl = found_ttl if url else missing_ttl
+        return url, time.time() - checked_at < ttl
+
+    def set(self, kp_id, provider, url):
+        key = (str(kp_id), provider)
+        checked_at = time.time()
+        with self._lock:
+            self._entries[key] = (url or None, checked_at)
+            self._db.execute(
+                "INSERT OR REPLACE INTO providers (kp_id, provider, url, checked_at)"
+                " VALUES (?, ?, ?, ?)",
+                (key[0], provider, url or None, checked_at),
+            )
+            self._db.commit()
+
+    def resolve(self, kp_id, provider, resolver):
+        """Answer from the index, calling `resolver()` -> url or None on a miss.
+
+        `resolver` raises when the lookup was inconclusive (network errors),
+        nothing is stored in that case.
+
+        Stale entries are still returned right away and revalidated in a
+        background thread.
+        """
+        entry = self.get(kp_id, provider)
+        if entry is None:
+            url = resolver()
+            self.set(kp_id, provider, url)
+            return url
+        url, fresh = entry
+        if not fresh:
+            self.refresh(kp_id, provider, resolver)
+        return url
+
+    def refresh(self, kp_id, provider, resolver):
+        key = (str(kp_id), provider)
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def run():
+            try:
+                self.set(kp_id, provider, resolver())
+            except Exception as e:
+                print(f"Revalidating {provider} for {kp_id} failed: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
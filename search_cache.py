@@ -0,0 +1,134 @@
+import json
+import sqlite3
+import threading
+import time
+from datetime import date
+
+from caches import LRUTTLCache
+
+
+def normalize_query(query):
+    """Cache key of a search: case, ё/е and whitespace don't matter."""
+    return " ".join(str(query or "").lower().replace("ё", "е").split())
+
+
+def _matches(film, words):
+    names = normalize_query(f"{film.get('nameRu') or ''} {film.get('nameEn') or ''}")
+    return all(word in names for word in words)
+
+
+class KeywordSearchCache:
+    """Kinopoisk keyword search results, in memory and in SQLite.
+
+    Results are kept `ttl` seconds, empty results `negative_ttl` seconds.
+    Queries typed letter by letter on a remote are answered from a cached
+    shorter query when that one returned every match (or nothing at all):
+    its films are filtered locally instead of spending an API call.
+    """
+
+    def __init__(self, path="kp_search.db", ttl=24 * 3600, negative_ttl=3600, maxsize=1024):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._memory = LRUTTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS searches ("
+            " query TEXT PRIMARY KEY,"
+            " result TEXT NOT NULL,"
+            " fetched_at REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS quota ("
+            " day TEXT PRIMARY KEY,"
+            " calls INTEGER NOT NULL);"
+        )
+        self.counters = {"hits": 0, "prefix_hits": 0, "misses": 0, "api_errors": 0}
+
+    def _lookup(self, keys):
+        """Fresh cached results for `keys`: {key: result}."""
+        found = {}
+        missing = []
+        for key in keys:
+            result = self._memory.get(key)
+            if result is None:
+                missing.append(key)
+            else:
+                found[key] = result
+        if missing:
+            with self._lock:
+                rows = self._db.execute(
+                    f"SELECT query, result, fetched_at FROM searches"
+                    f" WHERE query IN ({','.join('?' * len(missing))})",
+                    missing,
+                ).fetchall()
+            now = time.time()
+            for key, result, fetched_at in rows:
+                result = json.loads(result)
+                ttl = self.ttl if result.get("films") else self.negative_ttl
+                remaining = fetched_at + ttl - now
+                if remaining > 0:
+                    self._memory.set(key, result, remaining)
+                    found[key] = result
+        return found
+
+    def _store(self, key, result):
+        ttl = self.ttl if result.get("films") else self.negative_ttl
+        self._memory.set(key, result, ttl)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO searches (query, result, fetched_at) VALUES (?, ?, ?)",
+                (key, json.dumps(result, ensure_ascii=False), time.time()),
+            )
+            self._db.commit()
+
+    def _count_call(self):
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO quota (day, calls) VALUES (?, 1)"
+                " ON CONFLICT(day) DO UPDATE SET calls = calls + 1",
+                (date.today().isoformat(),),
+            )
+            self._db.commit()
+
+    def search(self, query, fetch):
+        """Results for `query`, calling `fetch(query)` -> result or None (error, not cached) on a miss."""
+        key = normalize_query(query)
+        # The query itself, then shorter prefixes that may contain all its matches
+        prefixes = [key[:end] for end in range(len(key), 0, -1) if end == len(key) or key[end - 1] != " "]
+        cached = self._lookup(prefixes)
+        if key in cached:
+            self.counters["hits"] += 1
+            return cached[key]
+        for prefix in prefixes[1:]:
+            result = cached.get(prefix)
+            films = result.get("films", []) if result else None
+            if result is None or len(films) < result.get("searchFilmsCountResult", 0):
+                continue
+            words = key.split()
+            self.counters["prefix_hits"] += 1
+            filtered = [film for film in films if _matches(film, words)]
+            return dict(result, films=filtered, searchFilmsCountResult=len(filtered), keyword=query)
+
+        self.counters["misses"] += 1
+        self._count_call()
+        result = fetch(query)
+        if result is None:
+            self.counters["api_errors"] += 1
+            return {"keyword": query, "films": [], "searchFilmsCountResult": 0}
+        self._store(key, result)
+        return result
+
+    def stats(self):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT calls FROM quota WHERE day = ?", (date.today().isoformat(),)
+            ).fetchone()
+        stats = dict(self.counters)
+        lookups = stats["hits"] + stats["prefix_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["hits"] + stats["prefix_hits"]) / lookups if lookups else 0.0
+        stats["api_calls_today"] = row[0] if row else 0
+        stats["memory"] = self._memory.stats()
+        return stats
+
+    def close(self):
+        with self._lock:
+            self._db.close()
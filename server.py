@@ -1,5 +1,6 @@
 import atexit
 import base64
+from contextlib import ExitStack
 import mimetypes
 import os
 from pathlib import Path
@@ -8,9 +9,8 @@ import shutil
 import signal
 import subprocess
 import sys
-from urllib.parse import quote_plus, unquote_plus, urljoin
+from urllib.parse import parse_qs, quote_plus, unquote_plus, urljoin, urlparse
 
-import requests
 import yt_dlp
 from flask import (
     Flask,
@@ -26,9 +26,18 @@ from flask import (
 from flask_caching import Cache
 from flask_cors import CORS
 
+import catalog
+import fastjson
+import media_index
+import upstream
+import userdata
+from sessions import SessionStore
+from singleflight import SingleFlight, normalize
+from titles import TitleMap
 import VideoBalancersApi
+from caches import LRUTTLCache
 from utils import *
-from videobalancers import FilmachRutube, HdRezkaApi, RutrackerApi
+from videobalancers import AsyncHdRezkaApi, FilmachRutube, HdRezkaApi
 try:
     import config
 except ImportError:
@@ -37,29 +46,43 @@ except ImportError:
 
 # Initialize Flask app
 app = Flask(__name__)
+app.json = fastjson.FastJSONProvider(app)
 app.config.from_mapping(config.cache_config)
 CORS(app)
 cache = Cache(app)
 cache.init_app(app)
 
+# With several worker processes, state a later request may need is kept in
+# the Flask cache, which must then be shared (e.g. FileSystemCache)
+WSGI_WORKERS = getattr(config, "WSGI_WORKERS", 1)
+shared_state = cache if WSGI_WORKERS > 1 else None
+if shared_state and config.cache_config.get("CACHE_TYPE") in ("SimpleCache", "NullCache"):
+    print(f"Warning: {config.cache_config['CACHE_TYPE']} is not shared between {WSGI_WORKERS} workers")
+
 # Global state
-app_state = {
-    'data': {},
-    'rezka': None,
-    'balancers_api': None,
-    'kp_id_to_title': {},
-    'kp_id_to_title_rus': {}
-}
+# Kinopoisk titles of search results, used to look titles up on the balancers
+kp_titles = TitleMap(
+    getattr(config, "KP_TITLES_PATH", "kp_titles.log"),
+    maxsize=getattr(config, "KP_TITLES_MAX_SIZE", 20000),
+    shared=shared_state
+)
+
+def film_titles(kp_id):
+    """(title, russian title) of a kp_id, from its film metadata when no search stored them."""
+    titles = kp_titles.get(kp_id)
+    if titles is None:
+        film = VideoBalancersApi.film_store.get(kp_id)
+        if film is None:
+            return None, None
+        titles = VideoBalancersApi.film_titles(film)
+        kp_titles.set(kp_id, *titles)
+    return titles
 
 def save_app_state():
     """Save app_state to disk"""
     try:
         state_to_save = {
-            'data': app_state.get('data', {}),
-            'rezka_url': app_state.get('rezka').url if app_state.get('rezka') else None,
-            'balancers_api_data': getattr(app_state.get('balancers_api'), '__dict__', {}) if app_state.get('balancers_api') else {},
-            'kp_id_to_title': app_state.get('kp_id_to_title', {}),
-            'kp_id_to_title_rus': app_state.get('kp_id_to_title_rus', {})
+            'sessions': sessions.snapshot()
         }
         
         with open('app_state.json', 'w', encoding='utf-8') as f:
@@ -76,17 +99,12 @@ def load_app_state():
                 saved_state = json.load(f)
             
             # Restore basic data
-            app_state['data'] = saved_state.get('data', {})
-            app_state['kp_id_to_title'] = saved_state.get('kp_id_to_title', {})
-            app_state['kp_id_to_title_rus'] = saved_state.get('kp_id_to_title_rus', {})
-            
-            # Recreate rezka instance if URL exists
-            if saved_state.get('rezka_url'):
-                app_state['rezka'] = HdRezkaApi.HdRezkaApi(
-                    saved_state['rezka_url'], 
-                    email=config.REZKA_EMAIL, 
-                    password=config.REZKA_PASSWORD
-                )
+            sessions.restore(saved_state.get('sessions', {}))
+            # Titles saved by older versions, now kept in kp_titles
+            if not len(kp_titles):
+                titles_rus = saved_state.get('kp_id_to_title_rus', {})
+                for kp_id, title in saved_state.get('kp_id_to_title', {}).items():
+                    kp_titles.set(kp_id, title, titles_rus.get(kp_id, title))
             
             print("App state loaded successfully")
             return True
@@ -94,7 +112,60 @@ def load_app_state():
         print(f"Error loading app state: {e}")
     return False
 
+# Parsed HdRezka titles, shared by every navigation step of the same title
+rezka_titles = LRUTTLCache(
+    maxsize=getattr(config, "REZKA_TITLE_CACHE_SIZE", 64),
+    ttl=getattr(config, "REZKA_TITLE_CACHE_TTL", 1800)
+)
+
+# Bookmarks and watch history, shared by every box
+user_store = userdata.UserStore(getattr(config, "USERDATA_DB_PATH", "userdata.db"))
+
+# Local video files, indexed in the background
+local_index = media_index.MediaIndex(
+    config.LOCAL_VIDEO_DIRS,
+    path=getattr(config, "LOCAL_VIDEO_INDEX_PATH", "media_index.db"),
+    rescan_interval=getattr(config, "LOCAL_VIDEO_RESCAN_INTERVAL", 600)
+)
+LOCAL_VIDEO_PAGE_SIZE = getattr(config, "LOCAL_VIDEO_PAGE_SIZE", 100)
+
+# Rezka category listings, refreshed in the background
+rezka_catalog = catalog.CatalogCache(
+    path=getattr(config, "CATALOG_CACHE_PATH", "catalog_cache.json"),
+    max_age=getattr(config, "CATALOG_MAX_AGE", 600),
+    warm_pages=getattr(config, "CATALOG_REFRESH_PAGES", 1),
+    browse_cache_size=getattr(config, "CATALOG_BROWSE_CACHE_SIZE", 64)
+)
+# Serialized channel lists of catalog pages: (type, page, host) -> (items, fragment)
+rezka_browse_pages = LRUTTLCache(maxsize=64, ttl=0)
+
+# Navigation context per TV box
+sessions = SessionStore(
+    maxsize=getattr(config, "SESSION_MAX_DEVICES", 256),
+    idle_ttl=getattr(config, "SESSION_IDLE_TTL", 6 * 3600),
+    shared=shared_state
+)
+
+# Identical upstream lookups running at the same time are done once
+flights = SingleFlight(timeout=getattr(config, "SINGLE_FLIGHT_TIMEOUT", 60))
+
 # Helper functions
+def current_session():
+    """Session of the box making the request."""
+    return sessions.get(request.args.get("box_mac"))
+
+def get_rezka(url):
+    """Return the cached HdRezkaApi object for a title, loading it on first use."""
+    key = urlparse(url).path.split(".html")[0] + ".html"
+    if getattr(config, "REZKA_ASYNC_CLIENT", False):
+        client = AsyncHdRezkaApi.HdRezkaApiSync
+    else:
+        client = HdRezkaApi.HdRezkaApi
+    return rezka_titles.get_or_create(
+        key,
+        lambda: client(url, email=config.REZKA_EMAIL, password=config.REZKA_PASSWORD)
+    )
+
 def get_icon(item_type):
     """Return the appropriate icon based on the item type."""
     
@@ -110,7 +181,11 @@ def maybe_proxy_stream_url(url):
 
 
 def create_channel_item(title, icon, description=None, playlist_url=None, menu=None, parser=None, stream_url=None, subtitles=None):
-    """Create a standardized channel item dictionary."""
+    """Create a standardized channel item dictionary.
+
+    Holds only plain str/list/dict values, which the JSON provider
+    serializes natively without going through its `default` hook.
+    """
     item = {
         "title": title,
         "logo_30x30": icon,
@@ -132,26 +207,23 @@ def create_channel_item(title, icon, description=None, playlist_url=None, menu=N
 @app.route("/")
 @auth_required
 def main_page():
-    index_page = load_json("templates/main_page.json")
-    for channel in index_page["channels"]:
-        channel["playlist_url"] = channel["playlist_url"].replace("http://94.177.51.191/", request.host_url)
-        channel["logo_30x30"] = channel["logo_30x30"].replace("http://94.177.51.191/", request.host_url)
-    return jsonify(index_page)
+    return jsonify(load_template_for_host("templates/main_page.json", request.host_url))
 
 @app.route("/bookmarks/", strict_slashes=False)
 @auth_required
 def watched():
-    db_dict = load_json("db.json")
-    response_template = load_json("templates/search_result_page.json")
-    db_dict["bookmarks"].reverse()
-
-    for item in db_dict["bookmarks"]:
-        if item.get("is_local"):
-            # Для локальных видео используем прямой URL
-            item_url = item['url']
-        else:
-            base64_url = base64.b64encode(item['url'].encode()).decode()
-            item_url = item['url']
+    response_template = load_template("templates/search_result_page.json")
+
+    bookmarks = user_store.bookmarks()
+    bookmarks.reverse()
+    # Resolve bookmarked titles ahead of the box opening one of them
+    VideoBalancersApi.film_store.prefetch(
+        kp_id for item in bookmarks
+        for kp_id in parse_qs(urlparse(item['url']).query).get('id', [])[:1]
+        if kp_id.isdigit()
+    )
+    for item in bookmarks:
+        item_url = item['url']
         
         response_template["channels"].append(create_channel_item(
             title=item["title"],
@@ -170,21 +242,12 @@ def watched():
 
 @app.route("/add_to_fav/", strict_slashes=False)
 def add_to_fav():
-    feed_response = load_json("templates/search_result_page.json")
-    db_dict = load_json("db.json")
+    feed_response = load_template("templates/search_result_page.json")
     
     url = request.args.get("url")
-    item_info = next(item for item in app_state['data'].get("search", {}).get("channels", []) 
-                   if item["playlist_url"] == url)
-    
-    if not any(item for item in db_dict["bookmarks"] if item.get("url") == url):
-        db_dict["bookmarks"].append({
-            "url": url,
-            "description": item_info["description"],
-            "title": item_info["title"]
-        })
+    item_info = current_session().search[url]
     
-    save_json("db.json", db_dict)
+    user_store.add_bookmark(url, item_info["title"], item_info["description"])
     feed_response.update({
         "notify": "Успешно добавлено в избранное", 
         "cmd": "stop();"
@@ -193,13 +256,10 @@ def add_to_fav():
 
 @app.route("/rem_from_fav/", strict_slashes=False)
 def rem_from_fav():
-    feed_response = load_json("templates/search_result_page.json")
-    db_dict = load_json("db.json")
+    feed_response = load_template("templates/search_result_page.json")
     
     url = base64.b64decode(request.args.get("url")).decode()
-    db_dict["bookmarks"] = [d for d in db_dict["bookmarks"] if d['url'] != url]
-    
-    save_json("db.json", db_dict)
+    user_store.remove_bookmark(url)
     feed_response.update({
         "notify": "Успешно удалено из избранного", 
         "cmd": "stop();reload();"
@@ -207,10 +267,12 @@ def rem_from_fav():
     return jsonify(feed_response)
 
 @app.route("/rezka/process_item/", strict_slashes=False)
-@cache.cached(query_string=True)
 def rezka_process_item():
-    response_template = load_json("templates/search_result_page.json")
+    response_template = load_template("templates/search_result_page.json")
     url = request.args.get("url")
+    # Prefetches of the title and translator being watched stay queued: the
+    # next click is most likely the episode they are resolving
+    current_session().cancel_prefetches(keep=(url, request.args.get("translation")))
     if request.args.get("e"):
         return handle_episode(response_template, url)
     if request.args.get("s"):
@@ -222,38 +284,39 @@ def rezka_process_item():
 
 def handle_episode(response_template, url):
     """Handle the episode request."""
-    if not app_state.get("rezka"):
-        app_state["rezka"] = HdRezkaApi.HdRezkaApi(url, email=config.REZKA_EMAIL, password=config.REZKA_PASSWORD)
-    
-    streams = app_state["rezka"].getStream(
-        request.args.get("s"),
-        request.args.get("e"),
-        translation=request.args.get("translation")
-    )
+    rezka = get_rezka(url)
+    streams = rezka_streams(rezka, request.args.get("translation"), request.args.get("s"), request.args.get("e"))
     
-    for i, (res, stream_url) in enumerate(streams.videos.items(), start=1):
-        clean_url = stream_url.split(":hls")[0].replace("https", "http")
-        
+    for i, res in enumerate(streams.videos, start=1):
         response_template["channels"].append(create_channel_item(
-            title=f"{app_state['rezka'].name} {res}",
+            title=f"{rezka.name} {res}",
             icon=url_for("resources", res="film.png", _external=True),
             parser=f"{request.host_url}mark_watched?url={url}&e={request.args.get('e')}&s={request.args.get('s')}",
-            stream_url=clean_url
+            stream_url=rezka_play_url(url, request.args.get("translation"), res,
+                                      request.args.get("s"), request.args.get("e"))
+        ))
+    
+    prefetch_count = getattr(config, "REZKA_PREFETCH_EPISODES", 0)
+    if prefetch_count:
+        translation = request.args.get("translation")
+        current_session().add_prefetches((url, translation), rezka.prefetchStreams(
+            request.args.get("s"),
+            request.args.get("e"),
+            translation=translation,
+            count=prefetch_count,
+            resolve=lambda s, e: rezka_streams(rezka, translation, s, e)
         ))
     
     return jsonify(response_template)
 
 def handle_season(response_template, url):
     """Handle the season request."""
-    if not app_state.get("rezka"):
-        app_state["rezka"] = HdRezkaApi.HdRezkaApi(url, email=config.REZKA_EMAIL, password=config.REZKA_PASSWORD)
-        if not app_state.get("transl"):
-            seasons = app_state["rezka"].getSeasons()
-            app_state["transl"] = next(
-                translation for translation in seasons.values() 
-                if translation["translator_id"] == str(request.args.get("translation")))
+    seasons = get_rezka(url).getSeasons(request.args.get("translation"), lazy=True)
+    transl = next(
+        translation for translation in seasons.values() 
+        if translation["translator_id"] == str(request.args.get("translation")))
     
-    episodes = app_state["transl"]["episodes"][request.args.get("s")]
+    episodes = transl["episodes"][request.args.get("s")]
     
     for episode_number in range(1, len(episodes) + 1):
         response_template["channels"].append(create_channel_item(
@@ -267,31 +330,28 @@ def handle_season(response_template, url):
 
 def handle_translation(response_template, url):
     """Handle the translation request."""
-    if not app_state.get("rezka"):
-        app_state["rezka"] = HdRezkaApi.HdRezkaApi(url, email=config.REZKA_EMAIL, password=config.REZKA_PASSWORD)
+    rezka = get_rezka(url)
     
-    if app_state["rezka"].type == "video.movie":
-        streams = app_state["rezka"].getStream('1', '1', translation=request.args.get("translation"))
+    if rezka.type == "video.movie":
+        streams = rezka_streams(rezka, request.args.get("translation"))
         subs = [[sub[1]["title"], sub[1]["link"]] for sub in streams.subtitles.subtitles.items()]
         
-        for i, (res, stream_url) in enumerate(streams.videos.items(), start=1):
-            clean_url = stream_url.split(":hls")[0].replace("https", "http")
-            
+        for i, res in enumerate(streams.videos, start=1):
             response_template["channels"].append(create_channel_item(
-                title=f"{app_state['rezka'].name} {res}",
+                title=f"{rezka.name} {res}",
                 icon=url_for("resources", res="film.png", _external=True),
-                stream_url=clean_url,
+                stream_url=rezka_play_url(url, request.args.get("translation"), res),
                 subtitles=subs
             ))
         
         return jsonify(response_template)
 
-    seasons = app_state["rezka"].getSeasons()
-    app_state["transl"] = next(
+    seasons = rezka.getSeasons(request.args.get("translation"), lazy=True)
+    transl = next(
         translation for translation in seasons.values() 
         if translation["translator_id"] == str(request.args.get("translation")))
     
-    for season in app_state["transl"]["seasons"].keys():
+    for season in transl["seasons"].keys():
         response_template["channels"].append(create_channel_item(
             title=f"Сезон {season}",
             icon=url_for("resources", res="series.png", _external=True),
@@ -300,10 +360,56 @@ def handle_translation(response_template, url):
     
     return jsonify(response_template)
 
+def rezka_play_url(url, translation, res, season=None, episode=None):
+    """Stream URL handed to the box: /rezka/play resolves the CDN link when it is played."""
+    play_url = (f"{request.host_url}rezka/play?url={quote_plus(url)}"
+                f"&translation={translation}&res={quote_plus(res)}")
+    if season and episode:
+        play_url += f"&s={season}&e={episode}"
+    return play_url
+
+def rezka_streams(rezka, translation, season=None, episode=None):
+    """Streams of a movie or an episode, joining a resolve already running (a prefetch or another box)."""
+    if season and episode:
+        return flights.do(
+            ("rezka_stream", rezka.url, translation, str(season), str(episode)),
+            rezka.getStream, season, episode, translation=translation
+        )
+    return flights.do(
+        ("rezka_stream", rezka.url, translation, None, None),
+        rezka.getStream, '1', '1', translation=translation
+    )
+
+def rezka_stream_link(rezka, translation, res, season, episode):
+    streams = rezka_streams(rezka, translation, season, episode)
+    link = streams.videos.get(res) or streams(res)
+    return link.split(":hls")[0].replace("https", "http")
+
+@app.route("/rezka/play", strict_slashes=False)
+def rezka_play():
+    """Redirect to the rezka CDN link of a stream.
+
+    Links can stop working before the expiry they carry. The cached link is
+    checked with a HEAD request first; on 403/410 it is dropped from the
+    stream cache and resolved again, so the box never gets a dead link.
+    """
+    rezka = get_rezka(request.args.get("url"))
+    args = (rezka, request.args.get("translation"), request.args.get("res"),
+            request.args.get("s"), request.args.get("e"))
+    link = rezka_stream_link(*args)
+    try:
+        status = upstream.client.request("HEAD", link, timeout=5, allow_redirects=True).status_code
+    except upstream.RequestException as e:
+        print(f"Checking rezka link failed: {e}")
+        status = None
+    if status in (403, 410) and HdRezkaApi.invalidateStreamLink(link):
+        link = rezka_stream_link(*args)
+    return redirect(maybe_proxy_stream_url(link), 302)
+
 def handle_url(response_template, url):
     """Handle the URL request, getting translations."""
-    app_state["rezka"] = HdRezkaApi.HdRezkaApi(url, email=config.REZKA_EMAIL, password=config.REZKA_PASSWORD)
-    translations = app_state["rezka"].getTranslations()
+    rezka = get_rezka(url)
+    translations = rezka.translators or rezka.getTranslations()
     
     for tr_name, tr_id in translations.items():
         response_template["channels"].append(create_channel_item(
@@ -314,76 +420,131 @@ def handle_url(response_template, url):
     
     return jsonify(response_template)
 
+@app.route("/rezka/browse/", strict_slashes=False)
+@auth_required
+def rezka_browse():
+    """Latest rezka titles per category, served from the catalog cache."""
+    response_template = load_template("templates/search_result_page.json")
+    item_type = request.args.get("type")
+    if item_type not in catalog.CATALOG_TYPES:
+        for type_name, title in catalog.CATALOG_TYPES.items():
+            response_template["channels"].append(create_channel_item(
+                title=title,
+                icon=url_for("resources", res="film.png", _external=True),
+                playlist_url=f"{request.host_url}rezka/browse?type={type_name}"
+            ))
+        return jsonify(response_template)
+
+    page = int(request.args.get("page", 1))
+    items = rezka_catalog.get(item_type, page)
+    key = (item_type, page, request.host_url)
+    cached = rezka_browse_pages.get(key)
+    if cached and cached[0] is items:
+        response_template["channels"] = cached[1]
+        return jsonify(response_template)
+
+    for item in items:
+        description = (
+            f'<img style="float: left; padding-right: 15px" src="{item["poster"]}">'
+            f'{item["year"]}<br>'
+            f'{item["country"]}<br>'
+            f'Жанры: {item["genres"]}<br>'
+            f'{item["ratings"]}<br>'
+            f'{item["description"]}'
+        )
+        response_template["channels"].append(create_channel_item(
+            title=item["title"],
+            icon=url_for("resources", res="film.png", _external=True),
+            description=description,
+            playlist_url=f"{request.host_url}rezka/process_item?url={item['url']}"
+        ))
+    response_template["channels"].append(create_channel_item(
+        title="Следующая страница",
+        icon=url_for("resources", res="next.png", _external=True),
+        playlist_url=f"{request.host_url}rezka/browse?type={item_type}&page={page + 1}"
+    ))
+    # Reused until the catalog hands out a refreshed page
+    rezka_browse_pages.set(key, (items, fastjson.fragment(response_template["channels"])))
+    return jsonify(response_template)
+
 @app.route("/mark_watched/", strict_slashes=False)
 def mark_watched():
-    db_dict = load_json("db.json")
     url = request.args.get("url")
     
-    if request.args.get("s") and not any(
-        item for item in db_dict["watched"] 
-        if (item["url"] == url and 
-            item.get("season") == request.args.get("season") and 
-            item.get("episode") == request.args.get("episode"))
-    ):
-        db_dict["watched"].append({
-            "url": url,
-            "episode": request.args.get("episode"),
-            "season": request.args.get("season")
-        })
-    elif not request.args.get("episode") and not any(
-        item for item in db_dict["watched"] if item["url"] == url
-    ):
-        db_dict["watched"].append({"url": url})
+    if request.args.get("s"):
+        user_store.mark_watched(url, request.args.get("season"), request.args.get("episode"))
+    elif not request.args.get("episode"):
+        user_store.mark_watched(url)
     
-    save_json("db.json", db_dict)
     return jsonify({"message": "Success"})
 
+@app.route("/upstream_stats", strict_slashes=False)
+@auth_required
+def upstream_stats():
+    """Per-host statistics of the shared upstream HTTP client."""
+    return jsonify(upstream.stats())
+
+@app.route("/cache_stats", strict_slashes=False)
+@auth_required
+def cache_stats():
+    """Hit/miss statistics of the in-process caches."""
+    return jsonify({
+        "rezka_titles": rezka_titles.stats(),
+        "rezka_streams": HdRezkaApi.stream_cache.stats(),
+        "rezka_browse_pages": rezka_browse_pages.stats(),
+        "sessions": sessions.stats(),
+        "single_flight": flights.stats(),
+        "provider_probes": VideoBalancersApi.probe_stats(),
+        "kp_search": VideoBalancersApi.kp_search_cache.stats(),
+        "kp_films": VideoBalancersApi.film_store.stats(),
+        "local_videos": local_index.stats()
+    })
+
 @app.route("/res/<res>", strict_slashes=False)
 def resources(res):
     return send_file("res/" + res, as_attachment=True)
 
+def film_description(film):
+    """Poster, year, countries, genres, rating and the first two sentences of a film."""
+    description_text = film["description"] if film.get("description") else ""
+    if description_text:
+        # Find the position of the second period
+        first_period = description_text.find(".")
+        second_period = description_text.find(".", first_period + 1)
+        if second_period != -1:
+            description_slice = description_text[:second_period]
+        else:
+            description_slice = description_text
+    else:
+        description_slice = ""
+
+    return (
+        f'<img style="float: left; padding-right: 15px" src="{film["posterUrlPreview"]}">'
+        f'{film["year"]}<br>'
+        f'{", ".join(country["country"] for country in film["countries"])}<br>'
+        f'Жанры: {", ".join(genre["genre"] for genre in film["genres"])}<br>'
+        f'Оценка Кинопоиск: {film["rating"]}<br>'
+        f'{description_slice}'
+    )
+
 # Kinopoisk search route
 @app.route("/search", strict_slashes=False)
 def turbo_search():
-    search_data = load_json("templates/search_result_page.json")
+    search_data = load_template("templates/search_result_page.json")
     balancers_api = VideoBalancersApi.VideoBalancersApi()
-    search_result = balancers_api.search(request.args.get("search"))    
-
-    # Ensure mappings exist
-    if 'kp_id_to_title' not in app_state:
-        app_state['kp_id_to_title'] = {}
-    if 'kp_id_to_title_rus' not in app_state:
-        app_state['kp_id_to_title_rus'] = {}
+    search_result = flights.do(
+        ("kp_search", normalize(request.args.get("search"))),
+        balancers_api.search, request.args.get("search")
+    )
 
     for item in search_result["films"]:
-        # Store both English and Russian mappings for later use
-        app_state['kp_id_to_title'][str(item['filmId'])] = item['nameEn'] + " " + item['year'] if item.get("nameEn") else item.get('nameRu', '')
-        app_state['kp_id_to_title_rus'][str(item['filmId'])] = item['nameRu'] + " " + item['year'] if item.get('nameRu') else item.get('nameEn', '')
+        # Store both English and Russian titles for later use
+        kp_titles.set(item['filmId'], *VideoBalancersApi.film_titles(item))
         print(item)
-        description_text = item["description"] if item.get("description") else ""
-        if description_text:
-            # Find the position of the second period
-            first_period = description_text.find(".")
-            second_period = description_text.find(".", first_period + 1)
-            if second_period != -1:
-                description_slice = description_text[:second_period]
-            else:
-                description_slice = description_text
-        else:
-            description_slice = ""
-
-        description = (
-            f'<img style="float: left; padding-right: 15px" src="{item["posterUrlPreview"]}">'
-            f'{item["year"]}<br>'
-            f'{", ".join(country["country"] for country in item["countries"])}<br>'
-            f'Жанры: {", ".join(genre["genre"] for genre in item["genres"])}<br>'
-            f'Оценка Кинопоиск: {item["rating"]}<br>'
-            f'{description_slice}'
-        )
         search_data["channels"].append(create_channel_item(
             title=item['nameRu'] if item.get("nameRu") else item['nameEn'],
             icon=url_for("resources", res="film.png", _external=True),
-            description=description,
+            description=film_description(item),
             playlist_url=f"{request.host_url}process_item?id={item['filmId']}",  # No title in URL
             menu=[{
                 "title": "В избранное", 
@@ -391,21 +552,26 @@ def turbo_search():
             }]
         ))
     
+    current_session().search = {channel["playlist_url"]: channel for channel in search_data["channels"]}
     return jsonify(search_data)
 
 @app.route("/process_item", strict_slashes=False)
 def process_item():
-    response_template = load_json("templates/search_result_page.json")
+    response_template = load_template("templates/search_result_page.json")
     if not request.args.get("source"):
         kp_id = request.args.get("id")
         # Use title from mapping if needed
-        title = app_state.get('kp_id_to_title', {}).get(str(kp_id))
+        title, title_rus = film_titles(kp_id)
         query_params = {
             "query": title,
+            "query_rus": title_rus,
             "kp_id": kp_id
         }
         
-        providers = VideoBalancersApi.VideoBalancersApi(kp_id).get_providers(query_params)
+        providers, checking = flights.do(
+            ("providers", normalize(kp_id)),
+            VideoBalancersApi.VideoBalancersApi(kp_id).get_providers, query_params
+        )
         
         for provider in providers:
             response_template["channels"].append(create_channel_item(
@@ -413,6 +579,13 @@ def process_item():
                 icon=url_for("resources", res="film.png", _external=True),
                 playlist_url=f"{clean_url_from_unwanted_params(request.url)}&source={provider}"
             ))
+        for provider in checking:
+            # Still probing: opening it reloads this menu
+            response_template["channels"].append(create_channel_item(
+                title=f"{provider.capitalize()} (проверяется…)",
+                icon=url_for("resources", res="film.png", _external=True),
+                playlist_url=clean_url_from_unwanted_params(request.url)
+            ))
         return response_template
     else:
         source = request.args.get("source")
@@ -422,16 +595,18 @@ def process_item():
 def handle_cdn(response_template, cdn_name):
     """Handle CDN source selection."""
     kp_id = request.args.get("id")
-    title = app_state.get('kp_id_to_title', {}).get(str(kp_id))
+    title, _ = film_titles(kp_id)
     query_params = {
         "query": title,
         "kp_id": kp_id
     }
-    app_state["balancers_api"] = VideoBalancersApi.VideoBalancersApi(
-        kp_id
-    ).get_provider(cdn_name, query_params)
+    session = current_session()
+    session.balancers_api = flights.do(
+        ("provider", normalize(kp_id), cdn_name),
+        VideoBalancersApi.VideoBalancersApi(kp_id).get_provider, cdn_name, query_params
+    )
     if cdn_name == "hdRezka":
-        return redirect(f"{request.host_url}rezka/process_item?url={app_state['balancers_api'].url}", 302)
+        return redirect(f"{request.host_url}rezka/process_item?url={session.balancers_api.url}", 302)
     elif cdn_name == "rutracker":
         return redirect(f"{request.host_url}/tracker/process_item?kp_id={kp_id}", 302)
     elif cdn_name == "filmach":
@@ -440,15 +615,17 @@ def handle_cdn(response_template, cdn_name):
 @app.route("/local_videos/", strict_slashes=False)
 @auth_required
 def local_videos():
-    """Display list of local video files"""
-    response_template = load_json("templates/search_result_page.json")
-    video_files = scan_local_videos(config.LOCAL_VIDEO_DIRS)
+    """Display list of local video files, a page of the local video index"""
+    response_template = load_template("templates/search_result_page.json")
+    page = int(request.args.get("page", 1))
+    video_files, total = local_index.page(page, LOCAL_VIDEO_PAGE_SIZE)
     
     if not video_files:
         response_template["channels"].append(create_channel_item(
             title="Локальных видео не найдено",
             icon=url_for("resources", res="film.png", _external=True),
             description=f"Проверенные директории: {', '.join(config.LOCAL_VIDEO_DIRS)}"
+                        + ("<br>Идёт индексация, обновите список позже" if local_index.scanning else "")
         ))
         return jsonify(response_template)
     
@@ -466,6 +643,12 @@ def local_videos():
                 "playlist_url": f"{request.host_url}add_local_to_fav?path={encoded_path}&title={base64.b64encode(video['title'].encode()).decode()}"
             }]
         ))
+    if page * LOCAL_VIDEO_PAGE_SIZE < total:
+        response_template["channels"].append(create_channel_item(
+            title="Следующая страница",
+            icon=url_for("resources", res="next.png", _external=True),
+            playlist_url=f"{request.host_url}local_videos?page={page + 1}"
+        ))
     
     return jsonify(response_template)
 
@@ -573,20 +756,23 @@ def handle_tracker_search(kp_id: int):
                 return priority
         
         return 0
-    search_data = load_json("templates/search_result_page.json")
-    title = app_state.get('kp_id_to_title', {}).get(str(kp_id)).replace(")", "").replace("(", "")[:-1] + "*"
+    search_data = load_template("templates/search_result_page.json")
+    title, _ = film_titles(kp_id)
+    if not title:
+        return jsonify(search_data)
+    title = VideoBalancersApi.rutracker_query(title)
 
-    if config.RUTRACKER_PROXY:
-        tracker = RutrackerApi.Rutracker(config.RUTRACKER_USERNAME, config.RUTRACKER_PASSWORD, "https://rutracker.org/", proxies={'http': config.RUTRACKER_PROXY, 'https': config.RUTRACKER_PROXY})
-    else:
-        tracker = RutrackerApi.Rutracker(config.RUTRACKER_USERNAME, config.RUTRACKER_PASSWORD, "https://rutracker.org/")
-    search_items = tracker.search(title)
+    def search():
+        tracker = VideoBalancersApi.rutracker_client()
+        return tracker, tracker.search(title)
+
+    tracker, search_items = flights.do(("rutracker_search", normalize(title)), search)
     filtered_items = []
     for item in search_items:
         item_title = item[1].lower()
         item_category = item[0].lower()
         
-        if not any(keyword in item_category for keyword in ["кино", "фильм", "сериал"]):
+        if not VideoBalancersApi.is_film_category(item_category):
             continue
         
         if any(keyword in item_title for keyword in ["4k", "uhd", "2160p"]):
@@ -615,13 +801,16 @@ def handle_tracker_search(kp_id: int):
     return jsonify(search_data)
 
 def handle_topic(topic_id: int):
-    search_data = load_json("templates/search_result_page.json")
-    if config.RUTRACKER_PROXY:
-        tracker = RutrackerApi.Rutracker(config.RUTRACKER_USERNAME, config.RUTRACKER_PASSWORD, "https://rutracker.org/", proxies={'http': config.RUTRACKER_PROXY, 'https': config.RUTRACKER_PROXY})
-    else:
-        tracker = RutrackerApi.Rutracker(config.RUTRACKER_USERNAME, config.RUTRACKER_PASSWORD, "https://rutracker.org/")
-    magnet = tracker.get_magnet_link(topic_id)
-    description = tracker.get_info(topic_id)
+    search_data = load_template("templates/search_result_page.json")
+
+    def fetch_topic():
+        tracker = VideoBalancersApi.rutracker_client()
+        magnet = tracker.get_magnet_link(topic_id)
+        description = tracker.get_info(topic_id)
+        streams = subprocess.run(f'API_PASSWORD="myapipassword" htorrent info -m="{magnet}"', shell=True, capture_output=True).stdout.decode()
+        return description, streams
+
+    description, streams = flights.do(("rutracker_topic", normalize(topic_id)), fetch_topic)
     print(description)
     video_codecs = re.findall(r"(?:Формат\s+)?[Вв]идео\s*:\s*(.+)", description)
     audio_tracks = re.findall(r"^(Аудио\s*#?\s*(?:\d+\s*:)?\s*.+)$", description, flags=re.MULTILINE)
@@ -637,7 +826,6 @@ def handle_topic(topic_id: int):
         
     if len(audio_tracks) > 0:
         audio_tracks = "<br>".join([item.replace("\n", "").strip() for item in audio_tracks])
-    streams = subprocess.run(f'API_PASSWORD="myapipassword" htorrent info -m="{magnet}"', shell=True, capture_output=True).stdout.decode()
     result = []
     lines = streams.strip().split('\n')
     
@@ -713,7 +901,7 @@ def process_filmach_item():
         return handle_filmach_search(request.args.get("kp_id"))
 
 def handle_filmach_video_url(video_url, format_id=None):
-    response_template = load_json("templates/search_result_page.json")
+    response_template = load_template("templates/search_result_page.json")
     try:
         ydl_opts = {
             'quiet': True,
@@ -721,8 +909,11 @@ def handle_filmach_video_url(video_url, format_id=None):
             'skip_download': True,
             'cachedir': False,
         }
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(video_url, download=False)
+        def extract():
+            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                return ydl.extract_info(video_url, download=False)
+
+        info = flights.do(("filmach_video", video_url), extract)
 
         formats = info.get('formats', []) or []
         if format_id is None:
@@ -826,17 +1017,27 @@ def stream_proxy():
     if request.headers.get('Range'):
         headers['Range'] = request.headers.get('Range')
 
+    # The connection is closed only once the body has been consumed; playback
+    # can take hours, so it doesn't occupy one of the host's keep-alive slots
+    upstream_response = ExitStack()
     try:
-        resp = requests.get(target_url, headers=headers, stream=True, timeout=(5, 30))
-    except requests.RequestException as e:
+        resp = upstream_response.enter_context(
+            upstream.stream("GET", target_url, pooled=False, headers=headers, timeout=(5, 30))
+        )
+    except upstream.RequestException as e:
         return jsonify({
             'notify': f'Ошибка прокси: {e}',
             'cmd': 'back();'
         }), 502
 
+    if resp.status_code in (403, 410):
+        # The link expired early, make the next play request resolve it again
+        HdRezkaApi.invalidateStreamLink(target_url)
+
     content_type = resp.headers.get('Content-Type', 'application/octet-stream')
     if target_url.lower().endswith('.m3u8') or 'mpegurl' in content_type.lower():
-        text = resp.content.decode('utf-8', errors='ignore')
+        with upstream_response:
+            text = b''.join(resp.iter_content()).decode('utf-8', errors='ignore')
         result_lines = []
         for line in text.splitlines(True):
             stripped = line.strip()
@@ -853,9 +1054,10 @@ def stream_proxy():
         return response
 
     def generate():
-        for chunk in resp.iter_content(chunk_size=8192):
-            if chunk:
-                yield chunk
+        with upstream_response:
+            for chunk in resp.iter_content(chunk_size=8192):
+                if chunk:
+                    yield chunk
 
     response = Response(stream_with_context(generate()), status=resp.status_code, mimetype=content_type)
     if resp.headers.get('Content-Length'):
@@ -867,10 +1069,13 @@ def stream_proxy():
 
 
 def handle_filmach_search(kp_id):
-    search_data = load_json("templates/search_result_page.json")
-    title = app_state.get('kp_id_to_title_rus', {}).get(str(kp_id)).replace(")", "").replace("(", "")
+    search_data = load_template("templates/search_result_page.json")
+    _, title = film_titles(kp_id)
+    if not title:
+        return jsonify(search_data)
+    title = VideoBalancersApi.filmach_query(title)
     client = FilmachRutube.FilmachRutube()
-    search_result = client.search(title)
+    search_result = flights.do(("filmach_search", normalize(title)), client.search, title)
     for item in search_result[:30]:
         description = f'<img style="float: left; padding-right: 15px; height: 40%; width: auto" src="{item["thumbnail_url"]}"><br>{item["title"]}'
         search_data["channels"].append(create_channel_item(
@@ -882,22 +1087,36 @@ def handle_filmach_search(kp_id):
     return jsonify(search_data)
 
 def initialize_app():
-    """Initialize application on startup"""
+    """Initialize application on startup (once per worker process)"""
     print("Initializing application...")
-    load_app_state()
+    if shared_state is None:
+        load_app_state()
+    refresh_interval = getattr(config, "CATALOG_REFRESH_INTERVAL", 300)
+    if refresh_interval:
+        rezka_catalog.start(refresh_interval, getattr(config, "CATALOG_REFRESH_PAGES", 1))
+    local_index.start()
     
     print("Application initialized")
 
+def shutdown_app():
+    """Flush state on shutdown (once per worker process)"""
+    print("Shutting down, saving app state...")
+    rezka_catalog.stop()
+    local_index.close()
+    if shared_state is None:
+        save_app_state()
+    user_store.close()
+    kp_titles.close()
+
 def shutdown_handler(signum=None, frame=None):
     """Handle server shutdown gracefully"""
-    print("Shutting down, saving app state...")
-    save_app_state()
+    shutdown_app()
     sys.exit()
 
-initialize_app()
-atexit.register(shutdown_handler)
-signal.signal(signal.SIGINT, shutdown_handler)
-signal.signal(signal.SIGTERM, shutdown_handler)
-
 if __name__ == "__main__":
+    # Development server; production runs under gunicorn (gunicorn.conf.py)
+    initialize_app()
+    atexit.register(shutdown_app)
+    signal.signal(signal.SIGINT, shutdown_handler)
+    signal.signal(signal.SIGTERM, shutdown_handler)
     app.run(host="0.0.0.0", port=5001)
@@ -0,0 +1,124 @@
+import threading
+import time
+
+
+class DeviceSession:
+    """Navigation context of one TV box.
+
+    With a `shared` cache the last search page lives there, so any worker
+    process can serve the next step of a box's navigation.
+    """
+
+    def __init__(self, box_mac, shared=None, ttl=0):
+        self.box_mac = box_mac
+        self.shared = shared
+        self.ttl = ttl
+        self.last_seen = time.monotonic()
+        self._search = {}  # playlist_url -> channel of the last search page
+        self.balancers_api = None
+        self.prefetches = []  # futures of next-episode prefetches, local to this worker
+        self.prefetching = None  # (title url, translator) the prefetches are for
+
+    @property
+    def search(self):
+        if self.shared is not None:
+            return self.shared.get(f"session:{self.box_mac}:search") or {}
+        return self._search
+
+    @search.setter
+    def search(self, channels):
+        if self.shared is not None:
+            self.shared.set(f"session:{self.box_mac}:search", channels, timeout=self.ttl)
+        else:
+            self._search = channels
+
+    def add_prefetches(self, target, futures):
+        """Track prefetches for (title url, translator), dropping finished ones."""
+        if target != self.prefetching:
+            self.cancel_prefetches()
+        self.prefetching = target
+        self.prefetches = [future for future in self.prefetches if not future.done()] + futures
+
+    def cancel_prefetches(self, keep=None):
+        """Cancel prefetches not started yet, unless they are for `keep`.
+
+        `keep` is the (title url, translator) being navigated; a missing
+        translator means the title's own pages, which keep them too.
+        """
+        if keep is not None and self.prefetching is not None:
+            url, translation = keep
+            if url == self.prefetching[0] and translation in (None, self.prefetching[1]):
+                return
+        prefetches, self.prefetches = self.prefetches, []
+        self.prefetching = None
+        for future in prefetches:
+            future.cancel()
+
+    def to_dict(self):
+        return {"search": self.search}
+
+
+class SessionStore:
+    """Per-device sessions keyed by box_mac.
+
+    Lookups of a known box are a plain dict read and take no lock; only
+    creating a session locks, and that is also when idle sessions are
+    dropped and, above `maxsize`, the least recently seen ones.
+    """
+
+    def __init__(self, maxsize=256, idle_ttl=6 * 3600, shared=None):
+        self.maxsize = maxsize
+        self.idle_ttl = idle_ttl
+        self.shared = shared
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, box_mac):
+        box_mac = box_mac or "local"
+        session = self._sessions.get(box_mac)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(box_mac)
+                if session is None:
+                    self._evict(len(self._sessions) + 1 - self.maxsize)
+                    session = self._sessions[box_mac] = DeviceSession(box_mac, self.shared, self.idle_ttl)
+        session.last_seen = time.monotonic()
+        return session
+
+    def _evict(self, excess):
+        """Drop idle sessions, then the `excess` least recently seen ones. Called under the lock."""
+        deadline = time.monotonic() - self.idle_ttl
+        stale = [s for s in self._sessions.values() if s.last_seen < deadline]
+        if excess > 0:
+            # Make room for a few more boxes so a full store isn't scanned on every insert
+            excess = max(excess, self.maxsize // 8)
+        if excess > len(stale):
+            active = sorted(
+                (s for s in self._sessions.values() if s.last_seen >= deadline),
+                key=lambda s: s.last_seen,
+            )
+            stale += active[:excess - len(stale)]
+        if not stale:
+            return
+        sessions = dict(self._sessions)
+        for session in stale:
+            del sessions[session.box_mac]
+            session.cancel_prefetches()
+        # Swap in a new dict so lock-free readers never see it mid-update
+        self._sessions = sessions
+        self.evictions += len(stale)
+
+    def snapshot(self):
+        return {box_mac: session.to_dict() for box_mac, session in list(self._sessions.items())}
+
+    def restore(self, data):
+        for box_mac, state in data.items():
+            self.get(box_mac).search = state.get("search", {})
+
+    def stats(self):
+        return {
+            "size": len(self._sessions),
+            "maxsize": self.maxsize,
+            "evictions": self.evictions,
+        }
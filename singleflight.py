@@ -0,0 +1,73 @@
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesce concurrent calls doing the same work.
+
+    The first caller for a key runs the function, callers arriving while it
+    runs wait for its result or exception instead of repeating the work.
+    A waiter giving up after `timeout` seconds runs the function itself.
+    """
+
+    def __init__(self, timeout=60):
+        self.timeout = timeout
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.counters = {"calls": 0, "coalesced": 0, "errors": 0, "timeouts": 0}
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                leader = True
+                self.counters["calls"] += 1
+            else:
+                call.waiters += 1
+                leader = False
+                self.counters["coalesced"] += 1
+
+        if not leader:
+            finished = call.done.wait(self.timeout)
+            with self._lock:
+                call.waiters -= 1
+                if not finished:
+                    self.counters["timeouts"] += 1
+            if not finished:
+                return fn(*args, **kwargs)
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except Exception as e:
+            call.error = e
+            with self._lock:
+                self.counters["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats["in_flight"] = len(self._calls)
+            stats["waiting"] = sum(call.waiters for call in self._calls.values())
+        return stats
+
+
+def normalize(value):
+    """Key form of a request parameter: case and surrounding/extra spaces ignored."""
+    return " ".join(str(value or "").lower().split())
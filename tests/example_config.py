@@ -0,0 +1,34 @@
+"""config.py.example installed as `config`, for tests of modules reading it at import.
+
+Data files the settings point to (*_PATH) and the local video directories
+are moved to a temporary directory, so importing the server in a test
+never touches the data of a real installation.
+"""
+import atexit
+import importlib.machinery
+import importlib.util
+import os
+import shutil
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = tempfile.mkdtemp(prefix="forkplayer-tests-")
+atexit.register(shutil.rmtree, DATA_DIR, ignore_errors=True)
+
+
+def _load():
+    loader = importlib.machinery.SourceFileLoader("config", os.path.join(ROOT, "config.py.example"))
+    config = importlib.util.module_from_spec(importlib.util.spec_from_loader("config", loader))
+    loader.exec_module(config)
+    for name in dir(config):
+        if name.endswith("_PATH"):
+            setattr(config, name, os.path.join(DATA_DIR, os.path.basename(getattr(config, name))))
+    config.LOCAL_VIDEO_DIRS = [os.path.join(DATA_DIR, "videos")]
+    config.cache_config = dict(config.cache_config, CACHE_DIR=os.path.join(DATA_DIR, "flask_cache"))
+    return config
+
+
+config = sys.modules.get("config")
+if config is None or not getattr(config, "__file__", "").endswith("config.py.example"):
+    config = sys.modules["config"] = _load()
@@ -0,0 +1,65 @@
+import asyncio
+import time
+import unittest
+from unittest import mock
+
+from videobalancers import AsyncHdRezkaApi
+
+
+class FakeTitle(AsyncHdRezkaApi.AsyncHdRezkaApi):
+    """Season of four episodes; `failures` maps an episode to the attempts that fail."""
+
+    def __init__(self, failures=None, slow=()):
+        super().__init__("https://rezka.fi/series/1-test.html")
+        self.type = "video.tv_series"
+        self.translators = {"LostFilm": "56"}
+        self.seriesInfo = {"LostFilm": {"episodes": {"1": {str(e): str(e) for e in range(1, 5)}}}}
+        self.failures = dict(failures or {})
+        self.slow = slow
+        self.attempts = {}
+
+    async def getStream(self, season=None, episode=None, translation=None, index=0):
+        self.attempts[episode] = self.attempts.get(episode, 0) + 1
+        if episode in self.slow:
+            await asyncio.sleep(10)
+        if self.attempts[episode] <= self.failures.get(episode, 0):
+            raise ConnectionError("reset by peer")
+        return f"stream {episode}"
+
+
+class AsyncSeasonStreamsTest(unittest.TestCase):
+    def setUp(self):
+        for name, value in (("SEASON_BACKOFF", 0.01), ("SEASON_BACKOFF_MAX", 0.02)):
+            patcher = mock.patch.object(AsyncHdRezkaApi, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_failed_episodes_are_retried(self):
+        title = FakeTitle(failures={"2": 2})
+        streams = asyncio.run(title.getSeasonStreams("1", "LostFilm", retries=3))
+        self.assertEqual(streams, {str(e): f"stream {e}" for e in range(1, 5)})
+        self.assertEqual(title.attempts["2"], 3)
+
+    def test_episode_failing_every_retry_is_none_or_left_out(self):
+        title = FakeTitle(failures={"3": 10})
+        streams = asyncio.run(title.getSeasonStreams("1", "LostFilm", retries=2))
+        self.assertIsNone(streams["3"])
+        self.assertEqual(list(streams), ["1", "2", "3", "4"])
+        self.assertEqual(title.attempts["3"], 3)
+
+        streams = asyncio.run(FakeTitle(failures={"3": 10}).getSeasonStreams("1", "LostFilm", ignore=True))
+        self.assertEqual(list(streams), ["1", "2", "4"])
+
+    def test_episodes_past_the_deadline_are_dropped(self):
+        started = time.monotonic()
+        streams = asyncio.run(FakeTitle(slow=("4",)).getSeasonStreams("1", "LostFilm", deadline=0.1))
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(list(streams), ["1", "2", "3"])
+
+    def test_unknown_season(self):
+        with self.assertRaises(ValueError):
+            asyncio.run(FakeTitle().getSeasonStreams("2", "LostFilm"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import json
+import os
+import tempfile
+import unittest
+
+from tests import example_config  # noqa: F401, before catalog reads config
+from catalog import CatalogCache
+
+
+class CatalogCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "catalog_cache.json")
+        self.fetched = []
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def fetch(self, type, page):
+        self.fetched.append((type, page))
+        return [{"title": f"{type} {page}"}]
+
+    def cache(self, **kwargs):
+        return CatalogCache(fetch=self.fetch, path=self.path, **kwargs)
+
+    def test_browsed_pages_are_bounded(self):
+        catalog = self.cache(warm_pages=1, browse_cache_size=4)
+        for page in range(2, 12):
+            catalog.get("films", page)
+        self.assertEqual(len(catalog._browsed), 4)
+
+        # The most recently browsed pages are still served from memory
+        catalog.get("films", 11)
+        catalog.get("films", 8)
+        self.assertEqual(len(self.fetched), 10)
+        # An evicted one is fetched again
+        catalog.get("films", 2)
+        self.assertEqual(self.fetched[-1], ("films", 2))
+        self.assertEqual(len(catalog._browsed), 4)
+
+    def test_only_warm_pages_are_persisted(self):
+        catalog = self.cache(warm_pages=2, browse_cache_size=4)
+        for page in range(1, 6):
+            catalog.get("series", page)
+        with open(self.path, encoding="utf-8") as f:
+            self.assertEqual(set(json.load(f)), {"series/1", "series/2"})
+
+        reopened = self.cache(warm_pages=2, browse_cache_size=4)
+        self.assertEqual(reopened.get("series", 2), [{"title": "series 2"}])
+        self.assertEqual(len(self.fetched), 5)
+        reopened.get("series", 3)
+        self.assertEqual(self.fetched[-1], ("series", 3))
+
+    def test_pages_no_longer_warm_are_not_loaded(self):
+        self.cache(warm_pages=3).get("films", 3)
+        reopened = self.cache(warm_pages=1)
+        self.assertNotIn("films/3", reopened._pages)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import json
+import unittest
+from unittest import mock
+
+from flask import Flask
+
+import fastjson
+
+PAGE = {
+    "title": "Поиск",
+    "channels": [{"title": "Матрица", "logo_30x30": "http://host/res/film.png", "description": None}],
+    "typeList": "start",
+}
+
+
+class FastJSONProviderTest(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.json = fastjson.FastJSONProvider(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.addCleanup(self.app_context.pop)
+
+    def encoders(self):
+        """Run the block with orjson (when installed) and with the stdlib fallback."""
+        for orjson in (fastjson.orjson, None) if fastjson.orjson is not None else (None,):
+            with self.subTest(encoder="orjson" if orjson else "stdlib"), \
+                    mock.patch.object(fastjson, "orjson", orjson):
+                yield
+
+    def test_response_keeps_key_order_and_utf8(self):
+        for _ in self.encoders():
+            response = self.app.json.response(PAGE)
+            body = response.get_data()
+            self.assertEqual(json.loads(body), PAGE)
+            self.assertEqual(list(json.loads(body)), ["title", "channels", "typeList"])
+            self.assertIn("Матрица".encode(), body)
+            self.assertEqual(response.mimetype, "application/json")
+
+    def test_fragments_are_embedded(self):
+        for _ in self.encoders():
+            channels = fastjson.fragment(PAGE["channels"])
+            body = self.app.json.response({"title": "Поиск", "channels": channels, "typeList": "start"}).get_data()
+            self.assertEqual(json.loads(body), PAGE)
+
+    def test_dumps_and_loads(self):
+        for _ in self.encoders():
+            self.assertEqual(self.app.json.loads(self.app.json.dumps(PAGE)), PAGE)
+            self.assertEqual(json.loads(self.app.json.dumps({1: "a"})), {"1": "a"})
+            # Keyword arguments always go to the stdlib encoder
+            self.assertEqual(self.app.json.dumps({"b": 1, "a": 2}, sort_keys=True), '{"a": 2, "b": 1}')
+
+
+if __name__ == "__main__":
+    unittest.main()
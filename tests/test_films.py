@@ -0,0 +1,57 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from films import FETCH_WORKERS, FilmStore
+
+
+class FilmStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.fetched = []
+        self.store = FilmStore(os.path.join(self.dir.name, "films.db"), fetch=self.fetch)
+
+    def tearDown(self):
+        self.store.close()
+        self.dir.cleanup()
+
+    def fetch(self, film_id):
+        self.fetched.append(film_id)
+        time.sleep(0.02)
+        return {"filmId": int(film_id), "nameRu": f"Фильм {film_id}", "year": "2024"}
+
+    def test_prefetches_do_not_starve_get_many(self):
+        # More prefetches than fetch workers used to wait on the pool from inside it
+        futures = [f for n in range(FETCH_WORKERS * 2) for f in self.store.prefetch(range(n * 5, n * 5 + 5))]
+        done = threading.Event()
+        result = {}
+
+        def get_many():
+            result.update(self.store.get_many(range(100, 105)))
+            done.set()
+
+        threading.Thread(target=get_many, daemon=True).start()
+        self.assertTrue(done.wait(10), "get_many hung behind prefetches")
+        self.assertEqual(sorted(result), [str(i) for i in range(100, 105)])
+        for future in futures:
+            self.assertIsNotNone(future.result(timeout=10))
+
+    def test_search_results_need_no_fetch(self):
+        self.store.add_many([{"filmId": 7, "nameRu": "Семь", "year": "1995"}])
+        self.assertEqual(self.store.get(7)["nameRu"], "Семь")
+        self.assertEqual(self.store.prefetch([7]), [])
+        self.assertEqual(self.fetched, [])
+
+    def test_concurrent_lookups_fetch_once(self):
+        threads = [threading.Thread(target=self.store.get, args=("42",)) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.fetched, ["42"])
+
+
+if __name__ == "__main__":
+    unittest.main()
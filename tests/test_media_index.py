@@ -0,0 +1,100 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import media_index
+from media_index import MediaIndex
+
+
+class MediaIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tmp.name, "videos")
+        self.db = os.path.join(self.tmp.name, "media_index.db")
+        self.indexes = []
+        self.touch("Films/Alien.mkv")
+        self.touch("Films/notes.txt")
+        self.touch("Series/S01/e01.mp4")
+        self.touch("Series/S01/e02.MP4")
+        self.touch("clip.webm")
+
+    def tearDown(self):
+        for index in self.indexes:
+            index.close()
+        self.tmp.cleanup()
+
+    def touch(self, relative_path):
+        path = os.path.join(self.root, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, "w").close()
+        return path
+
+    def open(self):
+        index = MediaIndex([self.root], path=self.db)
+        self.indexes.append(index)
+        return index
+
+    def relative_paths(self, index):
+        return [video["relative_path"] for video in index.videos()]
+
+    def test_scan_lists_videos_sorted(self):
+        index = self.open()
+        self.assertEqual(index.scan(), 4)  # every directory listed once
+        self.assertEqual(self.relative_paths(index), [
+            "clip.webm",
+            os.path.join("Films", "Alien.mkv"),
+            os.path.join("Series", "S01", "e01.mp4"),
+            os.path.join("Series", "S01", "e02.MP4"),
+        ])
+        video = index.videos()[0]
+        self.assertEqual(video["directory"], self.root)
+        self.assertEqual(video["path"], os.path.join(self.root, "clip.webm"))
+
+    def test_rescan_lists_only_changed_directories(self):
+        index = self.open()
+        index.scan()
+        self.assertEqual(index.scan(), 0)
+
+        self.touch("Series/S01/e03.mkv")
+        list_dir = media_index._list_dir
+        with mock.patch.object(media_index, "_list_dir", side_effect=list_dir) as listed:
+            self.assertEqual(index.scan(), 1)
+        listed.assert_called_once_with(os.path.join(self.root, "Series", "S01"))
+        self.assertIn(os.path.join("Series", "S01", "e03.mkv"), self.relative_paths(index))
+
+    def test_removed_directories_leave_the_index(self):
+        index = self.open()
+        index.scan()
+        for name in ("e01.mp4", "e02.MP4"):
+            os.remove(os.path.join(self.root, "Series", "S01", name))
+        os.rmdir(os.path.join(self.root, "Series", "S01"))
+        index.scan()
+        self.assertEqual(self.relative_paths(index), ["clip.webm", os.path.join("Films", "Alien.mkv")])
+        self.assertEqual(index.stats()["directories"], 3)
+
+    def test_index_survives_restart(self):
+        self.open().scan()
+        reopened = self.open()
+        self.assertEqual(len(reopened.videos()), 4)
+        # Nothing changed on disk, so nothing is listed again
+        self.assertEqual(reopened.scan(), 0)
+
+    def test_other_workers_pick_up_scans(self):
+        scanner, reader = self.open(), self.open()
+        scanner.scan()
+        self.assertEqual(len(reader.videos()), 4)
+        self.touch("Films/Aliens.mkv")
+        scanner.scan()
+        self.assertEqual(len(reader.videos()), 5)
+
+    def test_pages(self):
+        index = self.open()
+        index.scan()
+        videos, total = index.page(2, per_page=3)
+        self.assertEqual(total, 4)
+        self.assertEqual([video["title"] for video in videos], ["e02.MP4"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+
+from tests import example_config  # noqa: F401, before VideoBalancersApi reads config
+from provider_index import ProviderIndex
+import VideoBalancersApi
+
+
+class ProviderIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "provider_index.db")
+        self.index = ProviderIndex(self.path)
+        self.calls = 0
+
+    def tearDown(self):
+        self.index.close()
+        self.tmp.cleanup()
+
+    def resolver(self, result):
+        def resolve():
+            self.calls += 1
+            if isinstance(result, Exception):
+                raise result
+            return result
+        return resolve
+
+    def test_not_found_is_stored(self):
+        self.assertIsNone(self.index.resolve(301, "hdRezka", self.resolver(None)))
+        self.assertIsNone(self.index.resolve(301, "hdRezka", self.resolver("https://rezka/301.html")))
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(self.index.get(301, "hdRezka"), (None, True))
+
+    def test_inconclusive_lookup_is_not_stored(self):
+        with self.assertRaises(LookupError):
+            self.index.resolve(301, "hdRezka", self.resolver(LookupError("rezka is down")))
+        self.assertIsNone(self.index.get(301, "hdRezka"))
+        self.assertEqual(self.index.resolve(301, "hdRezka", self.resolver("https://rezka/301.html")),
+                         "https://rezka/301.html")
+        self.assertEqual(self.calls, 2)
+
+    def test_entries_survive_reopening(self):
+        self.index.resolve(301, "hdRezka", self.resolver("https://rezka/301.html"))
+        self.index.resolve(302, "hdRezka", self.resolver(None))
+        self.index.close()
+        self.index = ProviderIndex(self.path)
+        self.assertEqual(self.index.get(301, "hdRezka"), ("https://rezka/301.html", True))
+        self.assertEqual(self.index.get(302, "hdRezka"), (None, True))
+
+    def test_negative_entries_use_their_own_ttl(self):
+        self.index = ProviderIndex(self.path, ttls={"hdRezka": (3600, 0)})
+        self.index.resolve(301, "hdRezka", self.resolver(None))
+        self.assertEqual(self.index.get(301, "hdRezka"), (None, False))
+
+
+class UnknownTitleTest(unittest.TestCase):
+    def test_lookups_without_a_title_are_inconclusive(self):
+        api = VideoBalancersApi.VideoBalancersApi(301)
+        search_data = {"kp_id": 301, "query": None, "query_rus": None}
+        for find in (api.find_rezka_url, api.find_rutracker, api.find_filmach):
+            with self.subTest(find.__name__), self.assertRaises(LookupError):
+                find(search_data)
+        # get_rezka_url reports it as not found without storing anything
+        self.assertIsNone(api.get_rezka_url(search_data))
+        self.assertIsNone(VideoBalancersApi.provider_index.get(301, "hdRezka"))
+
+
+if __name__ == "__main__":
+    unittest.main()
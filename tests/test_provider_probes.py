@@ -0,0 +1,83 @@
+import itertools
+import threading
+import time
+import unittest
+from unittest import mock
+
+from tests import example_config  # noqa: F401, before VideoBalancersApi reads config
+import VideoBalancersApi
+
+_kp_ids = itertools.count(900000)
+
+
+class ProviderProbeTest(unittest.TestCase):
+    def setUp(self):
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)  # don't leave probe workers blocked
+        self.calls = []
+        for name, value in (("PROVIDER_DEADLINE", 0.2), ("PROVIDER_GRACE", 0.05),
+                            ("PROBE_TIMEOUTS", {"hdRezka": 0.3, "rutracker": 0.3})):
+            patcher = mock.patch.object(VideoBalancersApi, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.search_data = {"kp_id": next(_kp_ids), "query": "Film 2020", "query_rus": "Фильм 2020"}
+
+    def api(self, **finders):
+        api = VideoBalancersApi.VideoBalancersApi(self.search_data["kp_id"])
+        api.enabled_providers = lambda: finders
+        return api
+
+    def found(self, provider, url):
+        def find(search_data):
+            self.calls.append(provider)
+            return url
+        return find
+
+    def hanging(self, provider):
+        def find(search_data):
+            self.calls.append(provider)
+            self.release.wait(10)
+            return None
+        return find
+
+    def test_slow_provider_is_still_checking(self):
+        api = self.api(hdRezka=self.found("hdRezka", "https://rezka/1.html"), rutracker=self.hanging("rutracker"))
+        started = time.monotonic()
+        found, checking = api.get_providers(self.search_data)
+        # A provider had the title, so only the grace period was waited for the other
+        self.assertLess(time.monotonic() - started, 0.2)
+        self.assertEqual((found, checking), (["hdRezka"], ["rutracker"]))
+        self.assertEqual(api.url, "https://rezka/1.html")
+
+    def test_probe_past_its_timeout_stays_in_the_menu(self):
+        api = self.api(rutracker=self.hanging("rutracker"))
+        self.assertEqual(api.get_providers(self.search_data), ([], ["rutracker"]))
+        time.sleep(0.35)  # past PROBE_TIMEOUTS["rutracker"]
+        timeouts = VideoBalancersApi.probe_stats().get("rutracker", {}).get("timeouts", 0)
+
+        started = time.monotonic()
+        self.assertEqual(api.get_providers(self.search_data), ([], ["rutracker"]))
+        # Nothing to wait for and no second probe behind the hanging one
+        self.assertLess(time.monotonic() - started, 0.1)
+        self.assertEqual(self.calls, ["rutracker"])
+        self.assertEqual(VideoBalancersApi.probe_stats()["rutracker"]["timeouts"], timeouts + 1)
+
+        self.release.set()
+        time.sleep(0.05)
+        self.assertEqual(api.get_providers(self.search_data), ([], []))
+
+    def test_failed_probe_is_retried_next_time(self):
+        def failing(search_data):
+            self.calls.append("hdRezka")
+            raise LookupError("rezka is down")
+
+        api = self.api(hdRezka=failing)
+        self.assertEqual(api.get_providers(self.search_data), ([], []))
+        self.assertIsNone(VideoBalancersApi.provider_index.get(self.search_data["kp_id"], "hdRezka"))
+        api = self.api(hdRezka=self.found("hdRezka", "https://rezka/2.html"))
+        self.assertEqual(api.get_providers(self.search_data), (["hdRezka"], []))
+        self.assertEqual(self.calls, ["hdRezka", "hdRezka"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import HdRezkaApi as root_rezka
+from videobalancers import HdRezkaApi
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, content=b"", content_type="text/html", url="https://rezka.fi/", cookies=None):
+        self.status_code = status_code
+        self.content = content
+        self.text = content.decode()
+        self.headers = {"Content-Type": content_type}
+        self.url = url
+        self.cookies = cookies or {}
+
+    def json(self):
+        return json.loads(self.content)
+
+
+def login_response(success):
+    body = json.dumps({"success": success, "message": "" if success else "Неверный пароль"}).encode()
+    return FakeResponse(content=body, content_type="application/json",
+                        cookies={"dle_user_id": "1", "PHPSESSID": "x"} if success else {})
+
+
+class HdRezkaAuthTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.auth = HdRezkaApi.HdRezkaAuth("rezka.fi", cookies_file=os.path.join(self.tmp.name, "cookies"))
+        self.auth.configure("user", "secret")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_failed_login_is_retried_after_backoff(self):
+        with mock.patch("upstream.post", return_value=login_response(False)) as post:
+            self.assertEqual(self.auth.cookies(), {})
+            self.assertEqual(self.auth.cookies(), {})  # within the backoff, no new login
+            self.assertEqual(post.call_count, 1)
+
+        self.auth._retry_at = 0  # backoff over
+        with mock.patch("upstream.post", return_value=login_response(True)) as post:
+            self.assertEqual(self.auth.cookies()["dle_user_id"], "1")
+            self.auth.cookies()
+            self.assertEqual(post.call_count, 1)
+        self.assertEqual(self.auth.login_failures, 1)
+
+    def test_login_error_page_is_a_failure(self):
+        with mock.patch("upstream.post", return_value=FakeResponse(content=b"<html>502</html>")):
+            self.assertEqual(self.auth.cookies(), {})
+        self.assertIsNone(self.auth._cookies)
+
+    def test_relogin_replaces_stale_jar_once(self):
+        with mock.patch("upstream.post", return_value=login_response(True)) as post:
+            stale = self.auth.cookies()
+            fresh = self.auth.relogin(stale)
+            self.assertIs(self.auth.relogin(stale), fresh)  # another thread already did it
+            self.assertEqual(post.call_count, 2)
+
+    def test_expired_responses(self):
+        expired = HdRezkaApi.HdRezkaAuth.expired
+        self.assertTrue(expired(FakeResponse(status_code=401)))
+        self.assertTrue(expired(FakeResponse(url="https://rezka.fi/login/")))
+        self.assertTrue(expired(FakeResponse(
+            content=b'<form><input type="password" name="login_password"></form>')))
+        self.assertTrue(expired(FakeResponse(
+            content='{"success": false, "message": "Требуется авторизация"}'.encode(),
+            content_type="application/json")))
+        self.assertFalse(expired(FakeResponse(content=b'<div class="b-post__title">Film</div>')))
+        self.assertFalse(expired(FakeResponse(content=b'{"success": true}', content_type="application/json")))
+
+
+class RootLoginTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        root_rezka._cookies = None
+        root_rezka._login_retry_at = 0.0
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        root_rezka._cookies = None
+        root_rezka._login_retry_at = 0.0
+        self.tmp.cleanup()
+
+    def test_cookie_file_is_read_once(self):
+        with open("rezka_cookies", "w") as fl:
+            json.dump({"dle_user_id": "1"}, fl)
+        first = root_rezka.login("rezka.si", {}, "user", "secret")
+        os.remove("rezka_cookies")
+        self.assertIs(root_rezka.login("rezka.si", {}, "user", "secret"), first)
+
+    def test_failed_login_is_not_kept(self):
+        with mock.patch("upstream.post", return_value=login_response(False)) as post:
+            self.assertEqual(root_rezka.login("rezka.si", {}, "user", "secret"), {})
+            self.assertEqual(root_rezka.login("rezka.si", {}, "user", "secret"), {})
+            self.assertEqual(post.call_count, 1)
+        root_rezka._login_retry_at = 0.0
+        with mock.patch("upstream.post", return_value=login_response(True)):
+            cookies = root_rezka.login("rezka.si", {}, "user", "secret")
+        self.assertEqual(cookies, {"dle_user_id": "1", "hdmbbs": "1"})
+
+
+if __name__ == "__main__":
+    unittest.main()
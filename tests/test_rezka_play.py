@@ -0,0 +1,75 @@
+import unittest
+from unittest import mock
+
+from tests import example_config  # noqa: F401, before server reads config
+import server
+from videobalancers import HdRezkaApi
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class FakeTitle:
+    """Resolves a new CDN link per getStream call, cached like HdRezkaApi does."""
+
+    url = "https://rezka.fi/series/1-test.html"
+
+    def __init__(self):
+        self.resolves = 0
+
+    def getStream(self, season=None, episode=None, translation=None):
+        key = ("test-title", translation, season, episode)
+        stream = HdRezkaApi.stream_cache.get(key)
+        if stream is None:
+            self.resolves += 1
+            stream = HdRezkaApi.HdRezkaStream(season, episode, {"data": None, "codes": {}})
+            stream.append("720p", f"https://cdn.example/v{self.resolves}/720.mp4:hls:manifest.m3u8")
+            HdRezkaApi.cacheStream(key, stream)
+        return stream
+
+
+class RezkaPlayTest(unittest.TestCase):
+    def setUp(self):
+        HdRezkaApi.stream_cache.clear()
+        self.title = FakeTitle()
+        patcher = mock.patch.object(server, "get_rezka", return_value=self.title)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = server.app.test_client()
+
+    def play(self, head):
+        with mock.patch.object(server.upstream.client, "request", side_effect=head) as request:
+            response = self.client.get(
+                "/rezka/play", query_string={"url": FakeTitle.url, "translation": "56", "res": "720p", "s": "1", "e": "2"})
+        self.assertEqual(response.status_code, 302)
+        return response.headers["Location"], request
+
+    def test_working_link_is_served_from_cache(self):
+        self.title.getStream("1", "2", translation="56")
+        location, head = self.play([FakeResponse(200)])
+        self.assertEqual(location, "http://cdn.example/v1/720.mp4")
+        self.assertEqual(head.call_args.args[:2], ("HEAD", "http://cdn.example/v1/720.mp4"))
+        self.assertEqual(self.title.resolves, 1)
+
+    def test_dead_link_is_resolved_again(self):
+        for status in (403, 410):
+            with self.subTest(status):
+                location, head = self.play([FakeResponse(status)])
+                dead = head.call_args.args[1]
+                self.assertEqual(location, f"http://cdn.example/v{self.title.resolves}/720.mp4")
+                self.assertNotEqual(location, dead)
+        self.assertEqual(self.title.resolves, 3)
+        # The fresh link is what the next play gets
+        location, _ = self.play([FakeResponse(200)])
+        self.assertEqual(location, f"http://cdn.example/v{self.title.resolves}/720.mp4")
+
+    def test_unreachable_cdn_keeps_the_link(self):
+        location, _ = self.play(server.upstream.RequestException("timed out"))
+        self.assertEqual(location, "http://cdn.example/v1/720.mp4")
+        self.assertEqual(self.title.resolves, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import threading
+import time
+import unittest
+
+from singleflight import SingleFlight
+from videobalancers.HdRezkaApi import HdRezkaApi
+
+
+class FakeTitle:
+    """Just what prefetchStreams needs of a loaded title."""
+
+    def __init__(self, upcoming):
+        self.upcoming = upcoming
+
+    def nextEpisodes(self, season, episode, translation=None, count=1):
+        return self.upcoming[:count]
+
+    def getStream(self, season, episode, translation=None):
+        raise AssertionError("resolve should be used instead")
+
+
+class PrefetchTest(unittest.TestCase):
+    def test_request_joins_running_prefetch(self):
+        flights = SingleFlight(timeout=5)
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def get_stream(season, episode, translation=None):
+            calls.append((season, episode))
+            started.set()
+            release.wait(5)
+            return f"stream s{season}e{episode}"
+
+        def resolve(season, episode):
+            return flights.do(("rezka_stream", "title", "56", season, episode), get_stream, season, episode)
+
+        futures = HdRezkaApi.prefetchStreams(
+            FakeTitle([("1", "2")]), "1", "1", translation="56", count=1, resolve=resolve)
+        self.assertTrue(started.wait(5))
+
+        result = []
+        click = threading.Thread(target=lambda: result.append(resolve("1", "2")))
+        click.start()
+        while not flights.stats()["waiting"] and click.is_alive():
+            time.sleep(0.001)
+        release.set()
+        click.join(5)
+        futures[0].result(5)
+
+        self.assertEqual(result, ["stream s1e2"])
+        self.assertEqual(calls, [("1", "2")])
+        self.assertEqual(flights.stats()["coalesced"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
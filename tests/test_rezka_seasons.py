@@ -0,0 +1,51 @@
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from videobalancers import HdRezkaApi
+
+
+class FakeTitle(HdRezkaApi.HdRezkaApi):
+    """HdRezkaApi with translators known and episode lists fetched from a dict."""
+
+    def __init__(self, translators):
+        self.translators = translators
+        self.seriesInfo = None
+        self._seasonFutures = {}
+        self._seasonLock = threading.RLock()
+        self.fetched = []
+
+    def getTranslatorEpisodes(self, tr_str):
+        self.fetched.append(tr_str)
+        self.seriesInfo[tr_str] = {"translator_id": self.translators[tr_str], "seasons": {}, "episodes": {}}
+
+
+class GetSeasonsTest(unittest.TestCase):
+    def setUp(self):
+        # One worker: the queue order is the fetch order
+        pool = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(pool.shutdown)
+        patcher = mock.patch.object(HdRezkaApi, "_fetch_pool", pool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.title = FakeTitle({"HDrezka Studio": "110", "LostFilm": "56", "Original": "238"})
+
+    def test_requested_translator_is_fetched_first(self):
+        seasons = self.title.getSeasons("56")
+        self.assertEqual(self.title.fetched[0], "LostFilm")
+        self.assertIn("LostFilm", seasons)
+        HdRezkaApi._fetch_pool.submit(lambda: None).result()  # let the others finish
+        self.assertEqual(self.title.fetched, ["LostFilm", "HDrezka Studio", "Original"])
+
+    def test_lazy_fetches_only_the_requested_translator(self):
+        self.assertEqual(list(self.title.getSeasons("Original", lazy=True)), ["Original"])
+        self.assertEqual(self.title.fetched, ["Original"])
+
+    def test_without_translation_all_are_fetched_in_order(self):
+        self.assertEqual(len(self.title.getSeasons()), 3)
+        self.assertEqual(self.title.fetched, ["HDrezka Studio", "LostFilm", "Original"])
+
+
+if __name__ == "__main__":
+    unittest.main()
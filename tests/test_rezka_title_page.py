@@ -0,0 +1,82 @@
+import unittest
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+from videobalancers.HdRezkaApi import HdRezkaTitlePage
+
+FIXTURES = Path(__file__).parent / "fixtures"
+PAGES = ["rezka_series_page.html", "rezka_movie_page.html", "rezka_cartoon_page.html"]
+INIT_CDN_EVENTS = {
+    "video.tv_series": "initCDNSeriesEvents",
+    "video.movie": "initCDNMoviesEvents",
+}
+
+
+def soup_fields(content):
+    """The fields as HdRezkaApi read them from an html.parser soup before HdRezkaTitlePage."""
+    soup = BeautifulSoup(content, "html.parser")
+    fields = {
+        "id": soup.find(id="post_id").attrs["value"],
+        "name": soup.find(class_="b-post__title").get_text().strip(),
+        "type": soup.find("meta", property="og:type").attrs["content"],
+        "favs": soup.find(id="ctrl_favs").attrs["value"],
+    }
+
+    translators = {}
+    translators_list = soup.find(id="translators-list")
+    if translators_list:
+        for child in translators_list.find_all(recursive=False):
+            if child.text:
+                translators[child.text] = child.attrs["data-translator_id"]
+    fields["translators"] = translators
+
+    fields["translator_name"] = None
+    for row in soup.find(class_="b-post__info").find_all("tr"):
+        text = row.get_text()
+        if text.find("переводе") > 0:
+            fields["translator_name"] = text.split("В переводе:")[-1].strip()
+            break
+
+    page_text = content.decode("utf-8")
+    call = page_text.split(f"sof.tv.{INIT_CDN_EVENTS[fields['type']]}")[-1].split("{")[0]
+    fields["default_translator_id"] = call.split(",")[1].strip()
+    return fields
+
+
+class HdRezkaTitlePageTest(unittest.TestCase):
+    """HdRezkaTitlePage (lxml) against the BeautifulSoup extraction it replaced."""
+
+    def test_fields_match_soup_extraction(self):
+        for name in PAGES:
+            content = (FIXTURES / name).read_bytes()
+            expected = soup_fields(content)
+            page = HdRezkaTitlePage(content)
+            with self.subTest(name):
+                self.assertEqual(page.id, expected["id"])
+                self.assertEqual(page.name, expected["name"])
+                self.assertEqual(page.type, expected["type"])
+                self.assertEqual(page.favs, expected["favs"])
+                self.assertEqual(page.translators, expected["translators"])
+                self.assertEqual(page.translator_name, expected["translator_name"])
+                self.assertEqual(page.defaultTranslatorId(page.type), expected["default_translator_id"])
+
+    def test_cdn_events_arguments(self):
+        page = HdRezkaTitlePage((FIXTURES / "rezka_series_page.html").read_bytes())
+        self.assertEqual(
+            page.cdn_events["initCDNSeriesEvents"],
+            ["65432", "111", "1", "1", "false", "'rezka.ag'", "false"],
+        )
+        movie = HdRezkaTitlePage((FIXTURES / "rezka_movie_page.html").read_bytes())
+        self.assertEqual(list(movie.cdn_events), ["initCDNMoviesEvents"])
+        self.assertEqual(movie.defaultTranslatorId("video.movie"), "66")
+
+    def test_movie_without_translators_list(self):
+        page = HdRezkaTitlePage((FIXTURES / "rezka_movie_page.html").read_bytes())
+        self.assertEqual(page.translators, {})
+        self.assertEqual(page.translator_name, "Дубляж")
+        self.assertEqual(page.name, "Обратный отсчёт & ноль")
+
+
+if __name__ == "__main__":
+    unittest.main()
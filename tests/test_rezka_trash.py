@@ -0,0 +1,39 @@
+import json
+import unittest
+from pathlib import Path
+
+import HdRezkaApi as root_module
+from videobalancers import HdRezkaApi
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def load_fixture(name):
+    with open(FIXTURES / name, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class ClearTrashTest(unittest.TestCase):
+    """clearTrash against stream URLs decoded with the original replace loop."""
+
+    def test_fixtures_decode_like_before(self):
+        for case in load_fixture("rezka_stream_urls.json"):
+            with self.subTest(case["name"]):
+                self.assertEqual(HdRezkaApi.HdRezkaApi.clearTrash(case["payload"]), case["decoded"])
+                self.assertEqual(root_module.HdRezkaApi.clearTrash(case["payload"]), case["decoded"])
+
+    def test_trash_nested_in_trash_is_left(self):
+        # The old code replaced each of the 150 codes in turn, so a code split
+        # by another one ("JC" + "QEA=" + "Qk") was removed too once the inner
+        # one was gone. The single-pass regex removes the inner code only.
+        # rezka inserts codes between "//_//" separators, never inside one.
+        self.assertEqual(HdRezkaApi.TRASH_PATTERN.sub("", "JCQEA=Qk"), "JCQk")
+
+    def test_every_trash_code_is_matched(self):
+        for code in ["QEA=", "JCQ=", "QEBA", "JCQk", "XiFe"]:
+            with self.subTest(code):
+                self.assertEqual(HdRezkaApi.TRASH_PATTERN.sub("", f"aHR0{code}cHM6"), "aHR0cHM6")
+
+
+if __name__ == "__main__":
+    unittest.main()
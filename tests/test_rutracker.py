@@ -0,0 +1,93 @@
+import contextlib
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import upstream
+from videobalancers.RutrackerApi import Rutracker
+
+LOGGED_IN = '<a id="logged-in-username">user</a>'
+TOPIC = LOGGED_IN + '<a class="magnet-link" href="magnet:?xt=urn:btih:abc">magnet</a>'
+CAPTCHA = ('<form><input name="cap_sid" value="1"><input name="cap_code_x">'
+           '<img src="https://static.rutracker.cc/captcha/1.jpg?v=1"></form>')
+
+
+class FakeResponse:
+    def __init__(self, text, status_code=200):
+        self.text = text
+        self.content = text.encode()
+        self.status_code = status_code
+
+
+class FakeCookies(dict):
+    def get_dict(self):
+        return dict(self)
+
+
+class FakeSession:
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.cookies = FakeCookies()
+        self.calls = []
+
+    def post(self, url, **kwargs):
+        self.calls.append((url, kwargs))
+        self.cookies["bb_session"] = "fresh"
+        return FakeResponse(self.replies.pop(0))
+
+
+class FakePool:
+    def __init__(self, session):
+        self.session = session
+
+    @contextlib.contextmanager
+    def dedicated(self):
+        yield self.session
+
+
+class RutrackerTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)  # rt_cookies.txt and captcha.jpg live in the working directory
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def test_requests_go_through_the_pool_with_saved_cookies(self):
+        with open("rt_cookies.txt", "w") as f:
+            f.write("bb_session:saved\n")
+        replies = [FakeResponse(LOGGED_IN), FakeResponse(TOPIC)]
+        proxies = {"https": "socks5://proxy:1080"}
+        with mock.patch.object(upstream.client, "request", side_effect=replies) as request, \
+                mock.patch("time.sleep"):
+            tracker = Rutracker("user", "secret", "https://rutracker.org/", proxies=proxies, timeout=(5, 15))
+            self.assertEqual(tracker.get_magnet_link(1), "magnet:?xt=urn:btih:abc")
+        for call in request.call_args_list:
+            self.assertEqual(call.kwargs["cookies"], {"bb_session": "saved"})
+            self.assertEqual(call.kwargs["proxies"], proxies)
+            self.assertEqual(call.kwargs["timeout"], (5, 15))
+        self.assertEqual(request.call_args.args, ("GET", "https://rutracker.org/forum/viewtopic.php?t=1"))
+
+    def test_login_keeps_cookies_of_its_own_session(self):
+        session = FakeSession([LOGGED_IN, LOGGED_IN])
+        with mock.patch.object(upstream.client, "pool", return_value=FakePool(session)):
+            tracker = Rutracker("user", "secret", "https://rutracker.org/")
+        self.assertEqual(tracker.session_cookies, {"bb_session": "fresh"})
+        self.assertEqual(session.calls[0][1]["timeout"], upstream.client.timeout)
+        with open("rt_cookies.txt") as f:
+            self.assertEqual(f.read(), "bb_session:fresh\n")
+
+    def test_captcha_fails_without_prompting(self):
+        session = FakeSession([CAPTCHA])
+        with mock.patch.object(upstream.client, "pool", return_value=FakePool(session)), \
+                mock.patch("builtins.input") as prompt:
+            with self.assertRaises(ConnectionError):
+                Rutracker("user", "secret", "https://rutracker.org/", interactive=False)
+        prompt.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
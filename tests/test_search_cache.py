@@ -0,0 +1,105 @@
+import os
+import tempfile
+import time
+import unittest
+
+from search_cache import KeywordSearchCache, normalize_query
+
+
+def film(film_id, name_ru, name_en=None):
+    return {"filmId": film_id, "nameRu": name_ru, "nameEn": name_en}
+
+
+class KeywordSearchCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "kp_search.db")
+        self.caches = []
+        self.fetched = []
+        self.results = {}
+
+    def tearDown(self):
+        for cache in self.caches:
+            cache.close()
+        self.tmp.cleanup()
+
+    def open(self, **kwargs):
+        cache = KeywordSearchCache(self.path, **kwargs)
+        self.caches.append(cache)
+        return cache
+
+    def fetch(self, query):
+        self.fetched.append(query)
+        films = self.results.get(normalize_query(query), [])
+        return {"keyword": query, "films": films, "searchFilmsCountResult": len(films)}
+
+    def test_repeated_query_is_cached(self):
+        cache = self.open()
+        self.results["матрица"] = [film(301, "Матрица", "The Matrix")]
+        first = cache.search("Матрица", self.fetch)
+        self.assertEqual(cache.search("  матрица ", self.fetch), first)
+        self.assertEqual(self.fetched, ["Матрица"])
+        self.assertEqual(cache.stats()["hits"], 1)
+
+    def test_longer_query_is_filtered_from_a_complete_prefix(self):
+        cache = self.open()
+        self.results["мат"] = [
+            film(301, "Матрица", "The Matrix"),
+            film(302, "Матрица: Перезагрузка", "The Matrix Reloaded"),
+            film(303, "Матч", "Match"),
+        ]
+        cache.search("мат", self.fetch)
+        result = cache.search("Матрица пере", self.fetch)
+        self.assertEqual([f["filmId"] for f in result["films"]], [302])
+        self.assertEqual(result["searchFilmsCountResult"], 1)
+        self.assertEqual(result["keyword"], "Матрица пере")
+        self.assertEqual(self.fetched, ["мат"])
+        self.assertEqual(cache.stats()["prefix_hits"], 1)
+
+    def test_incomplete_prefix_is_not_reused(self):
+        cache = self.open()
+        # Kinopoisk returned the first page of more matches
+        cache._store("мат", {"films": [film(303, "Матч")], "searchFilmsCountResult": 40})
+        self.results["матрица"] = [film(301, "Матрица")]
+        result = cache.search("матрица", self.fetch)
+        self.assertEqual([f["filmId"] for f in result["films"]], [301])
+        self.assertEqual(self.fetched, ["матрица"])
+
+    def test_prefix_without_matches_answers_longer_queries(self):
+        cache = self.open()
+        cache.search("qwz", self.fetch)
+        self.assertEqual(cache.search("qwzx", self.fetch)["films"], [])
+        self.assertEqual(self.fetched, ["qwz"])
+
+    def test_prefix_reuse_across_words(self):
+        cache = self.open()
+        self.results["the"] = [film(1, None, "The Matrix")]
+        cache.search("the", self.fetch)
+        # "the" answers "the matrix" as well
+        result = cache.search("the matrix", self.fetch)
+        self.assertEqual([f["filmId"] for f in result["films"]], [1])
+        self.assertEqual(self.fetched, ["the"])
+
+    def test_api_errors_are_not_cached(self):
+        cache = self.open()
+        self.assertEqual(cache.search("матрица", lambda query: None)["films"], [])
+        self.results["матрица"] = [film(301, "Матрица")]
+        self.assertEqual(len(cache.search("матрица", self.fetch)["films"]), 1)
+        self.assertEqual(cache.stats()["api_errors"], 1)
+
+    def test_results_survive_restart_and_expire(self):
+        self.results["матрица"] = [film(301, "Матрица")]
+        self.open(negative_ttl=0.05).search("матрица", self.fetch)
+        self.open(negative_ttl=0.05).search("пусто", self.fetch)
+        reopened = self.open(negative_ttl=0.05)
+        reopened.search("матрица", self.fetch)
+        self.assertEqual(self.fetched, ["матрица", "пусто"])
+        time.sleep(0.1)
+        # Empty results expire after negative_ttl, found ones after ttl
+        self.open(negative_ttl=0.05).search("пусто", self.fetch)
+        self.assertEqual(self.fetched, ["матрица", "пусто", "пусто"])
+        self.assertEqual(reopened.stats()["api_calls_today"], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
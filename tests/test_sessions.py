@@ -0,0 +1,129 @@
+import threading
+import time
+import unittest
+
+from sessions import SessionStore
+
+
+class FakeFuture:
+    def __init__(self):
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def done(self):
+        return self.cancelled
+
+
+def run_threads(target, count):
+    errors = []
+
+    def run(index):
+        try:
+            target(index)
+        except Exception as e:  # collected, assertions in threads don't fail the test
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+
+class SessionStoreTest(unittest.TestCase):
+    def test_boxes_are_isolated_under_concurrency(self):
+        store = SessionStore(maxsize=256)
+
+        def box(index):
+            mac = f"00:00:00:00:00:{index:02x}"
+            first = store.get(mac)
+            for step in range(300):
+                session = store.get(mac)
+                if session is not first or session.box_mac != mac:
+                    raise AssertionError(f"{mac} got the session of {session.box_mac}")
+                session.search = {f"http://host/process_item?id={index}": step}
+                search = store.get(mac).search
+                if search != {f"http://host/process_item?id={index}": step}:
+                    raise AssertionError(f"{mac} sees {search}")
+
+        self.assertEqual(run_threads(box, 48), [])
+        self.assertEqual(store.stats()["size"], 48)
+        self.assertEqual(store.evictions, 0)
+
+    def test_eviction_under_concurrency(self):
+        store = SessionStore(maxsize=64)
+        boxes_per_thread = 400
+
+        def churn(index):
+            for n in range(boxes_per_thread):
+                mac = f"box-{index}-{n}"
+                session = store.get(mac)
+                session.prefetches.append(FakeFuture())
+                # An evicted box comes back empty, never with another box's page
+                if session.search not in ({}, {mac: n}):
+                    raise AssertionError(f"{mac} sees {session.search}")
+                session.search = {mac: n}
+                if session.box_mac != mac:
+                    raise AssertionError(f"{mac} got the session of {session.box_mac}")
+
+        self.assertEqual(run_threads(churn, 16), [])
+        stats = store.stats()
+        self.assertLessEqual(stats["size"], 64)
+        self.assertEqual(stats["size"] + stats["evictions"], 16 * boxes_per_thread)
+
+    def test_least_recently_seen_are_evicted_first(self):
+        store = SessionStore(maxsize=16)
+        sessions = [store.get(f"box-{n}") for n in range(16)]
+        future = FakeFuture()
+        sessions[0].prefetches.append(future)
+        time.sleep(0.01)
+        store.get("box-1")  # seen again, stays
+        store.get("box-new")
+        remaining = set(store.snapshot())
+        self.assertIn("box-1", remaining)
+        self.assertIn("box-new", remaining)
+        self.assertNotIn("box-0", remaining)
+        self.assertTrue(future.cancelled)
+        # Evicted in a batch of maxsize // 8 so a full store isn't scanned per insert
+        self.assertEqual(store.evictions, 2)
+
+    def test_prefetches_survive_navigation_within_the_title(self):
+        session = SessionStore().get("box")
+        future = FakeFuture()
+        session.add_prefetches(("title-a", "56"), [future])
+        session.cancel_prefetches(keep=("title-a", "56"))  # the prefetched episode
+        session.cancel_prefetches(keep=("title-a", None))  # back to the title page
+        self.assertFalse(future.cancelled)
+        self.assertEqual(session.prefetches, [future])
+
+        session.cancel_prefetches(keep=("title-a", "110"))  # another translator
+        self.assertTrue(future.cancelled)
+        self.assertEqual(session.prefetches, [])
+
+        future = FakeFuture()
+        session.add_prefetches(("title-a", "56"), [future])
+        session.cancel_prefetches(keep=("title-b", None))
+        self.assertTrue(future.cancelled)
+
+    def test_new_prefetches_replace_those_of_another_title(self):
+        session = SessionStore().get("box")
+        old, kept, new = FakeFuture(), FakeFuture(), FakeFuture()
+        session.add_prefetches(("title-a", "56"), [old])
+        session.add_prefetches(("title-b", "56"), [kept])
+        self.assertTrue(old.cancelled)
+        session.add_prefetches(("title-b", "56"), [new])
+        self.assertEqual(session.prefetches, [kept, new])
+
+    def test_idle_sessions_are_dropped(self):
+        store = SessionStore(maxsize=16, idle_ttl=0.05)
+        store.get("idle")
+        time.sleep(0.1)
+        store.get("active")
+        self.assertEqual(set(store.snapshot()), {"active"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import threading
+import time
+import unittest
+
+from singleflight import SingleFlight, normalize
+
+
+class SingleFlightTest(unittest.TestCase):
+    def run_concurrently(self, flights, key, fn, count):
+        results, errors = [], []
+
+        def call():
+            try:
+                results.append(flights.do(key, fn))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        return threads, results, errors
+
+    def wait_for_waiters(self, flights, count):
+        deadline = time.monotonic() + 5
+        while flights.stats()["waiting"] < count and time.monotonic() < deadline:
+            time.sleep(0.001)
+
+    def test_concurrent_calls_are_coalesced(self):
+        flights = SingleFlight(timeout=5)
+        release = threading.Event()
+        calls = []
+
+        def lookup():
+            calls.append(1)
+            release.wait(5)
+            return "result"
+
+        threads, results, errors = self.run_concurrently(flights, "key", lookup, 8)
+        self.wait_for_waiters(flights, 7)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual((results, errors, len(calls)), (["result"] * 8, [], 1))
+        stats = flights.stats()
+        self.assertEqual((stats["calls"], stats["coalesced"], stats["in_flight"]), (1, 7, 0))
+
+    def test_exception_reaches_every_waiter(self):
+        flights = SingleFlight(timeout=5)
+        release = threading.Event()
+
+        def lookup():
+            release.wait(5)
+            raise LookupError("upstream failed")
+
+        threads, results, errors = self.run_concurrently(flights, "key", lookup, 4)
+        self.wait_for_waiters(flights, 3)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, [])
+        self.assertEqual(len(errors), 4)
+        self.assertTrue(all(isinstance(e, LookupError) for e in errors))
+        self.assertEqual(flights.stats()["errors"], 1)
+
+    def test_finished_calls_are_not_reused(self):
+        flights = SingleFlight()
+        values = iter(["first", "second"])
+        self.assertEqual(flights.do("key", lambda: next(values)), "first")
+        self.assertEqual(flights.do("key", lambda: next(values)), "second")
+
+    def test_failed_call_does_not_stick(self):
+        flights = SingleFlight()
+        with self.assertRaises(ValueError):
+            flights.do("key", int, "not a number")
+        self.assertEqual(flights.do("key", int, "42"), 42)
+
+    def test_different_keys_run_separately(self):
+        flights = SingleFlight(timeout=5)
+        started = threading.Barrier(2, timeout=5)
+
+        def lookup(value):
+            started.wait()  # both running at once, or this times out
+            return value
+
+        results = {}
+        threads = [
+            threading.Thread(target=lambda k=key: results.update({k: flights.do(k, lookup, k)}))
+            for key in ("a", "b")
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, {"a": "a", "b": "b"})
+
+    def test_waiter_gives_up_after_timeout(self):
+        flights = SingleFlight(timeout=0.05)
+        release = threading.Event()
+        leader = threading.Thread(target=flights.do, args=("key", release.wait, 5))
+        leader.start()
+        while not flights.stats()["in_flight"]:
+            time.sleep(0.001)
+        # Runs the function itself instead of waiting for the stuck call
+        self.assertEqual(flights.do("key", lambda: "own result"), "own result")
+        self.assertEqual(flights.stats()["timeouts"], 1)
+        release.set()
+        leader.join()
+
+    def test_normalize(self):
+        self.assertEqual(normalize("  The   Matrix "), "the matrix")
+        self.assertEqual(normalize(None), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
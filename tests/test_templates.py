@@ -0,0 +1,58 @@
+import json
+import os
+import tempfile
+import unittest
+
+import utils
+
+
+class TemplateCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "main_page.json")
+        self.write("Main")
+        utils._host_pages.clear()
+
+    def tearDown(self):
+        utils._host_pages.clear()
+        self.tmp.cleanup()
+
+    def write(self, title):
+        with open(self.path, "w") as f:
+            json.dump({"title": title, "channels": [{
+                "title": "Search",
+                "playlist_url": f"{utils.TEMPLATE_HOST}search",
+                "logo_30x30": f"{utils.TEMPLATE_HOST}res/search.png",
+            }]}, f)
+
+    def test_templates_are_copies(self):
+        page = utils.load_template(self.path)
+        page["channels"].append({"title": "extra"})
+        page["title"] = "changed"
+        self.assertEqual(utils.load_template(self.path)["title"], "Main")
+        self.assertEqual(len(utils.load_template(self.path)["channels"]), 1)
+
+    def test_host_pages_are_rewritten_and_memoized(self):
+        page = utils.load_template_for_host(self.path, "http://10.0.0.2:5001/")
+        self.assertEqual(page["channels"][0]["playlist_url"], "http://10.0.0.2:5001/search")
+        self.assertIs(utils.load_template_for_host(self.path, "http://10.0.0.2:5001/"), page)
+
+    def test_changed_file_is_read_again(self):
+        utils.load_template_for_host(self.path, "http://10.0.0.2:5001/")
+        self.write("Updated")
+        stat = os.stat(self.path)
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        self.assertEqual(utils.load_template_for_host(self.path, "http://10.0.0.2:5001/")["title"], "Updated")
+        self.assertEqual(utils.load_template(self.path)["title"], "Updated")
+
+    def test_host_pages_are_bounded(self):
+        # The Host header comes from the client, any number of them may show up
+        for n in range(200):
+            utils.load_template_for_host(self.path, f"http://host-{n}/")
+        self.assertEqual(len(utils._host_pages), utils._host_pages.maxsize)
+        self.assertIsNotNone(utils._host_pages.get((self.path, "http://host-199/")))
+        self.assertIsNone(utils._host_pages.get((self.path, "http://host-0/")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import os
+import tempfile
+import unittest
+
+from titles import TitleMap
+
+
+class FakeSharedCache:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, timeout=None):
+        self.data[key] = value
+
+
+class TitleMapTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "kp_titles.log")
+        self.maps = []
+
+    def tearDown(self):
+        for titles in self.maps:
+            titles.close()
+        self.tmp.cleanup()
+
+    def open(self, **kwargs):
+        titles = TitleMap(self.path, **kwargs)
+        self.maps.append(titles)
+        return titles
+
+    def log_lines(self):
+        with open(self.path, encoding="utf-8") as f:
+            return f.read().splitlines()
+
+    def test_log_is_replayed_on_restart(self):
+        titles = self.open()
+        titles.set(301, "The Matrix 1999", "Матрица 1999")
+        titles.set(302, "Film 2020", "Фильм 2020")
+        titles.set(301, "The Matrix (1999)", "Матрица (1999)")  # the last line wins
+        titles.close()
+
+        reopened = self.open()
+        self.assertEqual(reopened.get(301), ("The Matrix (1999)", "Матрица (1999)"))
+        self.assertEqual(reopened.title_rus("302"), "Фильм 2020")
+        self.assertIsNone(reopened.get(303))
+        self.assertEqual(len(reopened), 2)
+
+    def test_unchanged_titles_are_not_appended(self):
+        titles = self.open()
+        for _ in range(3):
+            titles.set(301, "The Matrix 1999", "Матрица 1999")
+        self.assertEqual(len(self.log_lines()), 1)
+
+    def test_torn_last_line_is_dropped(self):
+        titles = self.open()
+        titles.set(301, "The Matrix 1999", "Матрица 1999")
+        titles.close()
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write('["302", "Film 20')  # crash in the middle of an append
+
+        reopened = self.open()
+        self.assertEqual(len(reopened), 1)
+        # Rewritten without the broken line, later appends start on a line of their own
+        reopened.set(303, "Other 2021", "Другой 2021")
+        reopened.close()
+        self.assertEqual(len(self.log_lines()), 2)
+        self.assertEqual(self.open().get(303), ("Other 2021", "Другой 2021"))
+
+    def test_least_recently_used_are_dropped(self):
+        titles = self.open(maxsize=3)
+        for kp_id in range(1, 4):
+            titles.set(kp_id, f"Film {kp_id}", f"Фильм {kp_id}")
+        titles.get(1)
+        titles.set(4, "Film 4", "Фильм 4")
+        self.assertIsNone(titles.get(2))
+        self.assertIsNotNone(titles.get(1))
+        titles.close()
+        # The replay keeps the same bound
+        self.assertEqual(len(self.open(maxsize=3)), 3)
+
+    def test_log_is_compacted(self):
+        titles = self.open(maxsize=10)
+        for n in range(1500):
+            titles.set(n % 10, f"Film {n}", f"Фильм {n}")
+        # Never more than the compaction threshold of lines for 10 live titles
+        self.assertLessEqual(len(self.log_lines()), 1000)
+        titles.close()
+        reopened = self.open(maxsize=10)
+        self.assertEqual(reopened.get(9), ("Film 1499", "Фильм 1499"))
+        self.assertEqual(len(reopened), 10)
+
+    def test_compaction_keeps_appends_of_another_worker(self):
+        first = self.open(maxsize=100)
+        second = self.open(maxsize=100)
+        second.set("other", "Other 2021", "Другой 2021")
+        for n in range(1100):
+            first.set(n % 5, f"Film {n}", f"Фильм {n}")
+        # Appends after another worker's compaction go to the new file
+        second.set("later", "Later 2022", "Позже 2022")
+        first.close()
+        second.close()
+        reopened = self.open(maxsize=100)
+        self.assertEqual(reopened.get("other"), ("Other 2021", "Другой 2021"))
+        self.assertEqual(reopened.get("later"), ("Later 2022", "Позже 2022"))
+
+    def test_titles_of_other_workers_come_from_the_shared_cache(self):
+        shared = FakeSharedCache()
+        self.open(shared=shared).set(301, "The Matrix 1999", "Матрица 1999")
+        other = TitleMap(os.path.join(self.tmp.name, "other.log"), shared=shared)
+        self.maps.append(other)
+        self.assertEqual(other.get(301), ("The Matrix 1999", "Матрица 1999"))
+
+
+if __name__ == "__main__":
+    unittest.main()
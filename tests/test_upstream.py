@@ -0,0 +1,87 @@
+import threading
+import time
+import unittest
+
+import upstream
+
+
+class HostPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.pool = upstream.HostPool("example.com", size=2, impersonate="chrome131", http2=False)
+
+    def tearDown(self):
+        self.pool.close()
+
+    def test_capacity_and_reuse(self):
+        first = self.pool.acquire()
+        second = self.pool.acquire()
+        self.assertIsNot(first, second)
+        self.assertEqual(self.pool.snapshot()["open"], 2)
+
+        self.pool.release(first)
+        self.assertIs(self.pool.acquire(), first)
+        stats = self.pool.snapshot()
+        self.assertEqual((stats["opened"], stats["reused"], stats["open"]), (2, 1, 2))
+        self.pool.release(first)
+        self.pool.release(second)
+
+    def test_full_pool_times_out(self):
+        sessions = [self.pool.acquire(), self.pool.acquire()]
+        started = time.monotonic()
+        with self.assertRaises(upstream.PoolTimeout):
+            self.pool.acquire(timeout=0.05)
+        self.assertGreaterEqual(time.monotonic() - started, 0.05)
+        stats = self.pool.snapshot()
+        self.assertEqual((stats["waited"], stats["wait_timeouts"]), (1, 1))
+        for session in sessions:
+            self.pool.release(session)
+
+    def test_waiter_gets_released_session(self):
+        sessions = [self.pool.acquire(), self.pool.acquire()]
+        got = []
+        waiter = threading.Thread(target=lambda: got.append(self.pool.acquire(timeout=5)))
+        waiter.start()
+        time.sleep(0.05)
+        self.pool.release(sessions[0])
+        waiter.join(5)
+        self.assertEqual(got, [sessions[0]])
+        self.pool.release(sessions[0])
+        self.pool.release(sessions[1])
+
+    def test_broken_session_frees_its_slot_for_a_waiter(self):
+        sessions = [self.pool.acquire(), self.pool.acquire()]
+        got = []
+        waiter = threading.Thread(target=lambda: got.append(self.pool.acquire(timeout=5)))
+        waiter.start()
+        time.sleep(0.05)
+        self.pool.release(sessions[0], broken=True)
+        waiter.join(5)
+        self.assertFalse(waiter.is_alive())
+        self.assertEqual(len(got), 1)
+        self.assertNotIn(got[0], sessions)  # a new session in the freed slot
+        self.assertEqual(self.pool.snapshot()["open"], 2)
+        self.pool.release(got[0])
+        self.pool.release(sessions[1])
+
+    def test_release_clears_cookies(self):
+        session = self.pool.acquire()
+        session.cookies.set("dle_user_id", "1", domain="example.com")
+        self.pool.release(session)
+        reused = self.pool.acquire()
+        self.assertIs(reused, session)
+        self.assertEqual(len(reused.cookies), 0)
+        self.pool.release(reused)
+
+    def test_dedicated_sessions_are_outside_the_pool(self):
+        sessions = [self.pool.acquire(), self.pool.acquire()]
+        with self.pool.dedicated() as session:
+            self.assertNotIn(session, sessions)
+            self.assertEqual(self.pool.snapshot()["open_streams"], 1)
+        stats = self.pool.snapshot()
+        self.assertEqual((stats["open_streams"], stats["streams"], stats["open"]), (0, 1, 2))
+        for session in sessions:
+            self.pool.release(session)
+
+
+if __name__ == "__main__":
+    unittest.main()
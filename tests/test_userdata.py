@@ -0,0 +1,103 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+from userdata import UserStore
+
+
+class UserStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "userdata.db")
+        self.legacy_path = os.path.join(self.tmp.name, "db.json")
+        self.stores = []
+
+    def tearDown(self):
+        for store in self.stores:
+            store.close()
+        self.tmp.cleanup()
+
+    def open(self):
+        store = UserStore(self.path, legacy_path=self.legacy_path)
+        self.stores.append(store)
+        return store
+
+    def test_migrates_db_json_once(self):
+        with open(self.legacy_path, "w") as f:
+            json.dump({
+                "bookmarks": [
+                    {"url": "http://host/a", "title": "A", "description": "first"},
+                    {"url": "http://host/b", "title": "B", "description": "second", "is_local": True},
+                    {"url": "http://host/a", "title": "A again", "description": "duplicate"},
+                ],
+                "watched": [
+                    {"url": "http://host/a"},
+                    {"url": "http://host/s", "season": "1", "episode": "2"},
+                ],
+            }, f)
+        store = self.open()
+        self.assertEqual(store.bookmarks(), [
+            {"url": "http://host/a", "title": "A", "description": "first", "is_local": False},
+            {"url": "http://host/b", "title": "B", "description": "second", "is_local": True},
+        ])
+        self.assertTrue(store.is_watched("http://host/a"))
+        self.assertTrue(store.is_watched("http://host/s", "1", "2"))
+        self.assertFalse(store.is_watched("http://host/s", "1", "3"))
+
+        # Changes after the migration aren't overwritten by db.json on restart
+        store.remove_bookmark("http://host/a")
+        store.close()
+        self.assertEqual([item["url"] for item in self.open().bookmarks()], ["http://host/b"])
+
+    def test_broken_db_json_is_skipped(self):
+        with open(self.legacy_path, "w") as f:
+            f.write("{not json")
+        self.assertEqual(self.open().bookmarks(), [])
+
+    def test_bookmarks_keep_insertion_order(self):
+        store = self.open()
+        for name in "cab":
+            store.add_bookmark(f"http://host/{name}", name, "")
+        store.add_bookmark("http://host/c", "c again", "")
+        self.assertEqual([item["title"] for item in store.bookmarks()], ["c", "a", "b"])
+
+    def test_reads_see_queued_writes(self):
+        store = self.open()
+
+        def writer(index):
+            for n in range(100):
+                store.mark_watched(f"http://host/{index}", "1", str(n))
+
+        threads = [threading.Thread(target=writer, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # Every write was queued, so the read waits for all of them
+        self.assertTrue(all(store.is_watched(f"http://host/{i}", "1", "99") for i in range(8)))
+        store.flush()
+        self.assertTrue(store._queue.empty())
+
+    def test_writes_survive_close(self):
+        store = self.open()
+        store.mark_watched("http://host/a")
+        store.add_bookmark("http://host/a", "A", "")
+        store.close()
+        reopened = self.open()
+        self.assertTrue(reopened.is_watched("http://host/a"))
+        self.assertEqual(len(reopened.bookmarks()), 1)
+
+    def test_use_after_close_raises(self):
+        store = self.open()
+        store.close()
+        with self.assertRaises(RuntimeError):
+            store.bookmarks()
+        with self.assertRaises(RuntimeError):
+            store.mark_watched("http://host/a")
+        store.close()  # closing twice is fine
+
+
+if __name__ == "__main__":
+    unittest.main()
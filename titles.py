@@ -0,0 +1,137 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from locks import FileLock
+
+
+class TitleMap:
+    """Bounded kp_id -> (title, russian title) map persisted as an append-only log.
+
+    Every change is appended to `path` as one JSON line, so nothing is lost
+    on a crash and no write costs more than one short line. The log is
+    rewritten with the live entries only once it has grown to `compact_ratio`
+    times their number. Above `maxsize` the least recently used titles are
+    dropped.
+
+    Several worker processes may share the log: appends and compaction are
+    serialized with a file lock. With a `shared` cache (get/set interface of
+    Flask-Caching) titles stored by one worker are found by the others.
+    """
+
+    def __init__(self, path="kp_titles.log", maxsize=20000, compact_ratio=2, shared=None):
+        self.path = path
+        self.maxsize = maxsize
+        self.compact_ratio = compact_ratio
+        self.shared = shared
+        self._lock = threading.Lock()
+        self._file_lock = FileLock(f"{path}.lock")
+        self._entries, self._log_lines, damaged = self._replay()
+        self._log_entries = len(self._entries)  # live entries in the log at the last compaction
+        self._log = open(self.path, "a", encoding="utf-8")
+        if damaged:
+            self._compact()
+
+    def _replay(self):
+        """Read the log into (entries, line count, True if it has lines to drop)."""
+        entries = OrderedDict()
+        lines = 0
+        damaged = False
+        if not os.path.exists(self.path):
+            return entries, lines, damaged
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    if not line.endswith("\n"):
+                        raise ValueError("unterminated line")
+                    kp_id, title, title_rus = json.loads(line)
+                except ValueError:
+                    # Line cut short by a crash
+                    damaged = True
+                    continue
+                lines += 1
+                entries[kp_id] = (title, title_rus)
+                entries.move_to_end(kp_id)
+                if len(entries) > self.maxsize:
+                    entries.popitem(last=False)
+        return entries, lines, damaged
+
+    def _reopen_if_replaced(self):
+        # Another worker compacted the log into a new file
+        try:
+            replaced = os.stat(self.path).st_ino != os.fstat(self._log.fileno()).st_ino
+        except FileNotFoundError:
+            replaced = True
+        if replaced:
+            self._log.close()
+            self._log = open(self.path, "a", encoding="utf-8")
+
+    def _compact(self):
+        with self._file_lock:
+            # Entries appended by other workers are in the log, not in self._entries
+            entries, _, _ = self._replay()
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                for kp_id, (title, title_rus) in entries.items():
+                    f.write(json.dumps([kp_id, title, title_rus], ensure_ascii=False) + "\n")
+            self._log.close()
+            os.replace(tmp, self.path)
+            self._log = open(self.path, "a", encoding="utf-8")
+            self._log_lines = self._log_entries = len(entries)
+
+    def get(self, kp_id):
+        """(title, russian title) or None."""
+        kp_id = str(kp_id)
+        with self._lock:
+            entry = self._entries.get(kp_id)
+            if entry is not None:
+                self._entries.move_to_end(kp_id)
+                return entry
+        if self.shared is not None:
+            entry = self.shared.get(f"kp_title:{kp_id}")
+            if entry is not None:
+                entry = tuple(entry)
+                with self._lock:
+                    self._store(kp_id, entry)
+        return entry
+
+    def title(self, kp_id):
+        entry = self.get(kp_id)
+        return entry[0] if entry else None
+
+    def title_rus(self, kp_id):
+        entry = self.get(kp_id)
+        return entry[1] if entry else None
+
+    def _store(self, kp_id, entry):
+        self._entries[kp_id] = entry
+        self._entries.move_to_end(kp_id)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def set(self, kp_id, title, title_rus):
+        kp_id = str(kp_id)
+        with self._lock:
+            if self._entries.get(kp_id) == (title, title_rus):
+                self._entries.move_to_end(kp_id)
+                return
+            self._store(kp_id, (title, title_rus))
+            with self._file_lock:
+                self._reopen_if_replaced()
+                self._log.write(json.dumps([kp_id, title, title_rus], ensure_ascii=False) + "\n")
+                self._log.flush()
+            self._log_lines += 1
+            live = max(len(self._entries), self._log_entries)
+            if self._log_lines > max(self.compact_ratio * live, 1000):
+                self._compact()
+        if self.shared is not None:
+            self.shared.set(f"kp_title:{kp_id}", [title, title_rus], timeout=0)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def close(self):
+        with self._lock:
+            if not self._log.closed:
+                self._log.close()
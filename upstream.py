@@ -0,0 +1,326 @@
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+from curl_cffi import CurlHttpVersion
+from curl_cffi import requests as curl_requests
+
+try:
+    import config
+except ImportError:
+    config = None
+
+RequestException = curl_requests.RequestsError
+
+
+class PoolTimeout(RequestException):
+    """No pooled session for the host became free in time."""
+
+# === Defaults (can be overridden in config.py) ===
+DEFAULT_POOL_SIZE = 8
+DEFAULT_IMPERSONATE = "chrome131"
+DEFAULT_TIMEOUT = 30
+
+
+def _setting(name, default):
+    """Read an optional UPSTREAM_* setting from config.py."""
+    return getattr(config, name, default) if config else default
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` requests per second, bursts up to `burst`."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout=None):
+        """Block until a token is available, return False if `timeout` expired first."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if deadline is not None:
+                if now + wait > deadline:
+                    return False
+            time.sleep(wait)
+
+
+class HostPool:
+    """Keep-alive pool of curl sessions for a single upstream host.
+
+    Every curl session keeps its connection open between requests, so handing
+    the same session out again skips the TCP+TLS handshake.
+    """
+
+    def __init__(self, host, size, impersonate, http2):
+        self.host = host
+        self.size = size
+        self.impersonate = impersonate
+        self.http2 = http2
+        self._idle = []
+        self._created = 0
+        self._lock = threading.Lock()
+        # Signalled whenever a session is handed back or a slot freed
+        self._available = threading.Condition(self._lock)
+        self._streams = 0
+        self.stats = {
+            "requests": 0,
+            "errors": 0,
+            "reused": 0,
+            "opened": 0,
+            "waited": 0,
+            "wait_timeouts": 0,
+            "streams": 0,
+            "total_time": 0.0,
+        }
+
+    def _new_session(self):
+        kwargs = {"impersonate": self.impersonate}
+        if self.http2:
+            kwargs["http_version"] = CurlHttpVersion.V2TLS
+        else:
+            kwargs["http_version"] = CurlHttpVersion.V1_1
+        return curl_requests.Session(**kwargs)
+
+    def acquire(self, timeout=None):
+        """Idle or new session, waiting at most `timeout` seconds for one at capacity."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        waited = False
+        with self._available:
+            while True:
+                if self._idle:
+                    self.stats["reused"] += 1
+                    return self._idle.pop()
+                if self._created < self.size:
+                    self._created += 1
+                    self.stats["opened"] += 1
+                    break
+                if not waited:
+                    self.stats["waited"] += 1
+                    waited = True
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self.stats["wait_timeouts"] += 1
+                    raise PoolTimeout(f"No free connection to {self.host} after {timeout}s")
+                self._available.wait(remaining)
+        try:
+            return self._new_session()
+        except Exception:
+            self._discard()
+            raise
+
+    def _discard(self):
+        with self._available:
+            self._created -= 1
+            self._available.notify()
+
+    def release(self, session, broken=False):
+        if broken:
+            try:
+                session.close()
+            finally:
+                self._discard()
+            return
+        # Cookies are passed explicitly per request, don't let them stick
+        # to a session that another caller will pick up next.
+        session.cookies.clear()
+        with self._available:
+            self._idle.append(session)
+            self._available.notify()
+
+    @contextmanager
+    def dedicated(self):
+        """Session outside the pool, closed afterwards.
+
+        For long transfers (proxied playback) and for flows that carry cookies
+        from one request to the next in the session's jar (logins).
+        """
+        session = self._new_session()
+        with self._lock:
+            self._streams += 1
+            self.stats["streams"] += 1
+        try:
+            yield session
+        finally:
+            with self._lock:
+                self._streams -= 1
+            session.close()
+
+    def record(self, elapsed, error=False):
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["total_time"] += elapsed
+            if error:
+                self.stats["errors"] += 1
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["open"] = self._created
+            stats["idle"] = len(self._idle)
+            stats["open_streams"] = self._streams
+        stats["avg_time"] = (
+            stats["total_time"] / stats["requests"] if stats["requests"] else 0.0
+        )
+        return stats
+
+    def close(self):
+        with self._available:
+            idle, self._idle = self._idle, []
+            self._created -= len(idle)
+            self._available.notify_all()
+        for session in idle:
+            session.close()
+
+
+class UpstreamClient:
+    """Process-wide HTTP client with one keep-alive pool per upstream host."""
+
+    def __init__(self, pool_size=None, host_pool_sizes=None, impersonate=None, http2=None, timeout=None):
+        self.pool_size = pool_size or _setting("UPSTREAM_POOL_SIZE", DEFAULT_POOL_SIZE)
+        self.host_pool_sizes = host_pool_sizes or _setting("UPSTREAM_HOST_POOL_SIZES", {})
+        self.impersonate = impersonate or _setting("UPSTREAM_IMPERSONATE", DEFAULT_IMPERSONATE)
+        self.http2 = _setting("UPSTREAM_HTTP2", True) if http2 is None else http2
+        self.http1_hosts = set(_setting("UPSTREAM_HTTP1_HOSTS", []))
+        self.timeout = timeout or _setting("UPSTREAM_TIMEOUT", DEFAULT_TIMEOUT)
+        self.pool_timeout = _setting("UPSTREAM_POOL_TIMEOUT", self.timeout)
+        self.rate_limits = _setting("UPSTREAM_RATE_LIMITS", {})
+        self._pools = {}
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def pool(self, host):
+        pool = self._pools.get(host)
+        if pool is None:
+            with self._lock:
+                pool = self._pools.get(host)
+                if pool is None:
+                    pool = HostPool(
+                        host,
+                        self.host_pool_sizes.get(host, self.pool_size),
+                        self.impersonate,
+                        self.http2 and host not in self.http1_hosts,
+                    )
+                    self._pools[host] = pool
+        return pool
+
+    def limiter(self, host):
+        """Shared token bucket for `host`, None when the host isn't rate limited."""
+        if host not in self.rate_limits:
+            return None
+        with self._lock:
+            if host not in self._limiters:
+                rate, burst = self.rate_limits[host]
+                self._limiters[host] = TokenBucket(rate, burst)
+            return self._limiters[host]
+
+    def request(self, method, url, **kwargs):
+        """Perform a request and return the fully read response."""
+        kwargs.setdefault("timeout", self.timeout)
+        kwargs.pop("stream", None)
+        pool = self.pool(urlparse(url).netloc)
+        session = pool.acquire(self.pool_timeout)
+        started = time.monotonic()
+        broken = False
+        try:
+            return session.request(method, url, **kwargs)
+        except Exception:
+            broken = True
+            raise
+        finally:
+            pool.record(time.monotonic() - started, error=broken)
+            pool.release(session, broken=broken)
+
+    @contextmanager
+    def stream(self, method, url, pooled=True, **kwargs):
+        """Perform a streaming request, the session returns to the pool on exit.
+
+        Transfers that may last as long as a playback pass `pooled=False`: they
+        get a session of their own instead of holding a keep-alive slot.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        pool = self.pool(urlparse(url).netloc)
+        if not pooled:
+            with pool.dedicated() as session:
+                started = time.monotonic()
+                error = False
+                response = None
+                try:
+                    response = session.request(method, url, stream=True, **kwargs)
+                    yield response
+                except Exception:
+                    error = True
+                    raise
+                finally:
+                    if response is not None:
+                        response.close()
+                    pool.record(time.monotonic() - started, error=error)
+            return
+        session = pool.acquire(self.pool_timeout)
+        started = time.monotonic()
+        broken = False
+        response = None
+        try:
+            response = session.request(method, url, stream=True, **kwargs)
+            yield response
+        except Exception:
+            broken = True
+            raise
+        finally:
+            if response is not None:
+                response.close()
+            pool.record(time.monotonic() - started, error=broken)
+            pool.release(session, broken=broken)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def stats(self):
+        """Per-host request statistics."""
+        with self._lock:
+            pools = list(self._pools.values())
+        return {pool.host: pool.snapshot() for pool in pools}
+
+    def close(self):
+        with self._lock:
+            pools = list(self._pools.values())
+            self._pools = {}
+        for pool in pools:
+            pool.close()
+
+
+client = UpstreamClient()
+
+
+def get(url, **kwargs):
+    return client.get(url, **kwargs)
+
+
+def post(url, **kwargs):
+    return client.post(url, **kwargs)
+
+
+def stream(method, url, pooled=True, **kwargs):
+    return client.stream(method, url, pooled=pooled, **kwargs)
+
+
+def limiter(host):
+    return client.limiter(host)
+
+
+def stats():
+    return client.stats()
@@ -0,0 +1,170 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+SCHEMA_VERSION = 1
+WRITE_BATCH = 256
+_STOP = object()
+
+
+class UserStore:
+    """Bookmarks and watch history in SQLite (WAL mode).
+
+    Writes go through a write-behind queue drained by one writer thread, which
+    commits them in batches. Reads wait for queued writes first, so a request
+    always sees what the previous ones stored. On first start the contents of
+    the old `db.json` are imported.
+    """
+
+    def __init__(self, path="userdata.db", legacy_path="db.json"):
+        self.path = path
+        self._queue = queue.Queue()
+        self._read_lock = threading.Lock()
+        self.closed = False
+        self._db = self._connect()
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS bookmarks ("
+            " id INTEGER PRIMARY KEY,"
+            " user TEXT NOT NULL,"
+            " url TEXT NOT NULL,"
+            " title TEXT,"
+            " description TEXT,"
+            " is_local INTEGER NOT NULL DEFAULT 0,"
+            " added_at REAL NOT NULL,"
+            " UNIQUE (user, url));"
+            "CREATE TABLE IF NOT EXISTS watched ("
+            " id INTEGER PRIMARY KEY,"
+            " user TEXT NOT NULL,"
+            " url TEXT NOT NULL,"
+            " season TEXT NOT NULL DEFAULT '',"
+            " episode TEXT NOT NULL DEFAULT '',"
+            " watched_at REAL NOT NULL,"
+            " UNIQUE (user, url, season, episode));"
+        )
+        if self._db.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            self._migrate(legacy_path)
+        self._writer = threading.Thread(target=self._write_loop, daemon=True, name="userdata-writer")
+        self._writer.start()
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def _migrate(self, legacy_path):
+        """Import bookmarks and watch history from the old JSON file, once."""
+        data = {}
+        if legacy_path and os.path.exists(legacy_path):
+            try:
+                with open(legacy_path, "r") as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Error reading {legacy_path}, not migrating it: {e}")
+        now = time.time()
+        with self._db:
+            self._db.executemany(
+                "INSERT OR IGNORE INTO bookmarks (user, url, title, description, is_local, added_at)"
+                " VALUES ('', ?, ?, ?, ?, ?)",
+                [
+                    (item["url"], item.get("title"), item.get("description"), int(bool(item.get("is_local"))), now)
+                    for item in data.get("bookmarks", [])
+                ],
+            )
+            self._db.executemany(
+                "INSERT OR IGNORE INTO watched (user, url, season, episode, watched_at)"
+                " VALUES ('', ?, ?, ?, ?)",
+                [
+                    (item["url"], item.get("season") or "", item.get("episode") or "", now)
+                    for item in data.get("watched", [])
+                ],
+            )
+            self._db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        if data:
+            print(f"Migrated {legacy_path} to {self.path}")
+
+    def _write_loop(self):
+        db = self._connect()
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < WRITE_BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with db:
+                    for item in batch:
+                        if item is not _STOP:
+                            db.execute(*item)
+            except sqlite3.Error as e:
+                print(f"Error writing user data: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if _STOP in batch:
+                db.close()
+                return
+
+    def _write(self, sql, params):
+        if self.closed:
+            raise RuntimeError(f"{self.path} is closed")
+        self._queue.put((sql, params))
+
+    def _read(self, sql, params=()):
+        if self.closed:
+            # The writer is gone, flush() would wait forever
+            raise RuntimeError(f"{self.path} is closed")
+        self.flush()
+        with self._read_lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def flush(self):
+        """Wait until every queued write is committed."""
+        self._queue.join()
+
+    def bookmarks(self, user=""):
+        """Bookmarks of `user`, in the order they were added."""
+        return [
+            {"url": url, "title": title, "description": description, "is_local": bool(is_local)}
+            for url, title, description, is_local in self._read(
+                "SELECT url, title, description, is_local FROM bookmarks"
+                " WHERE user = ? ORDER BY id",
+                (user,),
+            )
+        ]
+
+    def add_bookmark(self, url, title, description, is_local=False, user=""):
+        self._write(
+            "INSERT OR IGNORE INTO bookmarks (user, url, title, description, is_local, added_at)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (user, url, title, description, int(is_local), time.time()),
+        )
+
+    def remove_bookmark(self, url, user=""):
+        self._write("DELETE FROM bookmarks WHERE user = ? AND url = ?", (user, url))
+
+    def mark_watched(self, url, season=None, episode=None, user=""):
+        self._write(
+            "INSERT OR IGNORE INTO watched (user, url, season, episode, watched_at)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (user, url, season or "", episode or "", time.time()),
+        )
+
+    def is_watched(self, url, season=None, episode=None, user=""):
+        return bool(self._read(
+            "SELECT 1 FROM watched WHERE user = ? AND url = ? AND season = ? AND episode = ?",
+            (user, url, season or "", episode or ""),
+        ))
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self._queue.put(_STOP)
+        self._writer.join()
+        with self._read_lock:
+            self._db.close()
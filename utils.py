@@ -1,9 +1,11 @@
 import json
 from functools import wraps
 import os
-from pathlib import Path
+import threading
 from flask import request
 
+from caches import LRUTTLCache
+
 # === JSON helpers ===
 def load_json(filename):
     """Load JSON data from a file."""
@@ -15,6 +17,55 @@ def save_json(filename, data):
     with open(filename, 'w') as f:
         json.dump(data, f, indent=2)
 
+# === Page templates ===
+TEMPLATE_HOST = "http://94.177.51.191/"
+_templates = {}  # filename -> (mtime, parsed template)
+# (filename, host_url) -> (mtime, rewritten template); the host comes from the
+# client's Host header, so only the most recent ones are kept
+_host_pages = LRUTTLCache(maxsize=32, ttl=0)
+_templates_lock = threading.Lock()
+
+def _cached_template(filename):
+    mtime = os.stat(filename).st_mtime_ns
+    entry = _templates.get(filename)
+    if entry is None or entry[0] != mtime:
+        with _templates_lock:
+            entry = _templates.get(filename)
+            if entry is None or entry[0] != mtime:
+                entry = _templates[filename] = (mtime, load_json(filename))
+    return entry
+
+def load_template(filename):
+    """Page template, parsed once and re-read only when the file changes.
+
+    Returns a shallow copy with its own "channels" list: handlers may append
+    channels and set top-level keys without touching the cached original.
+    """
+    page = dict(_cached_template(filename)[1])
+    page["channels"] = list(page.get("channels", []))
+    return page
+
+def load_template_for_host(filename, host_url):
+    """Template with its hard-coded host replaced by `host_url`, memoized per host.
+
+    The result is shared between requests and must not be modified.
+    """
+    mtime, template = _cached_template(filename)
+    entry = _host_pages.get((filename, host_url))
+    if entry is None or entry[0] != mtime:
+        page = dict(template)
+        page["channels"] = [
+            dict(
+                channel,
+                playlist_url=channel["playlist_url"].replace(TEMPLATE_HOST, host_url),
+                logo_30x30=channel["logo_30x30"].replace(TEMPLATE_HOST, host_url),
+            )
+            for channel in template["channels"]
+        ]
+        entry = (mtime, page)
+        _host_pages.set((filename, host_url), entry)
+    return entry[1]
+
 # === Flask helpers ===
 def auth_required(f):
     """Decorator to check authentication."""
@@ -51,24 +102,3 @@ def clean_url_from_unwanted_params(url):
         new_query,
         parsed.fragment
     ))
-
-
-def scan_local_videos(dirs):
-    """Scan configured directories for video files"""
-    video_extensions = {'.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv', '.webm', '.m4v', '.m3u8'}
-    video_files = []
-    
-    for directory in dirs:
-        if os.path.exists(directory):
-            for root, _, files in os.walk(directory):
-                for file in files:
-                    if Path(file).suffix.lower() in video_extensions:
-                        rel_path = os.path.relpath(os.path.join(root, file), directory)
-                        video_files.append({
-                            'title': file,
-                            'path': os.path.join(root, file),
-                            'relative_path': rel_path,
-                            'directory': directory
-                        })
-    
-    return video_files
\ No newline at end of file
@@ -0,0 +1,334 @@
+"""asyncio variant of HdRezkaApi built on curl_cffi's AsyncSession.
+
+Fan-out (translators, a whole season, one episode across translators) runs as
+gathered coroutines on a single event loop instead of one thread per request.
+HdRezkaApiSync runs it on a background loop for blocking callers such as the
+Flask handlers.
+"""
+import asyncio
+import random
+import threading
+import time
+
+from curl_cffi.requests import AsyncSession
+
+import upstream
+from videobalancers.HdRezkaApi import (
+    HEADERS,
+    SEASON_BACKOFF,
+    SEASON_BACKOFF_MAX,
+    SEASON_DEADLINE,
+    SEASON_RETRIES,
+    HdRezkaApi,
+    HdRezkaTitlePage,
+    auth,
+    cacheStream,
+    parseStream,
+    stream_cache,
+)
+
+BASEURL = "rezka.fi"
+MAX_CLIENTS = 32  # connections of the AsyncSession shared per event loop
+SEASON_CONCURRENCY = 8
+
+_loop = None
+_loop_lock = threading.Lock()
+_sessions = {}
+
+
+def getLoop():
+    """Event loop running in a daemon thread, shared by every sync facade."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, daemon=True, name="rezka-async").start()
+    return _loop
+
+
+def runSync(coro, timeout=None):
+    return asyncio.run_coroutine_threadsafe(coro, getLoop()).result(timeout)
+
+
+def getSession():
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None:
+        session = _sessions[loop] = AsyncSession(
+            impersonate=upstream.client.impersonate, max_clients=MAX_CLIENTS
+        )
+    return session
+
+
+async def throttle(host):
+    """Async counterpart of the per-host token bucket used by the sync client."""
+    limiter = upstream.limiter(host)
+    if limiter:
+        while not limiter.acquire(timeout=0):
+            await asyncio.sleep(1 / limiter.rate)
+
+
+class AsyncHdRezkaApi:
+    # I/O-free helpers are shared with the blocking client
+    change_domain = HdRezkaApi.change_domain
+    getTranslations = HdRezkaApi.getTranslations
+    getTranslatorName = HdRezkaApi.getTranslatorName
+
+    def __init__(self, url):
+        self.baseurl = BASEURL
+        self.HEADERS = dict(HEADERS)
+        self.url = self.change_domain(url.split(".html")[0] + ".html", self.baseurl)
+        self.page = None
+        self.info = None
+        self.id = None
+        self.name = None
+        self.type = None
+        self.translators = None
+        self.seriesInfo = {}
+        self._seasonTasks = {}
+
+    async def request(self, method, url, **kwargs):
+        """Request with the shared rezka login, re-authenticating once if it expired."""
+        cookies = auth._cookies
+        if cookies is None:
+            cookies = await asyncio.to_thread(auth.cookies, self.HEADERS)
+        response = await getSession().request(
+            method, url, headers=self.HEADERS, cookies=cookies, **kwargs)
+        if cookies and auth.expired(response):
+            cookies = await asyncio.to_thread(auth.relogin, cookies, self.HEADERS)
+            response = await getSession().request(
+                method, url, headers=self.HEADERS, cookies=cookies, **kwargs)
+        return response
+
+    async def load(self):
+        self.page = await self.request("GET", self.url, timeout=upstream.client.timeout)
+        self.info = HdRezkaTitlePage(self.page.content)
+        self.id = self.info.id
+        self.name = self.info.name
+        self.type = self.info.type
+        return self
+
+    async def getTranslatorEpisodes(self, tr_str):
+        await throttle(self.baseurl)
+        r = await self.request(
+            "POST",
+            "https://" + self.baseurl + "/ajax/get_cdn_series/",
+            data={
+                "id": self.id,
+                "translator_id": self.translators[tr_str],
+                "action": "get_episodes",
+            },
+            timeout=100,
+        )
+        response = r.json()
+        if not response["success"]:
+            return None
+        seasons, episodes = HdRezkaApi.getEpisodes(
+            response["seasons"], response["episodes"]
+        )
+        info = {
+            "translator_id": self.translators[tr_str],
+            "seasons": seasons,
+            "episodes": episodes,
+        }
+        self.seriesInfo[tr_str] = info
+        return info
+
+    async def getSeasons(self, translation=None, lazy=False):
+        """Seasons and episodes per translator, see HdRezkaApi.getSeasons."""
+        if not self.translators:
+            self.getTranslations()
+
+        wanted = self.getTranslatorName(translation) if translation else None
+        names = [wanted] if (lazy and wanted) else list(self.translators)
+        for name in names:
+            if name not in self.seriesInfo and name not in self._seasonTasks:
+                task = asyncio.ensure_future(self.getTranslatorEpisodes(name))
+                task.add_done_callback(lambda t, name=name: self._seasonTasks.pop(name, None))
+                self._seasonTasks[name] = task
+
+        if wanted:
+            if wanted in self._seasonTasks:
+                await self._seasonTasks[wanted]
+        else:
+            pending = [self._seasonTasks[name] for name in names if name in self._seasonTasks]
+            await asyncio.gather(*pending)
+        return dict(self.seriesInfo)
+
+    async def getStream(self, season=None, episode=None, translation=None, index=0):
+        tr_str = self.getTranslatorName(translation, index)
+        tr_id = self.translators[tr_str]
+
+        if self.type == "video.tv_series":
+            if not (season and episode):
+                raise TypeError(
+                    "getStream() missing required arguments (season and episode)"
+                )
+            season = str(season)
+            episode = str(episode)
+            key = (self.id, tr_id, season, episode)
+        elif self.type == "video.movie":
+            key = (self.id, tr_id, None, None)
+        else:
+            raise TypeError("Undefined content type")
+
+        stream = stream_cache.get(key)
+        if stream is not None:
+            return stream
+
+        if self.type == "video.tv_series":
+            if tr_str not in self.seriesInfo:
+                await self.getSeasons(tr_str, lazy=True)
+            episodes = self.seriesInfo[tr_str]["episodes"]
+            if not season in episodes:
+                raise ValueError(f'Season "{season}" is not defined')
+            if not episode in episodes[season]:
+                raise ValueError(f'Episode "{episode}" is not defined')
+            data = {
+                "id": self.id,
+                "translator_id": tr_id,
+                "season": season,
+                "episode": episode,
+                "action": "get_stream",
+            }
+        else:
+            data = {
+                "id": self.id,
+                "translator_id": tr_id,
+                "action": "get_movie",
+                "is_camrip": "0",
+                "is_ads": "0",
+                "is_director": "0",
+                "favs": self.info.favs,
+            }
+
+        r = await self.request(
+            "POST",
+            "https://" + self.baseurl +
+            f"/ajax/get_cdn_series/?{str(time.time()).split('.')[0]}",
+            data=data,
+            timeout=upstream.client.timeout,
+        )
+        stream = parseStream(r.json(), season, episode)
+        if stream is not None:
+            cacheStream(key, stream)
+        return stream
+
+    async def getSeasonStreams(
+        self, season, translation=None, index=0, ignore=False, concurrency=SEASON_CONCURRENCY,
+        retries=SEASON_RETRIES, deadline=SEASON_DEADLINE
+    ):
+        """Streams of every episode of a season, resolved as concurrent tasks.
+
+        Same contract as HdRezkaApi.iterSeasonStreams: failed episodes are
+        retried with exponential backoff and jitter, then map to None (or are
+        left out with `ignore`); episodes still pending after `deadline`
+        seconds are dropped.
+        """
+        season = str(season)
+        tr_str = self.getTranslatorName(translation, index)
+        if tr_str not in self.seriesInfo:
+            await self.getSeasons(tr_str, lazy=True)
+        episodes = self.seriesInfo[tr_str]["episodes"]
+        if not season in episodes:
+            raise ValueError(f'Season "{season}" is not defined')
+
+        semaphore = asyncio.Semaphore(concurrency)
+        stop_at = time.monotonic() + deadline
+
+        async def resolve(ep_id):
+            async with semaphore:
+                for attempt in range(retries + 1):
+                    try:
+                        return await self.getStream(season, ep_id, tr_str)
+                    except Exception as e:
+                        delay = min(SEASON_BACKOFF_MAX, SEASON_BACKOFF * 2 ** attempt)
+                        delay = random.uniform(delay / 2, delay)
+                        if attempt == retries or time.monotonic() + delay > stop_at:
+                            raise
+                        print(f"{e.__class__.__name__} > ep:{ep_id}: {e}, retrying in {delay:.1f}s")
+                        await asyncio.sleep(delay)
+
+        tasks = {asyncio.ensure_future(resolve(ep_id)): ep_id for ep_id in episodes[season]}
+        done, pending = await asyncio.wait(tasks, timeout=max(0, stop_at - time.monotonic()))
+        if pending:
+            print(f"Season {season} streams hit the {deadline}s deadline")
+            for task in pending:
+                task.cancel()
+
+        streams = {}
+        for task in done:
+            ep_id = tasks[task]
+            e = task.exception()
+            if e is None:
+                streams[ep_id] = task.result()
+            elif not ignore:
+                print(f"{e.__class__.__name__} > ep:{ep_id}: {e}")
+                streams[ep_id] = None
+        return {ep_id: streams[ep_id] for ep_id in sorted(streams, key=int)}
+
+    async def getEpisodeStreams(self, season, episode):
+        """The same episode in every translation that has it: {translator: stream}."""
+        await self.getSeasons()
+        names = [
+            name for name, info in self.seriesInfo.items()
+            if episode and str(episode) in info["episodes"].get(str(season), {})
+        ]
+        streams = await asyncio.gather(
+            *(self.getStream(season, episode, name) for name in names),
+            return_exceptions=True,
+        )
+        return {
+            name: stream for name, stream in zip(names, streams)
+            if not isinstance(stream, Exception)
+        }
+
+
+class HdRezkaApiSync:
+    """Blocking facade over AsyncHdRezkaApi with the interface of HdRezkaApi.
+
+    Coroutines run on one shared background loop, so many concurrent
+    resolutions cost tasks rather than threads.
+    """
+
+    nextEpisodes = HdRezkaApi.nextEpisodes
+
+    def __init__(self, url, email=None, password=None):
+        auth.configure(email, password)
+        self._api = runSync(AsyncHdRezkaApi(url).load())
+
+    def __getattr__(self, name):
+        # url, id, name, type, translators, seriesInfo, getTranslations, ...
+        return getattr(self._api, name)
+
+    def getSeasons(self, translation=None, lazy=False):
+        return runSync(self._api.getSeasons(translation, lazy))
+
+    def getStream(self, season=None, episode=None, translation=None, index=0):
+        return runSync(self._api.getStream(season, episode, translation, index))
+
+    def getSeasonStreams(
+        self, season, translation=None, index=0, ignore=False, workers=SEASON_CONCURRENCY,
+        retries=SEASON_RETRIES, deadline=SEASON_DEADLINE
+    ):
+        return runSync(self._api.getSeasonStreams(
+            season, translation, index, ignore, workers, retries, deadline))
+
+    def getEpisodeStreams(self, season, episode):
+        return runSync(self._api.getEpisodeStreams(season, episode))
+
+    def prefetchStreams(self, season, episode, translation=None, count=1, resolve=None):
+        if resolve is not None:
+            # A blocking resolver can't run on the loop
+            return HdRezkaApi.prefetchStreams(self, season, episode, translation, count, resolve)
+
+        async def prefetch(s, e):
+            try:
+                await self._api.getStream(s, e, translation)
+            except Exception as ex:
+                print(f"Prefetch of s{s}e{e} failed: {ex}")
+
+        return [
+            asyncio.run_coroutine_threadsafe(prefetch(s, e), getLoop())
+            for s, e in self.nextEpisodes(season, episode, translation, count)
+        ]
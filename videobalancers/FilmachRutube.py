@@ -1,19 +1,18 @@
-import curl_cffi
+import upstream
 
 class FilmachRutube:
-    def __init__(self) -> None:
+    def __init__(self, timeout=None) -> None:
         self.base_url = "https://rutube.ru/api"
         self.author_ids = 32181632
-        pass
+        self.timeout = timeout or upstream.client.timeout
     
     def __make_request__(self, endpoint, params={}):
-        with curl_cffi.Session(impersonate="chrome131") as session:
-            params["client"] = "wdp"
-            params["author_ids"] = self.author_ids
-            params["page"] = 1
-            response = session.get(f"{self.base_url}{endpoint}", params=params)
-            response.raise_for_status()
-            return response.json()
+        params["client"] = "wdp"
+        params["author_ids"] = self.author_ids
+        params["page"] = 1
+        response = upstream.get(f"{self.base_url}{endpoint}", params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
 
     def search(self, query):
         result = self.__make_request__("/search/video", {"query": query})
@@ -1,12 +1,321 @@
-import requests
 from bs4 import BeautifulSoup
+import lxml.html
 import base64
 from itertools import product
 import threading
 import time
 import os
 import json
-from urllib.parse import urlparse, urlunparse
+import random
+import re
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import unquote, urlparse, urlunparse
+
+import upstream
+from caches import LRUTTLCache
+
+# Shared pool for fan-out requests to rezka (translators, episodes)
+FETCH_WORKERS = 4
+_fetch_pool = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="rezka-fetch")
+
+# Warming the stream cache with upcoming episodes
+PREFETCH_WORKERS = 2
+_prefetch_pool = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="rezka-prefetch")
+
+# Resolving a whole season: concurrency, retries with backoff (seconds), deadline
+SEASON_WORKERS = 4
+SEASON_RETRIES = 3
+SEASON_BACKOFF = 0.5
+SEASON_BACKOFF_MAX = 8
+SEASON_DEADLINE = 120
+
+# Matching a Kinopoisk id to a search result
+SEARCH_CANDIDATES = 2
+KP_LOOKUP_TIMEOUT = 8
+KP_LOOKUP_DEADLINE = 10
+HELP_LINK_PATTERN = re.compile(r'href="/help/([^/"]+)/?"')
+
+# Logging in: seconds before retrying a failed login, the guest login form
+LOGIN_RETRY = 60
+LOGIN_FORM_PATTERN = re.compile(rb'name=["\']?login_password')
+
+# Resolved streams keyed by (title id, translator id, season, episode)
+STREAM_CACHE_SIZE = 512
+STREAM_CACHE_TTL = 300  # when the links carry no expiry
+STREAM_CACHE_MAX_TTL = 6 * 3600
+STREAM_EXPIRY_MARGIN = 60
+stream_cache = LRUTTLCache(maxsize=STREAM_CACHE_SIZE, ttl=STREAM_CACHE_TTL)
+_stream_keys = {}  # link without scheme/:hls suffix -> stream_cache key
+_stream_keys_lock = threading.Lock()
+EXPIRES_PARAM_PATTERN = re.compile(r"[?&](?:expires|exp)=(\d{10})\b")
+EXPIRES_HOUR_PATTERN = re.compile(r":(20\d{8}):")
+
+
+def _trashPattern():
+    """Regex matching every base64 trash combination rezka mixes into stream URLs.
+
+    The codes are folded into a prefix tree so the regex engine checks one
+    branch per character instead of trying every code at every position.
+    """
+    trashList = ["@", "#", "!", "^", "$"]
+    tree = {}
+    for i in range(2, 4):
+        for chars in product(trashList, repeat=i):
+            node = tree
+            for ch in base64.b64encode("".join(chars).encode("utf-8")).decode("utf-8"):
+                node = node.setdefault(ch, {})
+
+    def build(node):
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items())]
+        if len(branches) <= 1:
+            return "".join(branches)
+        return "(?:" + "|".join(branches) + ")"
+
+    return re.compile(build(tree))
+
+
+# Built once at import, clearTrash runs on every play request
+TRASH_PATTERN = _trashPattern()
+
+
+def linkExpiry(url):
+    """Unix time a CDN link stops working, None when the link doesn't say.
+
+    Understands `expires=`/`exp=` unix timestamps and the `:YYYYMMDDHH:`
+    path component rezka's CDN uses (taken as UTC).
+    """
+    match = EXPIRES_PARAM_PATTERN.search(url)
+    if match:
+        return int(match.group(1))
+    match = EXPIRES_HOUR_PATTERN.search(url)
+    if match:
+        try:
+            hour = datetime.strptime(match.group(1), "%Y%m%d%H")
+        except ValueError:
+            return None
+        return hour.replace(tzinfo=timezone.utc).timestamp()
+    return None
+
+
+def kinopoiskIdFromPage(text):
+    """Kinopoisk id behind the base64 /help/ redirect links of a title page."""
+    for encoded in HELP_LINK_PATTERN.findall(text):
+        try:
+            kp_url = unquote(base64.b64decode(unquote(encoded)).decode())
+        except ValueError:
+            continue
+        if "kinopoisk" in kp_url:
+            return kp_url.rstrip("/").split("/")[-1]
+    return None
+
+
+def _streamLinkKey(url):
+    return url.split(":hls")[0].split("://", 1)[-1]
+
+
+def cacheStream(key, stream):
+    """Keep a resolved stream until its links expire."""
+    expiries = [e for e in map(linkExpiry, stream.videos.values()) if e]
+    if expiries:
+        ttl = min(min(expiries) - time.time() - STREAM_EXPIRY_MARGIN, STREAM_CACHE_MAX_TTL)
+    else:
+        ttl = STREAM_CACHE_TTL
+    if ttl <= 0:
+        return
+    stream_cache.set(key, stream, ttl=ttl)
+    with _stream_keys_lock:
+        if len(_stream_keys) > 4 * STREAM_CACHE_SIZE:
+            for link, cached_key in list(_stream_keys.items()):
+                if cached_key not in stream_cache:
+                    del _stream_keys[link]
+        for link in stream.videos.values():
+            _stream_keys[_streamLinkKey(link)] = key
+
+
+def invalidateStreamLink(url):
+    """Drop the cached stream owning `url`, e.g. after the CDN answered 403/410."""
+    with _stream_keys_lock:
+        key = _stream_keys.pop(_streamLinkKey(url), None)
+    if key is not None:
+        stream_cache.pop(key)
+    return key is not None
+
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64; rv:147.0) Gecko/20100101 Firefox/147.0',
+    'Accept': '*/*',
+    'Accept-Language': 'ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7',
+    # 'Accept-Encoding': 'gzip, deflate, br, zstd',
+    'Connection': 'keep-alive',
+    'Referer': 'https://rezka.fi/films/action/6634-potroshiteli-2010.html',
+    # 'Cookie': 'dle_user_taken=1; dle_user_token=68d02e2d20481394709fb707553d5a21; PHPSESSID=qo2hep2p94a9jlfvvhpqcljbp1; dle_user_id=1802369; dle_password=1d1fa1c75f6bf600106d41b79d26a651; dle_newpm=0',
+    'Sec-Fetch-Dest': 'empty',
+    'Sec-Fetch-Mode': 'cors',
+    'Sec-Fetch-Site': 'same-origin',
+    'Pragma': 'no-cache',
+    'Cache-Control': 'no-cache',
+}
+
+
+class HdRezkaAuth:
+    """Process-wide rezka login shared by every HdRezkaApi instance.
+
+    The cookie jar lives in memory and is read from `cookies_file` at most
+    once. Logins are single-flight: threads that saw the same expired jar
+    wait for one re-login instead of each posting /ajax/login/. A failed
+    login leaves requests unauthenticated and is retried after LOGIN_RETRY.
+    """
+
+    def __init__(self, baseurl, cookies_file="rezka_cookies"):
+        self.baseurl = baseurl
+        self.cookies_file = cookies_file
+        self.email = None
+        self.password = None
+        self._cookies = None
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+        self.login_failures = 0
+
+    def configure(self, email, password):
+        if email:
+            self.email = email
+        if password:
+            self.password = password
+
+    def cookies(self, headers=None):
+        """Cookie jar of the shared login, {} while logged out."""
+        if self._cookies is None and time.monotonic() >= self._retry_at:
+            with self._lock:
+                if self._cookies is None and time.monotonic() >= self._retry_at:
+                    self._cookies = self._load() or self._login(headers)
+        return self._cookies if self._cookies is not None else {}
+
+    def relogin(self, stale, headers=None):
+        """Log in again unless another thread already replaced the `stale` jar."""
+        with self._lock:
+            if self._cookies is stale or self._cookies is None:
+                self._cookies = None
+                if time.monotonic() >= self._retry_at:
+                    self._cookies = self._login(headers)
+            return self._cookies if self._cookies is not None else {}
+
+    @staticmethod
+    def expired(response):
+        """Whether a response to a logged-in request shows the login is gone."""
+        if response.status_code == 401:
+            return True
+        content_type = response.headers.get("Content-Type", "")
+        if "html" in content_type:
+            # Sent to the login page, or served the guest page with its login form
+            return ("/login" in urlparse(str(response.url)).path
+                    or LOGIN_FORM_PATTERN.search(response.content) is not None)
+        if "json" not in content_type:
+            return False
+        try:
+            data = response.json()
+        except ValueError:
+            return False
+        if not isinstance(data, dict):
+            return False
+        message = str(data.get("message", "")).lower()
+        return not data.get("success", True) and ("авториз" in message or "login" in message)
+
+    def _load(self):
+        if not os.path.exists(self.cookies_file):
+            return None
+        with open(self.cookies_file, "r") as fl:
+            return json.load(fl)
+
+    def _login(self, headers=None):
+        """Fresh cookie jar, None when the login failed."""
+        data = {
+            "login_name": self.email,
+            "login_password": self.password,
+            "login_not_save": "0",
+        }
+        try:
+            auth_req = upstream.post(
+                f"https://{self.baseurl}/ajax/login/", data=data, headers=headers
+            )
+            success = auth_req.json()["success"] == True
+        except (upstream.RequestException, ValueError, KeyError) as e:
+            print(f"rezka login failed: {e}")
+            success = False
+        else:
+            if not success:
+                print(auth_req.text)
+        if not success:
+            self.login_failures += 1
+            self._retry_at = time.monotonic() + LOGIN_RETRY
+            return None
+        cookies = dict(auth_req.cookies)
+        print(cookies)
+        self._save(cookies)
+        return cookies
+
+    def _save(self, cookies):
+        # Write next to the target and rename, so readers never see half a file
+        tmp = f"{self.cookies_file}.tmp"
+        with open(tmp, "w") as fl:
+            fl.write(json.dumps(cookies, indent=4))
+        os.replace(tmp, self.cookies_file)
+
+
+auth = HdRezkaAuth("rezka.fi")
+
+
+INIT_CDN_PATTERN = re.compile(r"sof\.tv\.(initCDN\w+Events)\(([^{]*)\{")
+
+
+class HdRezkaTitlePage:
+    """Fields of a title page HdRezkaApi needs, pulled out with lxml/XPath.
+
+    Building a full BeautifulSoup tree with html.parser for every title is
+    slow and heavy, so only these nodes and the inline initCDN call are read.
+    """
+
+    __slots__ = ("id", "name", "type", "favs", "translators",
+                 "translator_name", "cdn_events")
+
+    def __init__(self, content):
+        tree = lxml.html.fromstring(content)
+        self.id = self._first(tree.xpath('//input[@id="post_id"]/@value'))
+        name = tree.xpath('//*[contains(concat(" ", normalize-space(@class), " "), " b-post__title ")]')
+        self.name = name[0].text_content().strip() if name else None
+        self.type = self._first(tree.xpath('//meta[@property="og:type"]/@content'))
+        self.favs = self._first(tree.xpath('//input[@id="ctrl_favs"]/@value'))
+
+        self.translators = {}
+        for child in tree.xpath('//*[@id="translators-list"]/*'):
+            text = child.text_content()
+            if text:
+                self.translators[text] = child.get("data-translator_id")
+
+        self.translator_name = None
+        for row in tree.xpath('//table[contains(concat(" ", normalize-space(@class), " "), " b-post__info ")]//tr'):
+            text = row.text_content()
+            if text.find("переводе") > 0:
+                self.translator_name = text.split("В переводе:")[-1].strip()
+                break
+
+        # Arguments of sof.tv.initCDN*Events(...), e.g. {"initCDNSeriesEvents": ["123", "56", ...]}
+        self.cdn_events = {}
+        text = content.decode("utf-8", errors="ignore") if isinstance(content, bytes) else content
+        for match in INIT_CDN_PATTERN.finditer(text):
+            args = match.group(2).strip().rstrip(",").split(",")
+            self.cdn_events[match.group(1)] = [arg.strip() for arg in args]
+
+    @staticmethod
+    def _first(values):
+        return values[0] if values else None
+
+    def defaultTranslatorId(self, type):
+        initCDNEvents = {
+            "video.tv_series": "initCDNSeriesEvents",
+            "video.movie": "initCDNMoviesEvents",
+        }
+        return self.cdn_events[initCDNEvents[type]][1]
 
 
 class HdRezkaStreamSubtitles:
@@ -69,29 +378,38 @@ class HdRezkaStream:
         raise ValueError(f'Resolution "{resolution}" is not defined')
 
 
+def parseStream(r, season, episode):
+    """HdRezkaStream from a get_cdn_series JSON answer, None when it failed."""
+    if not r["success"]:
+        return None
+    url = r["url"]
+    if url.startswith("#h"):
+        url = HdRezkaApi.clearTrash(url)
+    arr = url.split(",")
+    stream = HdRezkaStream(
+        season,
+        episode,
+        subtitles={"data": r["subtitle"],
+                   "codes": r["subtitle_lns"]},
+    )
+    for i in arr:
+        res = i.split("[")[1].split("]")[0]
+        video = i.split("[")[1].split("]")[1].split(" or ")[1]
+        stream.append(res, video)
+    return stream
+
+
 class HdRezkaApi:
     __version__ = 5.2
 
     def __init__(self, url, search_data=None, email=None, password=None):
         self.baseurl = "rezka.fi"
-        self.HEADERS = {
-            'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64; rv:147.0) Gecko/20100101 Firefox/147.0',
-            'Accept': '*/*',
-            'Accept-Language': 'ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7',
-            # 'Accept-Encoding': 'gzip, deflate, br, zstd',
-            'Connection': 'keep-alive',
-            'Referer': 'https://rezka.fi/films/action/6634-potroshiteli-2010.html',
-            # 'Cookie': 'dle_user_taken=1; dle_user_token=68d02e2d20481394709fb707553d5a21; PHPSESSID=qo2hep2p94a9jlfvvhpqcljbp1; dle_user_id=1802369; dle_password=1d1fa1c75f6bf600106d41b79d26a651; dle_newpm=0',
-            'Sec-Fetch-Dest': 'empty',
-            'Sec-Fetch-Mode': 'cors',
-            'Sec-Fetch-Site': 'same-origin',
-            'Pragma': 'no-cache',
-            'Cache-Control': 'no-cache',
-        }
+        self.HEADERS = dict(HEADERS)
 
-        self.COOKIES = {}
+        self._soup = None
         self.authorize(email, password)
         self.found_item = False
+        self.lookup_failed = False
         if search_data:
             self.search_data = search_data
             self.query_url = self.getURLByQuery()
@@ -114,33 +432,34 @@ class HdRezkaApi:
             )
 
         self.page = self.getPage()
-        self.soup = self.getSoup()
+        self.info = HdRezkaTitlePage(self.page.content)
         self.id = self.extractId()
         self.name = self.getName()
         self.type = self.getType()
         # other
         self.translators = None
         self.seriesInfo = None
+        self._seasonFutures = {}
+        self._seasonLock = threading.RLock()
 
     def authorize(self, email, password):
-        data = {
-            "login_name": email,
-            "login_password": password,
-            "login_not_save": "0",
-        }
-        if os.path.exists("rezka_cookies"):
-            self.COOKIES = json.load(open("rezka_cookies", "r"))
-            return
-        auth_req = requests.post(
-            f"https://{self.baseurl}/ajax/login/", data=data, headers=self.HEADERS
-        )
-        if auth_req.json()["success"] == True:
-            self.COOKIES = auth_req.cookies.get_dict()
-            print(self.COOKIES)
-            with open("rezka_cookies", "w") as fl:
-                fl.write(json.dumps(self.COOKIES, indent=4))
-        else:
-            print(auth_req.text)
+        # Credentials only, the shared session logs in lazily on first request
+        auth.configure(email, password)
+
+    @property
+    def COOKIES(self):
+        return auth.cookies(self.HEADERS)
+
+    def request(self, method, url, **kwargs):
+        """Request to rezka with the shared login, re-authenticating once if it expired."""
+        cookies = auth.cookies(self.HEADERS)
+        response = upstream.client.request(
+            method, url, headers=self.HEADERS, cookies=cookies, **kwargs)
+        if cookies and auth.expired(response):
+            cookies = auth.relogin(cookies, self.HEADERS)
+            response = upstream.client.request(
+                method, url, headers=self.HEADERS, cookies=cookies, **kwargs)
+        return response
 
     def change_domain(self, original_url, new_domain):
         parsed_url = urlparse(original_url)
@@ -152,111 +471,104 @@ class HdRezkaApi:
 
     def getURLByQuery(self):
         try:
-            response = requests.get(
+            response = self.request(
+                "GET",
                 f"https://{self.baseurl}/search/",
                 params={"do": "search", "subaction": "search",
                         "q": self.search_data["query"]},
-                headers=self.HEADERS,
-                cookies=self.COOKIES,
                 timeout=10,
             )
             parsed_html = BeautifulSoup(response.text, "lxml")
+            candidates = []
             for link in parsed_html.find_all(
                 "div", attrs={"class": "b-content__inline_item"}
-            )[:2]:
+            )[:SEARCH_CANDIDATES]:
                 url = link.find("div").find("a")["href"]
                 if url.startswith("/"):
                     url = f"https://{self.baseurl}" + url
-                response = requests.get(
-                    url,
-                    headers=self.HEADERS,
-                    cookies=self.COOKIES,
-                    timeout=100,
-                )
-                parsed_item_html = BeautifulSoup(response.text, "lxml")
-                kp_redir_url = parsed_item_html.find_all(
-                    "table", {"class": "b-post__info"}
-                )[0].find_all("a", {"target": "_blank"})[1]["href"].split("/help/")[1].split("/")[0]
-                kp_url = base64.b64decode(kp_redir_url).decode()
-                kp_id = kp_url.split("%2F")[-2]
-                if kp_id == self.search_data["kp_id"]:
-                    return url
-            return ""
+                candidates.append(url)
         except:
             self.found_item = False
+            self.lookup_failed = True
             return ""
 
-    def getPage(self):
-        return requests.get(
-            self.url, headers=self.HEADERS, cookies=self.COOKIES, timeout=10000
+        # Check all candidates at once, the first match wins and the rest are dropped
+        done = threading.Event()
+        futures = {
+            _fetch_pool.submit(self.getKinopoiskId, url, done): url
+            for url in candidates
+        }
+        try:
+            for future in as_completed(futures, timeout=KP_LOOKUP_DEADLINE):
+                if future.exception():
+                    self.lookup_failed = True
+                    print(f"kp_id check failed for {futures[future]}: {future.exception()}")
+                elif future.result() == str(self.search_data["kp_id"]):
+                    return futures[future]
+        except TimeoutError:
+            self.lookup_failed = True
+            print(f"kp_id check timed out for {self.search_data['query']}")
+        finally:
+            done.set()
+            for future in futures:
+                future.cancel()
+        self.found_item = False
+        return ""
+
+    def getKinopoiskId(self, url, cancelled=None):
+        """Kinopoisk id of a title, read from the /help/ redirect links of its page.
+
+        The quick_content.php bubble only carries the Kinopoisk rating, not the
+        link, so the title page is still fetched but scanned with a regex
+        instead of being parsed.
+        """
+        if cancelled is not None and cancelled.is_set():
+            return None
+        response = self.request(
+            "GET",
+            url,
+            timeout=KP_LOOKUP_TIMEOUT,
         )
+        return kinopoiskIdFromPage(response.text)
+
+    def getPage(self):
+        return self.request("GET", self.url, timeout=10000)
 
     def getSoup(self):
-        return BeautifulSoup(self.page.content, "html.parser")
+        return BeautifulSoup(self.page.content, "lxml")
+
+    @property
+    def soup(self):
+        # Full tree is only built for the rarely used getOtherParts/getPosterURL
+        if self._soup is None:
+            self._soup = self.getSoup()
+        return self._soup
 
     def extractId(self):
-        return self.soup.find(id="post_id").attrs["value"]
+        return self.info.id
 
     def getName(self):
-        return self.soup.find(class_="b-post__title").get_text().strip()
+        return self.info.name
 
     def getPosterURL(self):
         print(self.soup.find_all("img")[0]["src"])
         return self.soup.find_all("img")[0]["src"]
 
     def getType(self):
-        return self.soup.find("meta", property="og:type").attrs["content"]
+        return self.info.type
 
     @staticmethod
     def clearTrash(data):
-        trashList = ["@", "#", "!", "^", "$"]
-        trashCodesSet = []
-        for i in range(2, 4):
-            startchar = ""
-            for chars in product(trashList, repeat=i):
-                data_bytes = startchar.join(chars).encode("utf-8")
-                trashcombo = base64.b64encode(data_bytes)
-                trashCodesSet.append(trashcombo)
-
-        arr = data.replace("#h", "").split("//_//")
-        trashString = "".join(arr)
-
-        for i in trashCodesSet:
-            temp = i.decode("utf-8")
-            trashString = trashString.replace(temp, "")
-
+        trashString = TRASH_PATTERN.sub("", data.replace("#h", "").replace("//_//", ""))
         finalString = base64.b64decode(trashString + "==")
         return finalString.decode("latin-1")
 
     def getTranslations(self):
-        arr = {}
-        translators = self.soup.find(id="translators-list")
-        if translators:
-            children = translators.findChildren(recursive=False)
-            for child in children:
-                if child.text:
-                    arr[child.text] = child.attrs["data-translator_id"]
+        arr = dict(self.info.translators)
 
         if not arr:
             # auto-detect
-            def getTranslationName(s):
-                table = s.find(class_="b-post__info")
-                for i in table.findAll("tr"):
-                    tmp = i.get_text()
-                    if tmp.find("переводе") > 0:
-                        return tmp.split("В переводе:")[-1].strip()
-
-            def getTranslationID(s):
-                initCDNEvents = {
-                    "video.tv_series": "initCDNSeriesEvents",
-                    "video.movie": "initCDNMoviesEvents",
-                }
-                tmp = s.text.split(f"sof.tv.{initCDNEvents[self.type]}")[-1].split("{")[
-                    0
-                ]
-                return tmp.split(",")[1].strip()
-
-            arr[getTranslationName(self.soup)] = getTranslationID(self.page)
+            arr[self.info.translator_name] = self.info.defaultTranslatorId(self.type)
 
         self.translators = arr
         return arr
@@ -295,64 +607,114 @@ class HdRezkaApi:
 
         return seasons_, episodes_
 
-    def getSeasons(self):
+    def getTranslatorName(self, translation=None, index=0):
         if not self.translators:
             self.translators = self.getTranslations()
 
-        arr = {}
-        for i in self.translators:
-            js = {
-                "id": self.id,
-                "translator_id": self.translators[i],
-                "action": "get_episodes",
-            }
-            r = requests.post(
-                "https://" + self.baseurl + "/ajax/get_cdn_series/",
-                data=js,
-                cookies=self.COOKIES,
-                headers=self.HEADERS,
-                timeout=100,
-            )
-            response = r.json()
-            if response["success"]:
-                seasons, episodes = self.getEpisodes(
-                    response["seasons"], response["episodes"]
+        if translation:
+            translation = str(translation)
+            if translation.isnumeric():
+                for name, tr_id in self.translators.items():
+                    if tr_id == translation:
+                        return name
+                raise ValueError(
+                    f'Translation with code "{translation}" is not defined'
                 )
-                arr[i] = {
-                    "translator_id": self.translators[i],
-                    "seasons": seasons,
-                    "episodes": episodes,
-                }
-            time.sleep(0.5)
+            if translation in self.translators:
+                return translation
+            raise ValueError(f'Translation "{translation}" is not defined')
+
+        return list(self.translators.keys())[index]
+
+    def getTranslatorEpisodes(self, tr_str):
+        limiter = upstream.limiter(self.baseurl)
+        if limiter:
+            limiter.acquire()
+        js = {
+            "id": self.id,
+            "translator_id": self.translators[tr_str],
+            "action": "get_episodes",
+        }
+        r = self.request(
+            "POST",
+            "https://" + self.baseurl + "/ajax/get_cdn_series/",
+            data=js,
+            timeout=100,
+        )
+        response = r.json()
+        if not response["success"]:
+            return None
+        seasons, episodes = self.getEpisodes(
+            response["seasons"], response["episodes"]
+        )
+        info = {
+            "translator_id": self.translators[tr_str],
+            "seasons": seasons,
+            "episodes": episodes,
+        }
+        self.seriesInfo[tr_str] = info
+        return info
 
-        self.seriesInfo = arr
-        return arr
+    def getSeasons(self, translation=None, lazy=False):
+        """Fetch seasons and episodes per translator.
+
+        Translators are fetched concurrently on the shared pool, rate limited
+        per host. With `translation` the call returns as soon as that
+        translator is known while the others keep loading in the background;
+        `lazy=True` fetches only that translator.
+        """
+        if not self.translators:
+            self.translators = self.getTranslations()
+
+        wanted = self.getTranslatorName(translation) if translation else None
+        if lazy and wanted:
+            names = [wanted]
+        elif wanted:
+            # Queued first, the caller waits for this one only
+            names = [wanted] + [name for name in self.translators if name != wanted]
+        else:
+            names = list(self.translators)
+
+        with self._seasonLock:
+            if self.seriesInfo is None:
+                self.seriesInfo = {}
+            for name in names:
+                if name in self.seriesInfo or name in self._seasonFutures:
+                    continue
+                future = _fetch_pool.submit(self.getTranslatorEpisodes, name)
+                future.add_done_callback(
+                    lambda f, name=name: self._seasonFetched(name, f))
+                self._seasonFutures[name] = future
+            pending = dict(self._seasonFutures)
+
+        if wanted:
+            if wanted in pending:
+                pending[wanted].result()
+        else:
+            for name in names:
+                if name in pending:
+                    pending[name].result()
+
+        return dict(self.seriesInfo)
+
+    def _seasonFetched(self, tr_str, future):
+        with self._seasonLock:
+            self._seasonFutures.pop(tr_str, None)
+        if future.exception():
+            print(f"get_episodes failed for {tr_str}: {future.exception()}")
 
     def getStream(self, season=None, episode=None, translation=None, index=0):
         def makeRequest(data):
             print(data)
-            r = requests.post(
+            r = self.request(
+                "POST",
                 "https://" + self.baseurl +
                 f"/ajax/get_cdn_series/?{str(time.time()).split('.')[0]}",
                 data=data,
-                cookies=self.COOKIES,
-                headers=self.HEADERS,
             )
             r = r.json()
             print(r)
-            if r["success"]:
-                arr = r["url"].split(",")
-                stream = HdRezkaStream(
-                    season,
-                    episode,
-                    subtitles={"data": r["subtitle"],
-                               "codes": r["subtitle_lns"]},
-                )
-                for i in arr:
-                    res = i.split("[")[1].split("]")[0]
-                    video = i.split("[")[1].split("]")[1].split(" or ")[1]
-                    stream.append(res, video)
-                return stream
+            return parseStream(r, season, episode)
 
         def getStreamSeries(self, season, episode, translation_id):
             if not (season and episode):
@@ -363,14 +725,14 @@ class HdRezkaApi:
             season = str(season)
             episode = str(episode)
 
-            if not self.seriesInfo:
-                self.getSeasons()
-            seasons = self.seriesInfo
-
             tr_str = list(self.translators.keys())[
                 list(self.translators.values()).index(translation_id)
             ]
 
+            if tr_str not in (self.seriesInfo or {}):
+                self.getSeasons(tr_str, lazy=True)
+            seasons = self.seriesInfo
+
             if not season in list(seasons[tr_str]["episodes"]):
                 raise ValueError(f'Season "{season}" is not defined')
 
@@ -392,7 +754,7 @@ class HdRezkaApi:
                 {"id": self.id, "translator_id": translation_id, "action": "get_movie",  'is_camrip': '0',
                  'is_ads': '0',
                  'is_director': '0',
-                 'favs': self.soup.find(id="ctrl_favs").attrs["value"] }
+                 'favs': self.info.favs }
             )
 
         if not self.translators:
@@ -416,85 +778,138 @@ class HdRezkaApi:
             tr_id = list(self.translators.values())[index]
 
         if self.type == "video.tv_series":
-            return getStreamSeries(self, season, episode, tr_id)
+            key = (self.id, tr_id, str(season), str(episode))
+        else:
+            key = (self.id, tr_id, None, None)
+        stream = stream_cache.get(key)
+        if stream is not None:
+            return stream
+
+        if self.type == "video.tv_series":
+            stream = getStreamSeries(self, season, episode, tr_id)
         elif self.type == "video.movie":
-            return getStreamMovie(self, tr_id)
+            stream = getStreamMovie(self, tr_id)
         else:
             raise TypeError("Undefined content type")
-
-    def getSeasonStreams(
-        self, season, translation=None, index=0, ignore=False, progress=None
-    ):
-        season = str(season)
-
-        if not progress:
-            def progress(cur, all): return print(f"{cur}/{all}", end="\r")
-
-        if not self.translators:
-            self.translators = self.getTranslations()
-        trs = self.translators
-
-        if translation:
-            if translation.isnumeric():
-                if translation in trs.values():
-                    tr_id = translation
+        if stream is not None:
+            cacheStream(key, stream)
+        return stream
+
+    def nextEpisodes(self, season, episode, translation=None, count=1):
+        """Up to `count` (season, episode) pairs after the given one, continuing into the next season."""
+        tr_str = self.getTranslatorName(translation)
+        if tr_str not in (self.seriesInfo or {}):
+            self.getSeasons(tr_str, lazy=True)
+        episodes = self.seriesInfo[tr_str]["episodes"]
+
+        order = [
+            (s, e)
+            for s in sorted(episodes, key=int)
+            for e in sorted(episodes[s], key=int)
+        ]
+        try:
+            position = order.index((str(season), str(episode)))
+        except ValueError:
+            return []
+        return order[position + 1:position + 1 + count]
+
+    def prefetchStreams(self, season, episode, translation=None, count=1, resolve=None):
+        """Resolve the next episodes in the background so their streams are cached.
+
+        `resolve(season, episode)` replaces getStream, e.g. to let a request
+        for the same episode join the prefetch. Returns the futures,
+        cancelling them drops episodes not started yet.
+        """
+        def prefetch(s, e):
+            try:
+                if resolve is not None:
+                    resolve(s, e)
                 else:
-                    raise ValueError(
-                        f'Translation with code "{translation}" is not defined'
-                    )
-
-            elif translation in trs:
-                tr_id = trs[translation]
-            else:
-                raise ValueError(f'Translation "{translation}" is not defined')
-
-        else:
-            tr_id = list(trs.values())[index]
+                    self.getStream(s, e, translation)
+            except Exception as ex:
+                print(f"Prefetch of s{s}e{e} failed: {ex}")
+
+        return [
+            _prefetch_pool.submit(prefetch, s, e)
+            for s, e in self.nextEpisodes(season, episode, translation, count)
+        ]
+
+    def iterSeasonStreams(
+        self, season, translation=None, index=0, ignore=False,
+        workers=SEASON_WORKERS, retries=SEASON_RETRIES, deadline=SEASON_DEADLINE
+    ):
+        """Yield (episode, stream) for a season in completion order.
 
-        tr_str = list(trs.keys())[list(trs.values()).index(tr_id)]
+        At most `workers` episodes resolve at once. A failed episode is retried
+        up to `retries` times with exponential backoff and jitter, then yields
+        None as its stream (or is skipped with `ignore`). Episodes still
+        pending after `deadline` seconds are dropped.
+        """
+        season = str(season)
+        tr_str = self.getTranslatorName(translation, index)
 
-        if not self.seriesInfo:
-            self.getSeasons()
+        if tr_str not in (self.seriesInfo or {}):
+            self.getSeasons(tr_str, lazy=True)
         seasons = self.seriesInfo
 
         if not season in list(seasons[tr_str]["episodes"]):
             raise ValueError(f'Season "{season}" is not defined')
 
         series = seasons[tr_str]["episodes"][season]
-        series_length = len(series)
-
-        streams = {}
-        threads = []
-        progress(0, series_length)
-
-        for episode_id in series:
+        stop_at = time.monotonic() + deadline
 
-            def make_call(ep_id, retry=True):
+        def make_call(ep_id):
+            for attempt in range(retries + 1):
                 try:
-                    stream = self.getStream(season, ep_id, tr_str)
-                    streams[ep_id] = stream
-                    progress(len(streams), series_length)
+                    return self.getStream(season, ep_id, tr_str)
                 except Exception as e:
-                    if retry:
-                        time.sleep(1)
-                        if ignore:
-                            return make_call(ep_id)
-                        else:
-                            return make_call(ep_id, retry=False)
-                    if not ignore:
-                        ex_name = e.__class__.__name__
-                        ex_desc = e
-                        print(f"{ex_name} > ep:{ep_id}: {ex_desc}")
-                        streams[ep_id] = None
-                        progress(len(streams), series_length)
-
-            t = threading.Thread(
-                target=make_call, args=(episode_id,), daemon=True)
-            t.start()
-            threads.append(t)
-
-        for t in threads:
-            t.join()
+                    delay = min(SEASON_BACKOFF_MAX, SEASON_BACKOFF * 2 ** attempt)
+                    delay = random.uniform(delay / 2, delay)
+                    if attempt == retries or time.monotonic() + delay > stop_at:
+                        raise
+                    print(f"{e.__class__.__name__} > ep:{ep_id}: {e}, retrying in {delay:.1f}s")
+                    time.sleep(delay)
+
+        executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="rezka-season")
+        futures = {executor.submit(make_call, ep_id): ep_id for ep_id in series}
+        try:
+            for future in as_completed(futures, timeout=max(0, stop_at - time.monotonic())):
+                ep_id = futures[future]
+                if future.exception():
+                    e = future.exception()
+                    if ignore:
+                        continue
+                    print(f"{e.__class__.__name__} > ep:{ep_id}: {e}")
+                    yield ep_id, None
+                else:
+                    yield ep_id, future.result()
+        except TimeoutError:
+            print(f"Season {season} streams hit the {deadline}s deadline")
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def getSeasonStreams(
+        self, season, translation=None, index=0, ignore=False, progress=None,
+        workers=SEASON_WORKERS, retries=SEASON_RETRIES, deadline=SEASON_DEADLINE
+    ):
+        if not progress:
+            def progress(cur, all): return print(f"{cur}/{all}", end="\r")
+
+        season = str(season)
+        tr_str = self.getTranslatorName(translation, index)
+        if tr_str not in (self.seriesInfo or {}):
+            self.getSeasons(tr_str, lazy=True)
+        series_length = len(self.seriesInfo.get(tr_str, {}).get("episodes", {}).get(season, {}))
+
+        streams = {}
+        progress(0, series_length)
+        for ep_id, stream in self.iterSeasonStreams(
+            season, tr_str, ignore=ignore,
+            workers=workers, retries=retries, deadline=deadline
+        ):
+            streams[ep_id] = stream
+            progress(len(streams), series_length)
 
         sorted_streams = {k: streams[k]
                           for k in sorted(streams, key=lambda x: int(x))}